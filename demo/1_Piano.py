@@ -1,16 +1,23 @@
 #!/usr/bin/env python3
+import sys
+from startup import StartupProfiler, after_first_paint
 import matplotlib.pyplot as plt
 import numpy as np
 from matplotlib.patches import Rectangle
 from matplotlib.widgets import Button, RadioButtons
-import sounddevice as sd
+from blit import BlitRenderer
+from keyboard import KeyIndex, KeyTable, key_name, key_to_midi, midi_to_key
+from mixer import get_mixer
+from music_data import EXTENDED_CHORDS, SEVENTH_CHORDS, TRIADS
+from synth import PIANO_ENVELOPE, get_synth
+from theory import NOTE_NAMES
 
 # 设置中文字体支持
 plt.rcParams['font.sans-serif'] = ['Arial Unicode MS']  # macOS系统可用
 plt.rcParams['axes.unicode_minus'] = False
 
 class PianoTeacher:
-    def __init__(self):
+    def __init__(self, tuner_wav=None, midi_port=None):
         print("Initializing Piano Teacher")
         self.fig = plt.figure(figsize=(16, 10))
         plt.subplots_adjust(left=0.05, right=0.95, top=0.95, bottom=0.25)
@@ -20,42 +27,48 @@ class PianoTeacher:
         self.piano_ax.set_title("Piano (88 keys)")
         
         # 定义音符和频率
-        self.base_notes = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
+        self.base_notes = list(NOTE_NAMES)
         self.octaves = range(0, 8)  # 0-8八度
         
-        # 生成所有键的信息
-        self.keys = []  # 存储所有键的信息
-        self.key_rectangles = {}  # 存储键的图形对象
+        # 生成所有键的信息（见 setup_piano 中的 KeyTable）
+        self.keys = None
         self.selected_keys = []  # 当前选中的键
         self.pressed_keys = []   # 当前按下的键
         
         # 定义和弦（添加中文注释）
-        self.triads = {
-            'Major (大三和弦)': [0, 4, 7],
-            'Minor (小三和弦)': [0, 3, 7],
-            'Diminished (减三和弦)': [0, 3, 6],
-            'Augmented (增三和弦)': [0, 4, 8]
-        }
-        
-        self.seventh_chords = {
-            'Major 7th (大七和弦)': [0, 4, 7, 11],
-            'Minor 7th (小七和弦)': [0, 3, 7, 10],
-            'Dominant 7th (属七和弦)': [0, 4, 7, 10],
-            'Half Dim (半减七和弦)': [0, 3, 6, 10]
-        }
-        
-        self.extended_chords = {
-            '9th (九和弦)': [0, 4, 7, 10, 14],
-            '11th (十一和弦)': [0, 4, 7, 10, 14, 17],
-            '13th (十三和弦)': [0, 4, 7, 10, 14, 17, 21]
-        }
+        self.triads = TRIADS
+        
+        self.seventh_chords = SEVENTH_CHORDS
+        
+        self.extended_chords = EXTENDED_CHORDS
         
         self.current_root = 'A4'  # A4 = 440Hz
         self.current_chord_type = None
         
+        # 调音器：麦克风或录音输入，定时器轮询结果并高亮最近的键
+        self.tuner_wav = tuner_wav
+        self.tuner = None
+        self.tuner_key = None
+        
+        # MIDI 键盘：回调线程记录按住的音，定时器同步到 pressed_keys（None = 不用 MIDI，'' = 默认端口）
+        self.midi_port = midi_port
+        self.midi = None
+        self.midi_version = 0
+        
+        # 共享合成器（波表 + 渲染缓存）
+        self.synth = get_synth()
+        self.mixer = get_mixer(self.synth.sample_rate)
+        
         self.setup_piano()
         self.setup_controls()
         
+        # 局部重绘：只重画颜色变化的琴键
+        self.key_renderer = BlitRenderer(self.piano_ax, self.keys_above)
+        self.tuner_timer = self.fig.canvas.new_timer(interval=50)
+        self.tuner_timer.add_callback(self.update_tuner)
+        self.midi_timer = self.fig.canvas.new_timer(interval=20)
+        self.midi_timer.add_callback(self.update_midi)
+        
         # 添加鼠标事件
         self.fig.canvas.mpl_connect('button_press_event', self.on_mouse_press)
         self.fig.canvas.mpl_connect('button_release_event', self.on_mouse_release)
@@ -68,70 +81,46 @@ class PianoTeacher:
         self.piano_ax.set_xlim(0, 88)
         self.piano_ax.set_ylim(0, 2)
         
-        # 绘制白键和黑键
-        white_key_width = 1.0
-        black_key_width = 0.6
-        
-        white_index = 0
-        for i in range(88):
-            note_index = i % 12
-            octave = (i + 9) // 12  # 从A0开始
-            note = self.base_notes[note_index]
-            
-            # 确定是否为黑键
-            is_black = '#' in note
+        # 键表（结构体数组）：几何和频率一次性向量化算好，这里只创建图形
+        self.keys = KeyTable(88, self.base_notes)
+        for key in self.keys:
+            i = key.index
+            rect = Rectangle((key.x, self.keys.y[i]), key.width, self.keys.height[i],
+                             fc='black' if key.is_black else 'white', ec='black',
+                             zorder=2 if key.is_black else 1)  # 黑键压在白键上
+            self.piano_ax.add_patch(rect)
+            self.keys.rects[i] = rect
             
-            if not is_black:
-                # 绘制白键
-                rect = Rectangle((white_index, 0), white_key_width, 2,
-                               fc='white', ec='black')
-                self.piano_ax.add_patch(rect)
-                
-                # 存储键的信息
-                key_info = {
-                    'note': f"{note}{octave}",
-                    'rect': rect,
-                    'index': i,
-                    'freq': 440 * 2**((i - 48)/12),  # A4 = 440Hz
-                    'is_black': False,
-                    'x': white_index,
-                    'width': white_key_width
-                }
-                self.keys.append(key_info)
-                self.key_rectangles[f"{note}{octave}"] = rect
-                
-                # 在关键位置添加标注
-                if note == 'C':
-                    self.piano_ax.text(white_index + 0.5, -0.2, f'C{octave}', 
-                                     ha='center', va='top')
-                
-                white_index += white_key_width
-            else:
-                # 绘制黑键
-                prev_white_x = white_index - white_key_width
-                rect = Rectangle((prev_white_x + white_key_width - black_key_width/2, 1),
-                               black_key_width, 1,
-                               fc='black', ec='black')
-                self.piano_ax.add_patch(rect)
-                
-                # 存储键的信息
-                key_info = {
-                    'note': f"{note}{octave}",
-                    'rect': rect,
-                    'index': i,
-                    'freq': 440 * 2**((i - 48)/12),  # A4 = 440Hz
-                    'is_black': True,
-                    'x': prev_white_x + white_key_width - black_key_width/2,
-                    'width': black_key_width
-                }
-                self.keys.append(key_info)
-                self.key_rectangles[f"{note}{octave}"] = rect
+            # 在关键位置添加标注
+            if key.note.startswith('C') and not key.is_black:
+                self.piano_ax.text(key.x + 0.5, -0.2, key.note,
+                                 ha='center', va='top')
+        
+        # 几何与音名索引：命中测试和音名查找不再线性扫描
+        self.key_index = KeyIndex.from_table(self.keys)
+        
+        # 每个白键两侧压在它上面的黑键（局部重绘时需要补画）
+        is_black = self.keys.is_black
+        self.black_neighbours = {}
+        for i in np.flatnonzero(~is_black):
+            self.black_neighbours[self.keys.rects[i]] = [
+                self.keys.rects[j] for j in (i - 1, i + 1)
+                if 0 <= j < len(self.keys) and is_black[j]]
         
         # 标注 A4 = 440Hz
-        a4_x = self.keys[48]['x']  # A4的位置
+        a4_x = self.keys.x[48]  # A4的位置
         self.piano_ax.text(a4_x + 0.5, -0.2, 'A4 (440Hz)', ha='center', 
                           va='top', color='red', fontweight='bold')
         
+        # 调音器读数（不透明底色，局部重绘时覆盖旧文字）
+        self.tuner_text = self.piano_ax.text(
+            87, 2.05, ' ' * 24, ha='right', va='bottom', family='monospace',
+            bbox=dict(fc='white', ec='none'), clip_on=False)
+        # 按住的键识别出的和弦
+        self.chord_text = self.piano_ax.text(
+            1, 2.05, ' ' * 32, ha='left', va='bottom', family='monospace',
+            bbox=dict(fc='white', ec='none'), clip_on=False)
+        
         self.piano_ax.axis('off')
     def setup_controls(self):
         """设置控制按钮"""
@@ -160,6 +149,9 @@ class PianoTeacher:
         extended_ax = plt.axes([0.1, 0.01, 0.35, 0.05])
         self.extended_radio = RadioButtons(extended_ax, list(self.extended_chords.keys()))
         
+        tuner_ax = plt.axes([0.5, 0.01, 0.12, 0.05])
+        self.tuner_button = Button(tuner_ax, '调音器 (Tuner)')
+        
         # 调整所有RadioButtons的字体大小
         for radio in [self.base_notes_radio, self.octaves_radio, 
                      self.triads_radio, self.seventh_radio, self.extended_radio]:
@@ -172,37 +164,15 @@ class PianoTeacher:
         self.triads_radio.on_clicked(self.on_chord_select)
         self.seventh_radio.on_clicked(self.on_chord_select)
         self.extended_radio.on_clicked(self.on_chord_select)
+        self.tuner_button.on_clicked(self.toggle_tuner)
 
     def get_frequency(self, note):
         """计算给定音符的频率"""
-        for key in self.keys:
-            if key['note'] == note:
-                return key['freq']
-        return None
+        return self.key_index.frequency(note)
 
     def generate_note_sound(self, freq, duration=0.5):
-        """生成钢琴音色"""
-        sample_rate = 44100
-        t = np.linspace(0, duration, int(sample_rate * duration), False)
-        
-        # 基频和泛音（模拟钢琴音色）
-        tone = np.sin(2 * np.pi * freq * t) * 0.4
-        tone += np.sin(4 * np.pi * freq * t) * 0.2
-        tone += np.sin(6 * np.pi * freq * t) * 0.1
-        tone += np.sin(8 * np.pi * freq * t) * 0.05
-        
-        # ADSR包络
-        attack = int(0.02 * sample_rate)
-        decay = int(0.1 * sample_rate)
-        sustain_level = 0.7
-        release = int(0.2 * sample_rate)
-        
-        envelope = np.ones_like(t)
-        envelope[:attack] = np.linspace(0, 1, attack)
-        envelope[attack:attack+decay] = np.linspace(1, sustain_level, decay)
-        envelope[-release:] = np.linspace(sustain_level, 0, release)
-        
-        return tone * envelope
+        """生成钢琴音色（波表合成，结果有缓存）"""
+        return self.synth.note(freq, 'piano', duration, PIANO_ENVELOPE)
 
     def play_chord(self, notes):
         """播放和弦"""
@@ -210,19 +180,15 @@ class PianoTeacher:
             return
             
         try:
-            duration = 0.5
-            sample_rate = 44100
-            chord = np.zeros(int(sample_rate * duration))
-            
-            for note in notes:
-                freq = self.get_frequency(note)
-                if freq:
-                    chord += self.generate_note_sound(freq, duration)
+            indices = [i for i in map(self.keys.index_of, notes) if i is not None]
+            if not indices:
+                return
+            freqs = self.keys.freq[indices]
             
-            # 归一化并控制音量
-            chord = chord / np.max(np.abs(chord)) * 0.5
+            # 批量渲染并归一化控制音量
+            chord = self.synth.chord(freqs, 'piano', 0.5, PIANO_ENVELOPE, peak=0.5)
             
-            sd.play(chord, sample_rate)
+            self.mixer.play(chord)
             
         except Exception as e:
             print(f"Error playing sound: {str(e)}")
@@ -230,37 +196,85 @@ class PianoTeacher:
     def highlight_keys(self, notes, highlight=True):
         """高亮显示按键"""
         for note in notes:
-            if note in self.key_rectangles:
-                rect = self.key_rectangles[note]
+            index = self.keys.index_of(note)
+            if index is not None:
+                rect = self.keys.rects[index]
                 if highlight:
                     rect.set_facecolor('yellow' if '#' not in note else 'gray')
                 else:
                     rect.set_facecolor('white' if '#' not in note else 'black')
-        
-        self.fig.canvas.draw()
+                self.key_renderer.mark(rect)
+
+    def keys_above(self, rect):
+        """重画白键后需要补画的相邻黑键"""
+        return self.black_neighbours.get(rect, ())
     def on_mouse_press(self, event):
         """处理鼠标按下事件"""
         if event.inaxes != self.piano_ax:
             return
             
-        # 查找被点击的键
-        for key in self.keys:
-            if (key['x'] <= event.xdata < key['x'] + key['width'] and
-                (not key['is_black'] or (key['is_black'] and event.ydata > 1))):
-                
-                self.pressed_keys.append(key['note'])
-                self.highlight_keys([key['note']], True)
-                self.play_chord([key['note']])
-                
-                # 显示正在播放的音符和频率
-                print(f"Playing: {key['note']} ({key['freq']:.1f} Hz)")
-                break
+        # 查找被点击的键（二分查找，黑键优先）
+        index = self.key_index.hit(event.xdata, event.ydata)
+        if index is None:
+            return
+        key = self.keys[index]
+        
+        self.pressed_keys.append(key.note)
+        self.highlight_keys([key.note], True)
+        self.show_pressed_chord()
+        self.key_renderer.flush()
+        self.play_chord([key.note])
+        
+        # 显示正在播放的音符和频率
+        print(f"Playing: {key.note} ({key.freq:.1f} Hz)")
 
     def on_mouse_release(self, event):
         """处理鼠标释放事件"""
         if self.pressed_keys:
             self.highlight_keys(self.pressed_keys, False)
             self.pressed_keys = []
+            self.show_pressed_chord()
+            self.key_renderer.flush()
+
+    def show_pressed_chord(self):
+        """识别按住的键构成的和弦（发声最低的键作低音），更新读数"""
+        from recognizer import get_recognizer
+
+        indices = [i for i in map(self.keys.index_of, self.pressed_keys) if i is not None]
+        pitches = [key_to_midi(i) for i in indices]
+        matches = get_recognizer().recognize_keys(pitches, 2) if len(pitches) > 1 else ()
+        label = ' | '.join(m.label for m in matches)
+        self.chord_text.set_text(f"{label:<32}")
+        self.key_renderer.mark(self.chord_text)
+        if matches:
+            print(f"Chord: {matches[0].describe()}")
+
+    def start_midi(self):
+        """打开 MIDI 输入并开始轮询"""
+        from recognizer import MidiChords
+
+        try:
+            self.midi = MidiChords(self.midi_port or None).start()
+        except Exception as e:
+            self.midi = None
+            print(f"Error opening MIDI input: {str(e)}")
+            return
+        self.midi_timer.start()
+        print(f"MIDI input started ({self.midi_port or 'default port'})")
+
+    def update_midi(self):
+        """定时器回调：按住的音有变化时同步高亮并识别和弦"""
+        if self.midi is None or self.midi.version == self.midi_version:
+            return
+        self.midi_version = self.midi.version
+        # 高亮实际发出该音高的琴键（MIDI 60 = C4 = 第 39 键）
+        indices = [k for k in map(midi_to_key, self.midi.notes) if 0 <= k < len(self.keys)]
+        notes = self.keys.notes_at(indices)
+        self.highlight_keys([n for n in self.pressed_keys if n not in notes], False)
+        self.highlight_keys(notes, True)
+        self.pressed_keys = notes
+        self.show_pressed_chord()
+        self.key_renderer.flush()
 
     def on_note_select(self, label):
         """处理音符选择"""
@@ -305,27 +319,27 @@ class PianoTeacher:
         self.highlight_keys(self.selected_keys, False)
         self.selected_keys = []
         
-        # 获取和弦音程
-        chord_type, chord_name = self.current_chord_type
-        if chord_type == 'triad':
-            intervals = self.triads[chord_name]
-        elif chord_type == 'seventh':
-            intervals = self.seventh_chords[chord_name]
-        else:
-            intervals = self.extended_chords[chord_name]
-        
-        # 计算和弦音符
-        root_index = next((i for i, k in enumerate(self.keys) 
-                          if k['note'] == self.current_root), None)
-        
+        # 在预先枚举的排列索引里查找（原位、密集排列；索引通常已在首帧后预热好）
+        from roughness import get_analyzer
+        from voicings import get_voicing_index
+
+        voicings = get_voicing_index()
+        _, chord_name = self.current_chord_type
+        root_index = self.key_index.index_of(self.current_root)
+        voicing = None
         if root_index is not None:
-            for interval in intervals:
-                note_index = root_index + interval
-                if 0 <= note_index < len(self.keys):
-                    self.selected_keys.append(self.keys[note_index]['note'])
+            voicing = voicings.find(chord_name, root_index)
+        
+        if voicing is not None:
+            indices = voicings.notes(voicing)
+            if voicings.bass[voicing] != root_index:
+                print(f"{self.current_root} {chord_name} 超出键盘范围，改用 "
+                      f"{voicings.describe(voicing, self.keys.notes)}")
+            self.selected_keys = self.keys.notes_at(indices)
             
-            # 高亮显示和弦音符
+            # 高亮显示和弦音符（与上面的清除合并为一帧）
             self.highlight_keys(self.selected_keys, True)
+            self.key_renderer.flush()
             
             # 播放和弦
             self.play_chord(self.selected_keys)
@@ -333,11 +347,81 @@ class PianoTeacher:
             # 显示和弦信息
             print(f"Playing chord: {self.current_root} {chord_name}")
             print(f"Notes: {', '.join(self.selected_keys)}")
+            print(f"Roughness: {get_analyzer().voicing(indices):.3f}")
+        else:
+            print(f"{self.current_root} {chord_name} 在 88 键内放不下")
+            self.key_renderer.flush()
+
+    def toggle_tuner(self, event=None):
+        """开关调音器"""
+        from tuner import Tuner
+
+        if self.tuner is not None:
+            self.tuner_timer.stop()
+            self.tuner.stop()
+            self.tuner = None
+            self.show_tuner_key(None, '')
+            print("Tuner stopped")
+            return
+        try:
+            self.tuner = Tuner(wav=self.tuner_wav).start()
+        except Exception as e:
+            self.tuner = None
+            print(f"Error starting tuner: {str(e)}")
+            return
+        self.tuner_timer.start()
+        print(f"Tuner started ({self.tuner_wav or 'microphone'})")
+
+    def show_tuner_key(self, index, label):
+        """高亮调音器检测到的键并更新读数，只重画变化的部分"""
+        if index != self.tuner_key:
+            previous = self.keys.notes[self.tuner_key] if self.tuner_key is not None else None
+            if previous is not None and previous not in self.selected_keys:
+                self.highlight_keys([previous], False)
+            if index is not None:
+                self.highlight_keys([self.keys.notes[index]], True)
+            self.tuner_key = index
+        self.tuner_text.set_text(f"{label:<24}")
+        self.key_renderer.mark(self.tuner_text)
+        self.key_renderer.flush()
+
+    def update_tuner(self):
+        """定时器回调：读取最新的音高"""
+        if self.tuner is None:
+            return
+        reading = self.tuner.current
+        if reading is None:
+            self.show_tuner_key(None, '--' if self.tuner.running else '')
+            return
+        freq, index, cents = reading
+        self.show_tuner_key(index, f"{key_name(index)} {freq:.1f}Hz {cents:+.0f}c")
+
+    def warm_up(self):
+        """首帧之后在后台加载和弦相关模块与缓存，并预渲染全部 88 个键的音色"""
+        from recognizer import get_recognizer
+        from voicings import get_voicing_index
+
+        get_voicing_index()  # 和弦排列（磁盘缓存）
+        get_recognizer()     # 和弦候选表
+        self.synth.notes(list(self.keys.freq), 'piano', 0.5, PIANO_ENVELOPE)
 
     def show(self):
         plt.show()
 
 if __name__ == "__main__":
+    profiler = StartupProfiler.from_argv()
+    profiler.mark('imports')
     print("Starting Piano Teacher")
-    piano = PianoTeacher()
+    tuner_wav = None
+    if '--tuner-wav' in sys.argv:
+        tuner_wav = sys.argv[sys.argv.index('--tuner-wav') + 1]
+    midi_port = None
+    if '--midi' in sys.argv:
+        i = sys.argv.index('--midi') + 1
+        midi_port = sys.argv[i] if i < len(sys.argv) and not sys.argv[i].startswith('--') else ''
+    piano = PianoTeacher(tuner_wav, midi_port)
+    if midi_port is not None:
+        piano.start_midi()
+    profiler.mark('build GUI')
+    after_first_paint(piano.fig, profiler, piano.warm_up)
     piano.show()
@@ -1,9 +1,17 @@
 #!/usr/bin/env python3
+from startup import StartupProfiler, after_first_paint
 import matplotlib.pyplot as plt
 import numpy as np
 from matplotlib.patches import Circle, Wedge
 from matplotlib.widgets import Button, RadioButtons
-import sounddevice as sd
+from blit import BlitLayer
+from circle import HoverPreview, IntervalLabels, PolarHitGrid
+from mixer import get_mixer
+from music_data import CIRCLE_CHORD_TYPES, INTERVAL_NAMES, ROMAN_NUMERALS
+from recognizer import get_recognizer
+from roughness import get_analyzer
+from synth import CHORD_ENVELOPE, NOTE_ENVELOPE, get_synth
+from theory import NOTE_NAMES, Chord, Note
 from matplotlib import font_manager
 
 # 设置中文字体支持
@@ -19,25 +27,9 @@ class TwelveToneCircle:
         self.ax = self.fig.add_subplot(111)
         plt.subplots_adjust(left=0.05, right=0.95, top=0.95, bottom=0.25)
         
-        self.roman_numerals = {
-            0: 'I', 1: 'II♭', 2: 'II', 3: 'III♭', 4: 'III', 5: 'IV',
-            6: 'V♭', 7: 'V', 8: 'VI♭', 9: 'VI', 10: 'VII♭', 11: 'VII'
-        }
-        
-        self.intervals = {
-            0: "Root (根音)",
-            1: "Minor 2nd (小二度)",
-            2: "Major 2nd (大二度)",
-            3: "Minor 3rd (小三度)",
-            4: "Major 3rd (大三度)",
-            5: "Perfect 4th (纯四度)",
-            6: "Tritone (三全音)",
-            7: "Perfect 5th (纯五度)",
-            8: "Minor 6th (小六度)",
-            9: "Major 6th (大六度)",
-            10: "Minor 7th (小七度)",
-            11: "Major 7th (大七度)"
-        }
+        # 级数与音程名（见 music_data，theory 中的 Interval 也用这两张表）
+        self.roman_numerals = ROMAN_NUMERALS
+        self.intervals = INTERVAL_NAMES
         
         self.degree_texts = {}
         self.high_octave_texts = {}  # 存储高八度音符文本
@@ -48,28 +40,33 @@ class TwelveToneCircle:
         self.ax.set_xlim(-1.7, 1.7)
         self.ax.set_ylim(-1.7, 1.7)
         
-        self.notes = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
+        self.notes = list(NOTE_NAMES)
         self.selected_notes = []
         self.note_objects = {}
         self.note_texts = {}
         
-        self.chord_types = {
-            'Major Triad (大三和弦)': [0, 4, 7],
-            'Minor Triad (小三和弦)': [0, 3, 7],
-            'Dim Triad (减三和弦)': [0, 3, 6],
-            'Aug Triad (增三和弦)': [0, 4, 8],
-            'Major 7th (大七和弦)': [0, 4, 7, 11],
-            'Minor 7th (小七和弦)': [0, 3, 7, 10],
-            'Dom 7th (属七和弦)': [0, 4, 7, 10]
-        }
+        self.chord_types = CIRCLE_CHORD_TYPES
         
         self.current_root = 'C'
         self.current_chord_type = None
         
+        # 共享合成器（波表 + 渲染缓存）
+        self.synth = get_synth()
+        self.mixer = get_mixer(self.synth.sample_rate)
+        
+        # 动态图层：高亮、级数和音程标签都是常驻 artist，变化时只重画这一层
+        self.layer = BlitLayer(self.ax)
+        self.interval_labels = IntervalLabels(self.ax, self.intervals, self.layer)
+        # 所选音识别出的和弦（第一个选中的音作低音），左上角
+        self.chord_text = self.ax.text(0.02, 0.98, '', transform=self.ax.transAxes,
+                                       ha='left', va='top', fontsize=14, color='darkgreen')
+        self.layer.add(self.chord_text)
+        
         self.draw_circle()
         self.setup_controls()
         
         self.fig.canvas.mpl_connect('button_press_event', self.on_click)
+        self.fig.canvas.mpl_connect('motion_notify_event', self.on_hover)
         print("Initialization complete")
 
     def draw_circle(self):
@@ -91,6 +88,7 @@ class TwelveToneCircle:
             text = self.ax.text(x*1.15, y*1.15, note, ha='center', va='center',
                               fontsize=18, fontweight='bold')
             self.note_texts[note] = text
+            self.layer.add(wedge, text)
             
             # 高八度音符
             high_x = (radius + 0.4) * np.cos(np.radians(angle))
@@ -110,6 +108,13 @@ class TwelveToneCircle:
             
             print(f"Added note {note} at angle {angle}")
         
+        # 命中测试表：按楔形所在的半径带预先量化，点击和悬停都只查表
+        self.hit_grid = PolarHitGrid([(radius - 0.45, radius - 0.2, -1),   # 低八度
+                                      (radius - 0.2, radius + 0.2, 0),
+                                      (radius + 0.2, radius + 0.45, 1)])  # 高八度
+        self.hover = HoverPreview(self.ax, self.layer, self.hit_grid, self.notes,
+                                  self.intervals, self.roman_numerals)
+        
         self.update_degree_labels()
     def setup_controls(self):
         print("Setting up controls")
@@ -165,32 +170,15 @@ class TwelveToneCircle:
 
     def play_single_note(self, frequency):
         try:
-            sample_rate = 44100
-            duration = 0.3
-            t = np.linspace(0, duration, int(sample_rate * duration), False)
-            
-            tone = 0.2 * np.sin(2 * np.pi * frequency * t)
-            tone += 0.1 * np.sin(4 * np.pi * frequency * t)
-            tone += 0.05 * np.sin(6 * np.pi * frequency * t)
-            
-            attack = int(0.05 * sample_rate)
-            release = int(0.1 * sample_rate)
-            envelope = np.ones_like(t)
-            envelope[:attack] = np.linspace(0, 1, attack)
-            envelope[-release:] = np.linspace(1, 0, release)
-            
-            tone = tone * envelope * 0.5
+            # 波表合成，同一音高第二次点击直接命中缓存
+            tone = self.synth.note(frequency, 'soft_piano', 0.3, NOTE_ENVELOPE) * 0.5
             
-            sd.play(tone, sample_rate)
-            sd.wait()
+            self.mixer.play(tone)
         except Exception as e:
             print(f"Error playing sound: {str(e)}")
 
     def update_degree_labels(self):
-        for text in self.degree_texts.values():
-            text.remove()
-        self.degree_texts.clear()
-        
+        """级数标签常驻，换根音时只改文字"""
         radius = 1.5
         
         root_index = self.notes.index(self.current_root)
@@ -198,47 +186,55 @@ class TwelveToneCircle:
             interval = (i - root_index) % 12
             degree = self.roman_numerals[interval]
             
-            angle = 90 - i * 30
-            x = radius * np.cos(np.radians(angle))
-            y = radius * np.sin(np.radians(angle))
-            
-            text = self.ax.text(x, y, degree, ha='center', va='center',
-                               fontsize=14, color='darkblue',
-                               bbox=dict(facecolor='white', alpha=0.7))
-            self.degree_texts[note] = text
+            if note not in self.degree_texts:
+                angle = 90 - i * 30
+                x = radius * np.cos(np.radians(angle))
+                y = radius * np.sin(np.radians(angle))
+                
+                text = self.ax.text(x, y, degree, ha='center', va='center',
+                                   fontsize=14, color='darkblue',
+                                   bbox=dict(facecolor='white', alpha=0.7))
+                self.layer.add(text)
+                self.degree_texts[note] = text
+            else:
+                self.degree_texts[note].set_text(degree)
         
-        self.fig.canvas.draw()
+        self.layer.mark()
 
     def on_root_select(self, note):
         print(f"Root note changed to {note}")
-        for button in self.root_buttons:
-            if button.label.get_text() == note:
-                button.color = 'yellow'
-                button.ax.set_facecolor('yellow')
-            else:
-                button.color = 'white'
-                button.ax.set_facecolor('white')
+        changed = self.select_button(self.root_buttons, note)
         
         self.current_root = note
         self.update_degree_labels()
+        self.hover.refresh(self.notes.index(note))
         
         if self.current_chord_type:
             self.update_chord()
-        self.fig.canvas.draw_idle()
+        # 圆上的变化和按钮颜色合成一帧
+        self.layer.mark(*changed)
+        self.layer.flush()
 
     def on_chord_select(self, chord_type):
         print(f"Chord type changed to {chord_type}")
-        for button in self.chord_buttons:
-            if button.label.get_text() == chord_type:
-                button.color = 'yellow'
-                button.ax.set_facecolor('yellow')
-            else:
-                button.color = 'white'
-                button.ax.set_facecolor('white')
+        changed = self.select_button(self.chord_buttons, chord_type)
         
         self.current_chord_type = chord_type
         self.update_chord()
-        self.fig.canvas.draw_idle()
+        self.layer.mark(*changed)
+        self.layer.flush()
+
+    @staticmethod
+    def select_button(buttons, label):
+        """选中的按钮标黄、其余标白，返回颜色有变化的按钮 Axes"""
+        changed = []
+        for button in buttons:
+            color = 'yellow' if button.label.get_text() == label else 'white'
+            if button.color != color:
+                button.color = color
+                button.ax.set_facecolor(color)
+                changed.append(button.ax)
+        return changed
 
     def update_chord(self):
         print(f"Updating chord: {self.current_root} {self.current_chord_type}")
@@ -249,13 +245,8 @@ class TwelveToneCircle:
         if not self.current_chord_type:
             return
 
-        intervals = self.chord_types[self.current_chord_type]
-        
-        root_index = self.notes.index(self.current_root)
-        chord_notes = []
-        for interval in intervals:
-            note_index = (root_index + interval) % 12
-            chord_notes.append(self.notes[note_index])
+        chord = Chord(self.current_root, self.current_chord_type)
+        chord_notes = [note.name for note in chord.notes]
         
         self.selected_notes = chord_notes
         for note in chord_notes:
@@ -263,37 +254,19 @@ class TwelveToneCircle:
         
         self.update_interval_labels()
         print(f"Updated chord: {chord_notes}")
-        self.fig.canvas.draw()
+        roughness = get_analyzer().pitch_classes([note.pc for note in chord.notes])
+        print(f"Roughness: {roughness:.3f}")
 
     def play_chord(self, event):
         if not self.selected_notes:
             return
         
         try:
-            sample_rate = 44100
-            duration = 1.0
-            t = np.linspace(0, duration, int(sample_rate * duration), False)
-            
-            chord = np.zeros_like(t)
-            for note in self.selected_notes:
-                note_index = self.notes.index(note)
-                base_freq = 440 * 2**((note_index - self.notes.index('A')) / 12)
-                
-                chord += 0.2 * np.sin(2 * np.pi * base_freq * t)
-                chord += 0.1 * np.sin(4 * np.pi * base_freq * t)
-                chord += 0.05 * np.sin(6 * np.pi * base_freq * t)
+            freqs = [Note(note).frequency() for note in self.selected_notes]
             
-            attack = int(0.1 * sample_rate)
-            release = int(0.2 * sample_rate)
-            envelope = np.ones_like(t)
-            envelope[:attack] = np.linspace(0, 1, attack)
-            envelope[-release:] = np.linspace(1, 0, release)
+            chord = self.synth.chord(freqs, 'soft_piano', 1.0, CHORD_ENVELOPE, peak=0.5)
             
-            chord = chord * envelope
-            chord = chord / np.max(np.abs(chord)) * 0.5
-            
-            sd.play(chord, sample_rate)
-            sd.wait()
+            self.mixer.play(chord)
             
         except Exception as e:
             print(f"Error playing sound: {str(e)}")
@@ -316,84 +289,54 @@ class TwelveToneCircle:
             text.set_fontsize(18)
             wedge.set_edgecolor('black')
             wedge.set_linewidth(1)
-            
-        self.fig.canvas.draw()
+        
+        self.layer.mark()
 
     def update_interval_labels(self):
-        # 保存当前所有的文本对象
-        texts_to_keep = []
-        for txt in self.ax.texts:
-            text_content = txt.get_text()
-            # 保留音符名称（包括带点的）、罗马数字和高低八度音符
-            if (any(note in text_content for note in self.notes) or 
-                text_content in self.roman_numerals.values() or
-                '\u0307' in text_content or  # 高八度点
-                '\u0323' in text_content):   # 低八度点
-                texts_to_keep.append(txt)
-            else:
-                txt.remove()
-        
-        # 清空文本对象列表并重新添加要保留的文本
-        self.ax.texts.clear()
-        for txt in texts_to_keep:
-            self.ax.texts.append(txt)
-        
+        """只切换变化的音程标签（根音不在所选音中时以第一个选中的音为根），并识别和弦"""
+        matches = ()
+        if len(self.selected_notes) > 1:
+            matches = get_recognizer().recognize(self.selected_notes, bass=self.selected_notes[0],
+                                                 limit=3)
+        text = '\n'.join([matches[0].label, *(f"or {m.label}" for m in matches[1:])]) if matches else ''
+        if text != self.chord_text.get_text():
+            self.chord_text.set_text(text)
+            self.layer.mark()
+        if matches:
+            print(f"Selected notes form: {matches[0].describe()}")
         if len(self.selected_notes) > 1:
             root = self.current_root if self.current_root in self.selected_notes else self.selected_notes[0]
-            root_index = self.notes.index(root)
-            
-            for note in self.selected_notes:
-                if note != root:
-                    interval = (self.notes.index(note) - root_index) % 12
-                    interval_name = self.intervals[interval]
-                    
-                    angle1 = 90 - self.notes.index(root) * 30
-                    angle2 = 90 - self.notes.index(note) * 30
-                    mid_angle = (angle1 + angle2) / 2
-                    
-                    x = 0.5 * np.cos(np.radians(mid_angle))
-                    y = 0.5 * np.sin(np.radians(mid_angle))
-                    
-                    self.ax.text(x, y, interval_name, ha='center', va='center',
-                               fontsize=12, color='blue',
-                               bbox=dict(facecolor='white', alpha=0.7))
-        
-        self.fig.canvas.draw()
+            self.interval_labels.update(self.notes.index(root),
+                                        [self.notes.index(n) for n in self.selected_notes])
+        else:
+            self.interval_labels.clear()
 
     def on_click(self, event):
         if event.inaxes != self.ax:
             return
         
-        r = np.sqrt(event.xdata**2 + event.ydata**2)
-        angle = np.degrees(np.arctan2(event.ydata, event.xdata))
-        angle = (90 - angle) % 360
-        
-        click_tolerance = 15
-        radius_min = 0.45
-        radius_max = 1.35
-        
-        if radius_min <= r <= radius_max:
-            note_angle = int((angle + click_tolerance/2) / 30) % 12
-            note = self.notes[note_angle]
-            
-            octave = 0
-            if r > 1.1:  # 高八度
-                octave = 1
-            elif r < 0.7:  # 低八度
-                octave = -1
-            
-            note_index = self.notes.index(note)
-            freq = 440 * 2**((note_index - self.notes.index('A')) / 12 + octave)
-            self.play_single_note(freq)
-            
-            if -0.5 < octave < 0.5:  # 只有主圈的音符可以被选中
-                if note in self.selected_notes:
-                    self.selected_notes.remove(note)
-                    self.highlight_note(note, False)
-                else:
-                    self.selected_notes.append(note)
-                    self.highlight_note(note, True)
-                self.update_interval_labels()
+        hit = self.hit_grid.lookup(event.xdata, event.ydata)
+        if hit is None:
+            return
+        note_index, octave, freq = hit
+        note = self.notes[note_index]
+        self.play_single_note(freq)
+        
+        if octave == 0:  # 只有主圈的音符可以被选中
+            if note in self.selected_notes:
+                self.selected_notes.remove(note)
+                self.highlight_note(note, False)
+            else:
+                self.selected_notes.append(note)
+                self.highlight_note(note, True)
+            self.update_interval_labels()
+            self.layer.flush()
+
+    def on_hover(self, event):
+        """鼠标移动：查表得到悬停的音，变化时才重画"""
+        x, y = (event.xdata, event.ydata) if event.inaxes == self.ax else (None, None)
+        if self.hover.update(x, y, self.notes.index(self.current_root)):
+            self.layer.flush()
 
     def clear_selection(self, event):
         for note in self.selected_notes:
@@ -401,32 +344,43 @@ class TwelveToneCircle:
         self.selected_notes = []
         self.update_interval_labels()
         
-        if self.current_chord_type:
-            for button in self.chord_buttons:
-                if button.label.get_text() == self.current_chord_type:
-                    button.color = 'white'
-                    button.ax.set_facecolor('white')
+        changed = self.select_button(self.chord_buttons, None)
         self.current_chord_type = None
         
         self.update_degree_labels()
-        self.fig.canvas.draw()
+        self.layer.mark(*changed)
+        self.layer.flush()
+
+    def warm_up(self):
+        """测试音频输出（不阻塞界面），并预渲染每个音符的音色"""
+        try:
+            print("Testing sound system...")
+            t = np.arange(int(0.1 * self.synth.sample_rate)) / self.synth.sample_rate
+            self.mixer.play(np.sin(2 * np.pi * 440 * t))
+            print("Sound test successful")
+        except Exception as e:
+            print(f"Sound test failed: {str(e)}")
+        
+        get_recognizer()  # 和弦候选表
+        
+        a_index = self.notes.index('A')
+        freqs = [440 * 2**((i - a_index) / 12 + octave)
+                 for octave in (-1, 0, 1) for i in range(len(self.notes))]
+        self.synth.notes(freqs, 'soft_piano', 0.3, NOTE_ENVELOPE)
+        self.synth.notes(freqs, 'soft_piano', 1.0, CHORD_ENVELOPE)
 
     def show(self):
         plt.show()
 
 if __name__ == "__main__":
+    profiler = StartupProfiler.from_argv()
+    profiler.mark('imports')
     print("Starting program")
     try:
-        print("Testing sound system...")
-        test_duration = 0.1
-        test_sample_rate = 44100
-        test_tone = np.sin(2 * np.pi * 440 * np.linspace(0, test_duration, 
-                          int(test_sample_rate * test_duration)))
-        sd.play(test_tone, test_sample_rate)
-        sd.wait()
-        print("Sound test successful")
-        
         circle = TwelveToneCircle()
+        profiler.mark('build GUI')
+        # 声音测试与缓存预热放到窗口显示之后的后台线程
+        after_first_paint(circle.fig, profiler, circle.warm_up)
         circle.show()
     except Exception as e:
         print(f"Error: {str(e)}")
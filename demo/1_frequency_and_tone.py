@@ -1,13 +1,17 @@
 #!/usr/bin/env python3
+from startup import StartupProfiler, after_first_paint
 import math
 import matplotlib.pyplot as plt
 from matplotlib.widgets import RadioButtons, CheckButtons
 import numpy as np
-import sounddevice as sd
-
-def test_sound():
-    """测试音频输出"""
-    sample_rate = 44100
+from mixer import get_mixer
+from music_data import SCALES
+from theory import NOTE_NAMES, Scale
+from synth import DRUM_ENVELOPE, TONE_ENVELOPE, get_synth
+
+def test_sound(mixer):
+    """测试音频输出（不阻塞）"""
+    sample_rate = mixer.sample_rate
     duration = 0.5
     frequency = 440  # A4音高
 
@@ -15,24 +19,27 @@ def test_sound():
     tone = np.sin(2 * np.pi * frequency * t) * 0.3
     
     print("Testing sound output (A4 - 440Hz)")
-    sd.play(tone, sample_rate)
-    sd.wait()
+    mixer.play(tone)
 
 class FrequencyPlotter:
     def __init__(self):
         # 基本参数
-        self.NOTES = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
+        self.NOTES = list(NOTE_NAMES)
         self.show_all_notes = False
         self.current_scale = None
         self.current_root = 'C'
         
         # 添加音色选项
         self.TIMBRES = ['Piano', 'Guitar', 'Synth', 'Drum']
+        self.TIMBRE_KEYS = {'Piano': 'bright_piano', 'Guitar': 'guitar',
+                            'Synth': 'synth', 'Drum': 'drum'}
         self.current_timbre = 'Piano'
         
         # 音频参数
         self.sample_rate = 44100
         self.duration = 0.5
+        self.synth = get_synth(self.sample_rate)
+        self.mixer = get_mixer(self.sample_rate)
         
         # 创建图形
         self.fig = plt.figure(figsize=(15, 10))
@@ -109,101 +116,36 @@ class FrequencyPlotter:
         self.fig.canvas.mpl_connect('button_press_event', self.on_plot_click)
         print("Audio events setup completed")
 
-    def generate_piano_tone(self, frequency, t):
-        """钢琴音色"""
-        tone = np.sin(2 * np.pi * frequency * t) * 0.5
-        tone += np.sin(4 * np.pi * frequency * t) * 0.25
-        tone += np.sin(6 * np.pi * frequency * t) * 0.125
-        return tone
-
-    def generate_guitar_tone(self, frequency, t):
-        """吉他音色"""
-        tone = np.sin(2 * np.pi * frequency * t) * 0.5
-        # 添加更多泛音
-        for i in range(2, 6):
-            tone += np.sin(2 * np.pi * frequency * i * t) * (0.25 / i)
-        # 添加特征性的衰减
-        decay = np.exp(-3 * t)
-        return tone * decay
-
-    def generate_synth_tone(self, frequency, t):
-        """电子琴音色"""
-        # 锯齿波
-        sawtooth = 2 * (frequency * t - np.floor(0.5 + frequency * t))
-        # 方波
-        square = np.sign(np.sin(2 * np.pi * frequency * t))
-        # 混合
-        tone = sawtooth * 0.3 + square * 0.2
-        return tone
-
-    def generate_drum_tone(self, frequency, t):
-        """鼓声音色"""
-        # 使用噪声和快速衰减
-        noise = np.random.rand(len(t)) * 2 - 1
-        decay = np.exp(-30 * t)
-        tone = noise * decay
-        return tone
-
     def play_tone(self, frequency):
         """生成并播放音调，包含音色选择"""
-        duration = self.duration
-        sample_rate = self.sample_rate
-        t = np.linspace(0, duration, int(sample_rate * duration), False)
-        
-        # 根据选择的音色生成音调
-        if self.current_timbre == 'Piano':
-            tone = self.generate_piano_tone(frequency, t)
-        elif self.current_timbre == 'Guitar':
-            tone = self.generate_guitar_tone(frequency, t)
-        elif self.current_timbre == 'Synth':
-            tone = self.generate_synth_tone(frequency, t)
-        elif self.current_timbre == 'Drum':
-            tone = self.generate_drum_tone(frequency, t)
-        
-        # ADSR包络参数
-        if self.current_timbre == 'Drum':
-            attack, decay = 0.01, 0.1
-            sustain_level, release = 0.3, 0.1
-        else:
-            attack, decay = 0.05, 0.1
-            sustain_level, release = 0.7, 0.1
-        
-        # 创建ADSR包络
-        attack_samples = int(attack * sample_rate)
-        decay_samples = int(decay * sample_rate)
-        release_samples = int(release * sample_rate)
-        
-        envelope = np.ones(len(t))
-        envelope[:attack_samples] = np.linspace(0, 1, attack_samples)
-        envelope[attack_samples:attack_samples+decay_samples] = \
-            np.linspace(1, sustain_level, decay_samples)
-        envelope[attack_samples+decay_samples:-release_samples] = sustain_level
-        envelope[-release_samples:] = np.linspace(sustain_level, 0, release_samples)
-        
-        # 应用包络
-        tone = tone * envelope * 0.3
+        # 波表合成 + 缓存，鼓声使用更短促的包络
+        timbre = self.TIMBRE_KEYS[self.current_timbre]
+        envelope = DRUM_ENVELOPE if self.current_timbre == 'Drum' else TONE_ENVELOPE
+        tone = self.synth.note(frequency, timbre, self.duration, envelope) * 0.3
         
         print(f"Playing {self.current_timbre} tone: {frequency:.1f} Hz")
-        sd.play(tone, sample_rate)
-        sd.wait()
+        self.mixer.play(tone)
 
     def get_scale_semitones(self, scale_type='major', root='C'):
         """获取音阶的半音序列"""
         if scale_type is None or scale_type.lower() == 'none':
             return []
             
-        scales = {
-            'major': [0, 2, 4, 5, 7, 9, 11],
-            'minor': [0, 2, 3, 5, 7, 8, 10],
-            'chromatic': list(range(12))
-        }
-        
-        if scale_type.lower() not in scales:
+        if scale_type.lower() not in SCALES:
             return []
             
-        root_offset = self.NOTES.index(root.upper())
-        scale_pattern = scales[scale_type.lower()]
-        return [(x + root_offset) % 12 for x in scale_pattern]
+        return Scale(root, scale_type).pitch_classes
+
+    def notes_to_show(self):
+        """当前显示的音（与 A4 的半音距离）：音阶内的音用掩码判断"""
+        if self.current_scale and self.current_scale.lower() != 'none':
+            if self.current_scale.lower() not in SCALES:
+                return []
+            mask = Scale(self.current_root, self.current_scale).mask
+            return [n for n in self.n_values if mask >> ((n + 9) % 12) & 1]
+        if self.show_all_notes:
+            return self.n_values
+        return list(range(-48, 40, 12))
 
     def get_note_name(self, semitones_from_a4):
         """根据与A4的半音距离获取音符名称"""
@@ -216,14 +158,7 @@ class FrequencyPlotter:
         x_tolerance = 1.0
         y_tolerance_percentage = 0.1
         
-        notes_to_show = []
-        if self.current_scale and self.current_scale.lower() != 'none':
-            scale_semitones = self.get_scale_semitones(self.current_scale, self.current_root)
-            notes_to_show = [n for n in self.n_values if (n + 9) % 12 in scale_semitones]
-        elif self.show_all_notes:
-            notes_to_show = self.n_values
-        else:
-            notes_to_show = list(range(-48, 40, 12))
+        notes_to_show = self.notes_to_show()
 
         clicked_freq = 440 * math.pow(2, x/12)
         closest_note = None
@@ -281,14 +216,7 @@ class FrequencyPlotter:
         for artist in self.ax.texts[:]:
             artist.remove()
 
-        notes_to_show = []
-        if self.current_scale and self.current_scale.lower() != 'none':
-            scale_semitones = self.get_scale_semitones(self.current_scale, self.current_root)
-            notes_to_show = [n for n in self.n_values if (n + 9) % 12 in scale_semitones]
-        elif self.show_all_notes:
-            notes_to_show = self.n_values
-        else:
-            notes_to_show = list(range(-48, 40, 12))
+        notes_to_show = self.notes_to_show()
 
         if notes_to_show:
             frequencies_to_show = [440 * math.pow(2, n/12) for n in notes_to_show]
@@ -338,13 +266,24 @@ class FrequencyPlotter:
         self.current_timbre = label
         print(f"Changed timbre to: {label}")
 
+    def warm_up(self):
+        """窗口显示后：测试音频输出，并预渲染所有音色的 88 个音"""
+        try:
+            test_sound(self.mixer)
+        except Exception as e:
+            print(f"Sound test failed: {str(e)}")
+        for label, timbre in self.TIMBRE_KEYS.items():
+            envelope = DRUM_ENVELOPE if label == 'Drum' else TONE_ENVELOPE
+            self.synth.notes(self.frequencies, timbre, self.duration, envelope)
+
     def show(self):
         plt.show()
 
 if __name__ == "__main__":
-    print("Testing sound output...")
-    test_sound()
-    
+    profiler = StartupProfiler.from_argv()
+    profiler.mark('imports')
     print("Initializing frequency plotter...")
     plotter = FrequencyPlotter()
+    profiler.mark('build GUI')
+    after_first_paint(plotter.fig, profiler, plotter.warm_up)
     plotter.show()
@@ -1,9 +1,8 @@
 #!/usr/bin/env python3
 
 import numpy as np
-import soundfile as sf
-from scipy import signal
 import matplotlib.pyplot as plt
+from gain_stream import Gain, Volume, process_file
 
 def apply_gain(audio_data, gain_db):
     """
@@ -34,19 +33,20 @@ def main():
     frequency = 1000
     audio_signal = np.sin(2 * np.pi * frequency * t)
 
-    # 2. 应用不同的增益值
+    # 2. 应用不同的增益值（只处理要画出来的前 1000 个采样）
     gain_db_positive = 6  # +6dB增益
     gain_db_negative = -6  # -6dB增益
+    preview = audio_signal[:1000]
     
-    audio_gain_up = apply_gain(audio_signal, gain_db_positive)
-    audio_gain_down = apply_gain(audio_signal, gain_db_negative)
+    audio_gain_up = apply_gain(preview, gain_db_positive)
+    audio_gain_down = apply_gain(preview, gain_db_negative)
 
     # 3. 应用不同的音量值
     volume_up = 0.8    # 80%音量
     volume_down = 0.2  # 20%音量
     
-    audio_vol_up = apply_volume(audio_signal, volume_up)
-    audio_vol_down = apply_volume(audio_signal, volume_down)
+    audio_vol_up = apply_volume(preview, volume_up)
+    audio_vol_down = apply_volume(preview, volume_down)
 
     # 4. 绘制波形对比图
     plt.figure(figsize=(15, 10))
@@ -79,12 +79,17 @@ def main():
     plt.tight_layout()
     plt.show()
 
-    # 5. 保存音频文件
+    # 5. 保存音频文件（soundfile 只在这里用到，延迟导入）
+    import soundfile as sf
     sf.write('original.wav', audio_signal, sample_rate)
-    sf.write('gain_up.wav', audio_gain_up, sample_rate)
-    sf.write('gain_down.wav', audio_gain_down, sample_rate)
-    sf.write('volume_up.wav', audio_vol_up, sample_rate)
-    sf.write('volume_down.wav', audio_vol_down, sample_rate)
+    
+    # 按块流式处理，一遍读完同时写出四个文件；长录音同样适用
+    process_file('original.wav', {
+        'gain_up.wav': [Gain(gain_db_positive)],
+        'gain_down.wav': [Gain(gain_db_negative)],
+        'volume_up.wav': [Volume(volume_up)],
+        'volume_down.wav': [Volume(volume_down)],
+    })
 
 if __name__ == "__main__":
     main()
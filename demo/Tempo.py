@@ -1,8 +1,12 @@
 #!/usr/bin/env python3
+from startup import StartupProfiler, after_first_paint
 import matplotlib.pyplot as plt
 import numpy as np
 from matplotlib.widgets import Button, RadioButtons, Slider
-import sounddevice as sd
+from metronome import KITS, SUBDIVISIONS, ClickScheduler, get_click_bank
+from mixer import get_mixer
+from music_data import LESSONS
+from timing import TimingScorer
 from matplotlib.patches import Rectangle, Circle, Arrow
 import threading
 import time
@@ -24,45 +28,8 @@ class RhythmTeacher:
         self.practice_ax = self.fig.add_subplot(self.gs[1, 0])  # 练习区
         self.score_ax = self.fig.add_subplot(self.gs[1, 1])    # 评分区
         
-        # 课程内容
-        self.lessons = {
-            "基础节拍": {
-                "theory": [
-                    "节拍是音乐的心跳",
-                    "基本拍子：2/4, 3/4, 4/4",
-                    "强拍和弱拍的概念"
-                ],
-                "exercises": [
-                    {"name": "单拍练习", "pattern": [1]},
-                    {"name": "强弱拍练习", "pattern": [1, 0]},
-                    {"name": "四拍子练习", "pattern": [1, 0, 0.5, 0]}
-                ]
-            },
-            "常见节奏型": {
-                "theory": [
-                    "行进曲：| ♩ ♩ | ♩ ♩ |",
-                    "圆舞曲：| ♩ ♪ ♪ | ♩ ♪ ♪ |",
-                    "伦巴：  | ♩ ♪♪ ♩ | ♩ ♪♪ ♩ |"
-                ],
-                "exercises": [
-                    {"name": "行进曲练习", "pattern": [1, 1, 1, 1]},
-                    {"name": "圆舞曲练习", "pattern": [1, 0.5, 0.5]},
-                    {"name": "伦巴练习", "pattern": [1, 0.5, 0.5, 1]}
-                ]
-            },
-            "复合拍子": {
-                "theory": [
-                    "6/8拍：两个主要重拍",
-                    "切分音：重音位置改变",
-                    "混合拍子：如5/4, 7/8"
-                ],
-                "exercises": [
-                    {"name": "6/8练习", "pattern": [1, 0, 0, 0.5, 0, 0]},
-                    {"name": "切分音练习", "pattern": [0.5, 1, 0.5]},
-                    {"name": "5/4练习", "pattern": [1, 0, 1, 0, 0]}
-                ]
-            }
-        }
+        # 课程内容（见 music_data.LESSONS）
+        self.lessons = LESSONS
         
         self.current_lesson = "基础节拍"
         self.current_exercise = 0
@@ -70,7 +37,12 @@ class RhythmTeacher:
         self.play_thread = None
         self.tempo = 90  # 默认速度
         self.score = 0
-        self.user_hits = []
+        self.scorer = TimingScorer([1], self.tempo)
+        self.mixer = get_mixer()
+        # 点击音在音库里预渲染好，调度线程只查表叠加
+        self.click_kit = 'beep'
+        self.click_bank = get_click_bank(self.click_kit, self.mixer.sample_rate)
+        self.metronome = ClickScheduler(self.click_bank, self.mixer.sample_rate)
         
         self.setup_gui()
         self.update_display()
@@ -104,6 +76,15 @@ class RhythmTeacher:
         play_ax = plt.axes([0.1, 0.15, 0.15, 0.05])
         self.play_button = Button(play_ax, 'Play', color='lightgreen')
         self.play_button.on_clicked(self.toggle_play)
+        
+        # 点击音色与细分
+        kit_ax = plt.axes([0.28, 0.08, 0.12, 0.14])
+        self.kit_radio = RadioButtons(kit_ax, list(KITS))
+        self.kit_radio.on_clicked(self.change_kit)
+        
+        subdivision_ax = plt.axes([0.1, 0.02, 0.15, 0.11])
+        self.subdivision_radio = RadioButtons(subdivision_ax, list(SUBDIVISIONS))
+        self.subdivision_radio.on_clicked(self.change_subdivision)
 
     def update_display(self):
         # 更新理论显示
@@ -128,7 +109,8 @@ class RhythmTeacher:
         # 更新评分显示
         self.update_score()
         
-        self.fig.canvas.draw()
+        # 合并到下一次空闲重绘，启动时不会在窗口显示前多画一遍
+        self.fig.canvas.draw_idle()
 
     def draw_rhythm_circle(self, pattern):
         n_beats = len(pattern)
@@ -151,34 +133,20 @@ class RhythmTeacher:
     def on_key_press(self, event):
         """处理键盘输入（空格键打拍子）"""
         if event.key == ' ' and self.is_playing:
-            self.user_hits.append(time.time())
-            self.evaluate_timing()
+            self.evaluate_timing(time.perf_counter())
+
+    def evaluate_timing(self, hit_time):
+        """评估用户打拍准确性（增量匹配，每次敲击 O(log n)）
 
-    def evaluate_timing(self):
-        """评估用户打拍准确性"""
-        if not self.user_hits:
+        敲击换算到节拍器的采样时钟上，网格与实际发声的点击同相（含换速）。
+        """
+        clock = self.metronome.clock_time(hit_time)
+        if clock is None:
+            return
+        if self.scorer.add_hit(clock - self.mixer.output_latency) is None:
             return
         
-        pattern = self.lessons[self.current_lesson]["exercises"][self.current_exercise]["pattern"]
-        beat_interval = 60.0 / self.tempo
-        
-        # 计算期望的打拍时间
-        expected_times = []
-        base_time = self.user_hits[0]
-        for i, strength in enumerate(pattern):
-            if strength > 0:  # 只检查需要打拍的位置
-                expected_times.append(base_time + i * beat_interval)
-        
-        # 计算实际打拍与期望时间的差异
-        timing_errors = []
-        for hit in self.user_hits:
-            nearest_expected = min(expected_times, key=lambda x: abs(x - hit))
-            error = abs(hit - nearest_expected)
-            timing_errors.append(error)
-        
-        # 更新分数
-        avg_error = np.mean(timing_errors)
-        self.score = max(0, 100 - avg_error * 100)
+        self.score = self.scorer.score
         self.update_score()
 
     def update_score(self):
@@ -187,36 +155,29 @@ class RhythmTeacher:
         self.score_ax.set_title("练习评分", pad=20)
         self.score_ax.axis('off')
         
-        self.score_ax.text(0.5, 0.5, f'得分: {self.score:.1f}', 
+        self.score_ax.text(0.5, 0.7, f'得分: {self.score:.1f}', 
                           ha='center', va='center', fontsize=20)
+        
+        # 偏差、抢拍/拖拍、各强度拍点的准确度
+        for i, line in enumerate(self.scorer.summary()):
+            self.score_ax.text(0.5, 0.45 - i * 0.1, line,
+                              ha='center', va='center', fontsize=11)
 
     def play_rhythm(self):
-        """播放节拍器"""
+        """播放节拍器（节拍按采样位置调度，由声卡时钟决定，不受 sleep 抖动影响）"""
         pattern = self.lessons[self.current_lesson]["exercises"][self.current_exercise]["pattern"]
         
-        while self.is_playing:
-            for strength in pattern:
-                if not self.is_playing:
-                    break
-                    
-                if strength > 0:  # 只在需要声音的位置播放
-                    self.play_click(strength)
-                
-                time.sleep(60.0 / self.tempo)
-
-    def play_click(self, strength):
-        """生成并播放节拍声音"""
-        sample_rate = 44100
-        duration = 0.05
-        t = np.linspace(0, duration, int(sample_rate * duration), False)
-        
-        freq = 800 if strength < 1 else 440
-        click = np.sin(2 * np.pi * freq * t)
+        self.metronome.reset(pattern, self.tempo)
+        self.metronome.fill()
+        self.mixer.add_source(self.metronome)
         
-        envelope = np.exp(-10 * t)
-        click = click * envelope * strength * 0.5
+        # 这里的 sleep 只决定预渲染的节奏，节拍本身的位置早已确定
+        while self.is_playing:
+            self.metronome.fill()
+            time.sleep(self.metronome.poll_interval)
         
-        sd.play(click, sample_rate)
+        self.mixer.remove_source(self.metronome)
+        print(f"Metronome: {self.metronome.report()}")
 
     def toggle_play(self, event):
         """切换播放状态"""
@@ -229,7 +190,16 @@ class RhythmTeacher:
             self.play_button.label.set_text('Stop')
             self.play_button.color = 'lightcoral'
             
-            self.user_hits = []  # 重置用户打拍记录
+            # 重置打拍评分
+            pattern = self.lessons[self.current_lesson]["exercises"][self.current_exercise]["pattern"]
+            self.scorer.reset(pattern, self.tempo)
+            self.scorer.start(0.0)  # 网格起点 = 节拍器第 0 个采样
+            if self.metronome.click_fn is not self.click_bank:
+                self.metronome = ClickScheduler(
+                    self.click_bank, self.mixer.sample_rate,
+                    subdivision=SUBDIVISIONS[self.subdivision_radio.value_selected])
+            # 节拍器在小节边界真正换速时才给评分网格加速度段
+            self.metronome.on_tempo = self.scorer.set_tempo
             self.play_thread = threading.Thread(target=self.play_rhythm)
             self.play_thread.start()
         
@@ -241,14 +211,30 @@ class RhythmTeacher:
         self.current_exercise = 0
         self.update_display()
 
+    def change_kit(self, label):
+        """切换点击音色（音库按音色缓存，只在第一次选中时渲染）"""
+        self.click_kit = label
+        self.click_bank = get_click_bank(label, self.mixer.sample_rate)
+        if self.is_playing:
+            print("Click kit changes on next Play")
+
+    def change_subdivision(self, label):
+        """改变每拍细分（下一小节生效）"""
+        self.metronome.set_subdivision(SUBDIVISIONS[label])
+
     def change_tempo(self, val):
-        """改变速度"""
+        """改变速度（下一小节生效）"""
         self.tempo = val
+        self.metronome.set_tempo(val)
 
     def show(self):
         plt.show()
 
 if __name__ == "__main__":
+    profiler = StartupProfiler.from_argv()
+    profiler.mark('imports')
     print("Starting Rhythm Teacher")
     teacher = RhythmTeacher()
+    profiler.mark('build GUI')
+    after_first_paint(teacher.fig, profiler)
     teacher.show()
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""排练录音分析流水线：分块流式 STFT -> 琴键频段能量、chroma、起音强度，写进内存映射文件
+
+录音按帧对齐切成若干段交给进程池，每个进程用 SoundFile.seek 只读自己那一段，
+一块一块地读（块之间重叠 n_fft - hop 个采样），窗函数、FFT 输入输出、幅度、
+对数幅度等缓冲区都预先分配并反复使用（同长度的 FFT 计划由 pocketfft 缓存）。
+结果直接写进输出目录里的 .npy 内存映射，内存占用只和块大小、进程数有关，
+和录音长度、声道数无关。多声道文件的每个声道是一轨，分别分析。
+m4a 等 libsndfile 不支持的格式先用 ffmpeg 流式转成临时 w64 文件。
+
+输出目录（np.load(..., mmap_mode='r') 可以直接打开）:
+    meta.json       采样率、帧长、跳步、帧数、声道数
+    keys.npy        (声道, 帧, 88)    每个琴键频段的能量（键号约定见 keyboard：第 0 键 = A0）
+    chroma.npy      (声道, 帧, 12)    音级能量（C = 0）
+    onset.npy       (声道, 帧)        起音强度（对数幅度谱的正向差分之和）
+    spectrum.npy    (声道, 帧, 频点)  对数幅度谱 float16，只在 --spectrum 时写
+
+用法示例:
+    python analysis.py rehearsal.wav                 # 结果在 rehearsal.analysis/
+    python analysis.py rehearsal.wav --workers 8 --spectrum
+    python analysis.py --plot rehearsal.analysis --channel 2 --start 600 --end 660
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import json
+import os
+import subprocess
+import time
+
+import numpy as np
+
+from keyboard import frequency_to_key, key_frequency, key_pitch_class
+
+N_FFT = 4096
+HOP = 1024
+BLOCK_FRAMES = 256
+N_KEYS = 88
+CHROMA_RANGE = (55, 5000)
+
+
+class FrameAnalyzer:
+    """一块帧 -> 琴键频段能量、chroma、起音强度；所有工作缓冲区按 block_frames 预先分配"""
+
+    def __init__(self, sample_rate, n_fft=N_FFT, hop=HOP, block_frames=BLOCK_FRAMES):
+        self.sample_rate = sample_rate
+        self.n_fft = n_fft
+        self.hop = hop
+        self.block_frames = block_frames
+        self.n_bins = n_fft // 2 + 1
+        self.window = np.hanning(n_fft).astype(np.float32)
+
+        # 频点 -> 最近的琴键，超出键盘范围的频点不计入；
+        # 最低的一些键窄于频点间隔，没有分到频点的键取离它中心最近的频点
+        freqs = np.fft.rfftfreq(n_fft, 1 / sample_rate)
+        with np.errstate(divide='ignore'):
+            keys = np.rint(frequency_to_key(freqs))
+        inside = np.flatnonzero((keys >= 0) & (keys < N_KEYS))
+        self.key_fold = np.zeros((self.n_bins, N_KEYS), dtype=np.float32)
+        self.key_fold[inside, keys[inside].astype(np.int64)] = 1
+        key_freqs = key_frequency(np.arange(N_KEYS))
+        empty = np.flatnonzero(~self.key_fold.any(axis=0))
+        self.key_fold[np.rint(key_freqs[empty] * n_fft / sample_rate).astype(np.int64), empty] = 1
+        # 琴键 -> 音级
+        pitched = np.flatnonzero((key_freqs >= CHROMA_RANGE[0]) & (key_freqs <= CHROMA_RANGE[1]))
+        self.chroma_fold = np.zeros((N_KEYS, 12), dtype=np.float32)
+        self.chroma_fold[pitched, key_pitch_class(pitched)] = 1
+
+        self._windowed = np.empty((block_frames, n_fft), dtype=np.float32)
+        self._spectrum = np.empty((block_frames, self.n_bins), dtype=np.complex64)
+        self._mag = np.empty((block_frames, self.n_bins), dtype=np.float32)
+        self._log = np.empty((block_frames + 1, self.n_bins), dtype=np.float32)  # 第 0 行是上一帧
+        self._flux = np.empty((block_frames, self.n_bins), dtype=np.float32)
+
+    def _magnitude(self, frames):
+        n = len(frames)
+        windowed = self._windowed[:n]
+        np.multiply(frames, self.window, out=windowed)
+        spectrum = np.fft.rfft(windowed, axis=1, out=self._spectrum[:n])
+        return np.abs(spectrum, out=self._mag[:n])
+
+    def _log_magnitude(self, mag, out):
+        np.multiply(mag, 10, out=out)
+        return np.log1p(out, out=out)
+
+    def prime(self, frame, previous):
+        """段首：算出前一帧的对数幅度，写进 previous (频点,)"""
+        mag = self._magnitude(frame[None])
+        self._log_magnitude(mag[0], previous)
+
+    def process(self, frames, previous, keys_out, chroma_out, onset_out, spectrum_out=None):
+        """frames (n, n_fft) -> 写入各输出的 n 行；previous 是本声道上一帧的对数幅度（没有时为 None），
+        返回更新后的 previous"""
+        n = len(frames)
+        mag = self._magnitude(frames)
+        log = self._log_magnitude(mag, self._log[1:n + 1])
+        self._log[0] = log[0] if previous is None else previous
+
+        flux = self._flux[:n]
+        np.subtract(log, self._log[:n], out=flux)
+        np.maximum(flux, 0, out=flux)
+        flux.sum(axis=1, out=onset_out)
+        if spectrum_out is not None:
+            spectrum_out[:] = log
+
+        np.square(mag, out=mag)
+        np.matmul(mag, self.key_fold, out=keys_out)
+        np.matmul(keys_out, self.chroma_fold, out=chroma_out)
+        return log[-1]
+
+
+def frame_count(n_samples, n_fft=N_FFT, hop=HOP):
+    """帧 f 从第 f * hop 个采样开始；最后不足一帧的部分补零算一帧"""
+    return 1 + -(-max(n_samples - n_fft, 0) // hop)
+
+
+def _open_outputs(out_dir, mode):
+    outputs = {}
+    for name in ('keys', 'chroma', 'onset', 'spectrum'):
+        path = os.path.join(out_dir, f"{name}.npy")
+        if os.path.exists(path):
+            outputs[name] = np.load(path, mmap_mode=mode)
+    return outputs
+
+
+def _analyze_chunk(job):
+    """进程池任务：分析帧 [first, last) 并写进内存映射"""
+    import soundfile as sf
+
+    path, out_dir, first, last, n_fft, hop, block_frames = job
+    outputs = _open_outputs(out_dir, 'r+')
+    with sf.SoundFile(path) as f:
+        analyzer = FrameAnalyzer(f.samplerate, n_fft, hop, block_frames)
+        channels = f.channels
+        overlap = n_fft - hop
+        span = block_frames * hop + overlap
+        block = np.zeros((span, channels), dtype=np.float32)      # 交错的原始采样
+        planar = np.zeros((channels, span), dtype=np.float32)     # 按声道连续，分帧用
+        previous = np.zeros((channels, analyzer.n_bins), dtype=np.float32)
+        spectrum = outputs.get('spectrum')
+
+        if first > 0:
+            f.seek((first - 1) * hop)
+            f.read(n_fft, dtype='float32', always_2d=True, out=block[:n_fft], fill_value=0)
+            planar[:, :n_fft] = block[:n_fft].T
+            for ch in range(channels):
+                analyzer.prime(planar[ch, :n_fft], previous[ch])
+
+        f.seek(first * hop)
+        f.read(overlap, dtype='float32', always_2d=True, out=block[:overlap], fill_value=0)
+        frame = first
+        while frame < last:
+            n = min(block_frames, last - frame)
+            filled = overlap + n * hop
+            f.read(n * hop, dtype='float32', always_2d=True, out=block[overlap:filled],
+                   fill_value=0)
+            planar[:, :filled] = block[:filled].T
+            for ch in range(channels):
+                frames = np.lib.stride_tricks.sliding_window_view(planar[ch, :filled], n_fft)[::hop]
+                previous[ch] = analyzer.process(
+                    frames[:n], previous[ch] if frame > 0 else None,
+                    outputs['keys'][ch, frame:frame + n], outputs['chroma'][ch, frame:frame + n],
+                    outputs['onset'][ch, frame:frame + n],
+                    None if spectrum is None else spectrum[ch, frame:frame + n])
+            block[:overlap] = block[filled - overlap:filled]
+            frame += n
+
+    for array in outputs.values():
+        array.flush()
+    return last - first
+
+
+def _to_w64(path, out_dir):
+    """libsndfile 读不了的格式：ffmpeg 流式转成 32 位浮点 w64（不经过内存）"""
+    tmp = os.path.join(out_dir, 'decoded.w64')
+    try:
+        subprocess.run(['ffmpeg', '-v', 'error', '-y', '-i', path, '-c:a', 'pcm_f32le',
+                        '-f', 'w64', tmp], check=True)
+    except FileNotFoundError:
+        raise RuntimeError(f"ffmpeg is required to decode {os.path.basename(path)}")
+    return tmp
+
+
+def analyze(path, out_dir=None, workers=None, n_fft=N_FFT, hop=HOP, block_frames=BLOCK_FRAMES,
+            spectrum=False, progress=None):
+    """分析整段录音，结果写进 out_dir（默认是录音旁边的 <名字>.analysis），返回 Analysis"""
+    import soundfile as sf
+
+    out_dir = out_dir or os.path.splitext(path)[0] + '.analysis'
+    os.makedirs(out_dir, exist_ok=True)
+    source, temporary = path, None
+    try:
+        sf.info(source)
+    except sf.LibsndfileError:
+        source = temporary = _to_w64(path, out_dir)
+
+    try:
+        info = sf.info(source)
+        n_frames = frame_count(info.frames, n_fft, hop)
+        n_bins = n_fft // 2 + 1
+        channels = info.channels
+        shapes = {'keys': (channels, n_frames, N_KEYS), 'chroma': (channels, n_frames, 12),
+                  'onset': (channels, n_frames)}
+        if spectrum:
+            shapes['spectrum'] = (channels, n_frames, n_bins)
+        for name in ('keys', 'chroma', 'onset', 'spectrum'):
+            target = os.path.join(out_dir, f"{name}.npy")
+            if name in shapes:
+                np.lib.format.open_memmap(target, mode='w+', shape=shapes[name],
+                                          dtype=np.float16 if name == 'spectrum' else np.float32)
+            elif os.path.exists(target):
+                os.remove(target)
+
+        # 每个进程分到几段，段长取 block_frames 的整数倍
+        workers = workers or os.cpu_count() or 1
+        chunk = -(-n_frames // (4 * workers))
+        chunk = max(block_frames, -(-chunk // block_frames) * block_frames)
+        jobs = [(source, out_dir, first, min(first + chunk, n_frames), n_fft, hop, block_frames)
+                for first in range(0, n_frames, chunk)]
+        done = 0
+        if workers == 1 or len(jobs) == 1:
+            for job in jobs:
+                done += _analyze_chunk(job)
+                if progress:
+                    progress(done, n_frames)
+        else:
+            with ProcessPoolExecutor(min(workers, len(jobs))) as pool:
+                for future in as_completed([pool.submit(_analyze_chunk, job) for job in jobs]):
+                    done += future.result()
+                    if progress:
+                        progress(done, n_frames)
+    finally:
+        if temporary is not None:
+            os.remove(temporary)
+
+    meta = {'source': os.path.abspath(path), 'sample_rate': info.samplerate, 'n_fft': n_fft,
+            'hop': hop, 'frames': n_frames, 'channels': channels,
+            'duration': info.frames / info.samplerate}
+    with open(os.path.join(out_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+    return Analysis(out_dir)
+
+
+class Analysis:
+    """打开一个分析结果目录（只读内存映射，按需从磁盘读）"""
+
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+        with open(os.path.join(out_dir, 'meta.json')) as f:
+            self.meta = json.load(f)
+        outputs = _open_outputs(out_dir, 'r')
+        self.keys = outputs['keys']
+        self.chroma = outputs['chroma']
+        self.onset = outputs['onset']
+        self.spectrum = outputs.get('spectrum')
+        self.frame_time = self.meta['hop'] / self.meta['sample_rate']
+
+    def frames(self, start=0.0, end=None):
+        """时间范围（秒） -> 帧范围"""
+        first = max(0, int(start / self.frame_time))
+        last = self.meta['frames']
+        if end is not None:
+            last = min(last, int(end / self.frame_time) + 1)
+        return first, max(first, last)
+
+    def reduced(self, array, first, last, columns=2000):
+        """取 [first, last) 帧，按最大值合并成不超过 columns 帧，画图时不必读入全部"""
+        step = max(1, -(-(last - first) // columns))
+        rows = np.asarray(array[first:last])
+        usable = len(rows) // step * step
+        if step == 1 or not usable:
+            return rows, step
+        return rows[:usable].reshape(usable // step, step, *rows.shape[1:]).max(axis=1), step
+
+    def plot(self, channel=0, start=0.0, end=None):
+        """琴键频段谱、chroma、起音强度三联图"""
+        import matplotlib.pyplot as plt
+
+        from theory import NOTE_NAMES
+
+        first, last = self.frames(start, end)
+        keys, step = self.reduced(self.keys[channel], first, last)
+        chroma, _ = self.reduced(self.chroma[channel], first, last)
+        onset, _ = self.reduced(self.onset[channel], first, last)
+        t0, t1 = first * self.frame_time, last * self.frame_time
+
+        fig, axes = plt.subplots(3, 1, figsize=(14, 9), sharex=True,
+                                 gridspec_kw={'height_ratios': [3, 2, 1]})
+        axes[0].imshow(10 * np.log10(keys.T + 1e-10), aspect='auto', origin='lower',
+                       extent=(t0, t1, -0.5, N_KEYS - 0.5), cmap='magma')
+        axes[0].set_ylabel('Piano key')
+        axes[0].set_title(f"{os.path.basename(self.meta['source'])} - channel {channel + 1}")
+        norm = chroma / np.maximum(chroma.max(axis=1, keepdims=True), 1e-12)
+        axes[1].imshow(norm.T, aspect='auto', origin='lower', extent=(t0, t1, -0.5, 11.5),
+                       cmap='viridis', interpolation='nearest')
+        axes[1].set_yticks(range(12), NOTE_NAMES)
+        axes[1].set_ylabel('Chroma')
+        axes[2].plot(t0 + (np.arange(len(onset)) + 0.5) * step * self.frame_time, onset, lw=0.8)
+        axes[2].set_ylabel('Onset')
+        axes[2].set_xlabel('Time (s)')
+        axes[2].set_xlim(t0, t1)
+        fig.tight_layout()
+        plt.show()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Analyze long rehearsal recordings')
+    parser.add_argument('path', nargs='?', help='recording to analyze')
+    parser.add_argument('--out', help='output directory (default: <recording>.analysis)')
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--n-fft', type=int, default=N_FFT)
+    parser.add_argument('--hop', type=int, default=HOP)
+    parser.add_argument('--spectrum', action='store_true', help='also store the log spectrogram')
+    parser.add_argument('--plot', metavar='DIR', help='plot an existing analysis')
+    parser.add_argument('--channel', type=int, default=1)
+    parser.add_argument('--start', type=float, default=0.0)
+    parser.add_argument('--end', type=float)
+    args = parser.parse_args()
+    if not args.path and not args.plot:
+        parser.error('give a recording to analyze or --plot DIR')
+
+    if args.path:
+        def progress(done, total):
+            print(f"\r{done}/{total} frames", end='', flush=True)
+
+        start = time.perf_counter()
+        result = analyze(args.path, args.out, args.workers, args.n_fft, args.hop,
+                         spectrum=args.spectrum, progress=progress)
+        elapsed = time.perf_counter() - start
+        meta = result.meta
+        print(f"\n{meta['channels']} channel(s), {meta['duration']:.1f}s analyzed in "
+              f"{elapsed:.1f}s ({meta['duration'] / max(elapsed, 1e-9):.0f}x real time) "
+              f"-> {result.out_dir}")
+    if args.plot:
+        Analysis(args.plot).plot(args.channel - 1, args.start, args.end)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""局部重绘（blit）工具：只重画变化的 artist，一次事件合并成一帧"""
+from matplotlib.transforms import Bbox
+
+
+class BlitRenderer:
+    """在已有画面上直接重画发生变化的 artist，再只把它们所在区域 blit 到屏幕
+
+    画布缓冲区本身就是缓存的静态背景：完整重绘（首次显示、窗口缩放）之后，
+    每次修改只需 draw_artist 变化的 artist 以及压在它们上面的 artist。
+    mark() 只登记修改，flush() 才真正出图，所以一个事件里的多次修改只产生一帧。
+    """
+
+    def __init__(self, ax, overlaps=None):
+        self.ax = ax
+        self.canvas = ax.figure.canvas
+        self.overlaps = overlaps or (lambda artist: ())  # artist -> 需要补画在其上方的 artist
+        self._dirty = {}  # 用 dict 保持登记顺序并去重
+        self._ready = False
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+
+    def _on_draw(self, event):
+        # 完整重绘后画布缓冲区就是最新背景
+        self._ready = True
+        self._dirty.clear()
+
+    def mark(self, *artists):
+        for artist in artists:
+            self._dirty[artist] = None
+
+    def _draw_order(self, artists):
+        """与 Axes.draw 一致：按 zorder，再按加入 Axes 的先后顺序"""
+        children = {a: i for i, a in enumerate(self.ax.get_children())}
+        return sorted(artists, key=lambda a: (a.get_zorder(), children.get(a, 0)))
+
+    def flush(self):
+        """把登记的修改一次性画出来"""
+        if not self._dirty:
+            return
+        if not self._ready or not getattr(self.canvas, 'supports_blit', False):
+            self._dirty.clear()
+            self.canvas.draw_idle()
+            return
+
+        artists = dict(self._dirty)
+        for artist in self._dirty:
+            for above in self.overlaps(artist):
+                artists[above] = None
+        self._dirty.clear()
+
+        for artist in self._draw_order(artists):
+            self.ax.draw_artist(artist)
+        region = Bbox.union([a.get_window_extent() for a in artists]).padded(2)
+        self.canvas.blit(Bbox.intersection(region, self.ax.figure.bbox) or region)
+
+
+class BlitLayer:
+    """保存静态背景的动态图层：用于会隐藏 / 移动的 artist
+
+    BlitRenderer 只能原地重画（改颜色），旧内容会留在画布上。图层里的 artist
+    设为 animated，完整重绘时不画；draw_event 时保存不含它们的背景，之后每次
+    flush() 恢复背景、按 zorder 重画图层里可见的 artist，再 blit 一次 Axes。
+    不支持 blit 的后端上 artist 保持普通状态，flush() 退化为 draw_idle。
+    """
+
+    def __init__(self, ax):
+        self.ax = ax
+        self.figure = ax.figure
+        self.canvas = ax.figure.canvas
+        self.enabled = getattr(self.canvas, 'supports_blit', False)
+        self.artists = []
+        self._background = None
+        self._dirty = False
+        self._extra = {}  # 图层之外需要一起重画的 artist（如按钮的 Axes）
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+
+    def add(self, *artists):
+        for artist in artists:
+            if self.enabled:
+                artist.set_animated(True)
+            self.artists.append(artist)
+        self._dirty = True
+
+    def _on_draw(self, event):
+        # 完整重绘不包含 animated artist，此时的画布就是背景
+        self._background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self._draw_layer()
+        self._dirty = False
+        self._extra.clear()
+
+    def _draw_layer(self):
+        for artist in sorted(self.artists, key=lambda a: a.get_zorder()):
+            if artist.get_visible():
+                self.ax.draw_artist(artist)
+
+    def mark(self, *figure_artists):
+        """登记图层变化；figure_artists 为图层外同时变化、需要整块重画的不透明 artist"""
+        self._dirty = True
+        for artist in figure_artists:
+            self._extra[artist] = None
+
+    def flush(self):
+        """把登记的变化合成一帧"""
+        if not self._dirty and not self._extra:
+            return
+        if not self.enabled or self._background is None:
+            self._dirty = False
+            self._extra.clear()
+            self.canvas.draw_idle()
+            return
+
+        if self._dirty:
+            self.canvas.restore_region(self._background)
+            self._draw_layer()
+            self.canvas.blit(self.ax.bbox)
+            self._dirty = False
+        for artist in self._extra:
+            self.figure.draw_artist(artist)
+            self.canvas.blit(artist.get_window_extent())
+        self._extra.clear()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""十二音圆（TwelveToneCircle 两个版本共用）：常驻的音程标签图层、极坐标命中表、悬停预览"""
+import math
+
+from matplotlib.patches import Wedge
+import numpy as np
+
+
+def note_angle(i):
+    """第 i 个音在圆上的角度（度）：C 在正上方，顺时针排列"""
+    return 90 - i * 30
+
+
+class IntervalLabels:
+    """每对 (根音, 音符) 一个常驻的音程标签
+
+    标签在第一次用到时创建（位置固定在两音角度的中点），之后切换和弦只改
+    可见性，代价与变化的标签数成正比；重画交给 BlitLayer 合成一帧。
+    """
+
+    def __init__(self, ax, names, layer, radius=0.5, **style):
+        self.ax = ax
+        self.names = names        # 音程 (0-11) -> 名字
+        self.layer = layer
+        self.radius = radius
+        self.style = dict(ha='center', va='center', fontsize=12, color='blue',
+                          bbox=dict(facecolor='white', alpha=0.7))
+        self.style.update(style)
+        self._labels = {}         # (根音序号, 音符序号) -> Text
+        self._visible = set()
+
+    def _label(self, root, note):
+        pair = (root, note)
+        if pair not in self._labels:
+            mid_angle = np.radians((note_angle(root) + note_angle(note)) / 2)
+            text = self.ax.text(self.radius * np.cos(mid_angle), self.radius * np.sin(mid_angle),
+                                self.names[(note - root) % 12], visible=False, **self.style)
+            self.layer.add(text)
+            self._labels[pair] = text
+        return self._labels[pair]
+
+    def update(self, root, notes):
+        """显示 root 到 notes 中其它各音的音程（音级序号），返回变化的标签数"""
+        wanted = {(root, n) for n in notes if n != root} if len(notes) > 1 else set()
+        for pair in self._visible - wanted:
+            self._labels[pair].set_visible(False)
+        for pair in wanted - self._visible:
+            self._label(*pair).set_visible(True)
+        changed = len(self._visible ^ wanted)
+        self._visible = wanted
+        if changed:
+            self.layer.mark()
+        return changed
+
+    def clear(self):
+        return self.update(None, [])
+
+
+class PolarHitGrid:
+    """按楔形几何预先量化的极坐标查找表：(角度桶, 半径桶) -> (音级, 八度, 频率)
+
+    bands 为 [(内半径, 外半径, 八度)]；每个音占以自身角度为中心的 30°。
+    查表只需一次 hypot / atan2 和一次数组取值，鼠标移动时每个事件都可以查。
+    """
+
+    def __init__(self, bands, n_notes=12, angle_steps=720, radius_step=0.005, a_index=9):
+        self.n_notes = n_notes
+        self.angle_steps = angle_steps
+        self.radius_step = radius_step
+        self.bands = {octave: (low, high) for low, high, octave in bands}
+        n_radii = int(math.ceil(max(high for _, high, _ in bands) / radius_step)) + 1
+        span = 360 / n_notes
+
+        # 每个桶取中心点分类
+        angles = (np.arange(angle_steps) + 0.5) * 360 / angle_steps
+        radii = (np.arange(n_radii) + 0.5) * radius_step
+        notes = ((angles + span / 2) // span).astype(np.int16) % n_notes
+        self.table = np.full((angle_steps, n_radii), -1, dtype=np.int16)
+        for low, high, octave in bands:
+            inside = (radii >= low) & (radii <= high)
+            self.table[:, inside] = (notes + n_notes * (octave + 1))[:, None]
+
+        # 编码 = 音级 + 12 × (八度 + 1)，直接作为频率表下标
+        codes = np.arange(3 * n_notes)
+        self.freqs = 440 * 2**((codes % n_notes - a_index) / 12 + codes // n_notes - 1)
+
+    def lookup(self, x, y):
+        """数据坐标 -> (音级序号, 八度, 频率)；不在任何音上时返回 None"""
+        if x is None or y is None:
+            return None
+        radius = int(math.hypot(x, y) / self.radius_step)
+        if radius >= self.table.shape[1]:
+            return None
+        angle = (90 - math.degrees(math.atan2(y, x))) % 360
+        code = int(self.table[int(angle * self.angle_steps / 360) % self.angle_steps, radius])
+        if code < 0:
+            return None
+        return code % self.n_notes, code // self.n_notes - 1, float(self.freqs[code])
+
+
+class HoverPreview:
+    """悬停预览：虚线框出鼠标下的音，圆心显示它相对当前根音的级数和音程"""
+
+    OCTAVE_MARKS = {-1: '\u0323', 0: '', 1: '\u0307'}
+
+    def __init__(self, ax, layer, grid, notes, intervals, roman_numerals):
+        self.layer = layer
+        self.grid = grid
+        self.notes = notes
+        self.intervals = intervals
+        self.roman_numerals = roman_numerals
+        self.current = None   # (音级序号, 八度)
+        self.wedge = Wedge((0, 0), 1, 0, 1, fill=False, ec='darkorange', lw=2,
+                           ls='--', visible=False, zorder=4)
+        ax.add_patch(self.wedge)
+        self.text = ax.text(0, 0, '', ha='center', va='center', fontsize=13,
+                            color='darkorange', visible=False, zorder=4)
+        layer.add(self.wedge, self.text)
+
+    def update(self, x, y, root_index):
+        """鼠标移动：只有悬停的音变化时才改动 artist，返回是否有变化"""
+        hit = self.grid.lookup(x, y)
+        key = hit[:2] if hit else None
+        if key == self.current:
+            return False
+        self.current = key
+        if key is None:
+            self.wedge.set_visible(False)
+            self.text.set_visible(False)
+        else:
+            note_index, octave = key
+            angle = note_angle(note_index)
+            low, high = self.grid.bands[octave]
+            self.wedge.set_radius(high)
+            self.wedge.set_width(high - low)
+            self.wedge.set_theta1(angle - 12)
+            self.wedge.set_theta2(angle + 12)
+            interval = (note_index - root_index) % 12
+            self.text.set_text(f"{self.notes[note_index]}{self.OCTAVE_MARKS[octave]} "
+                               f"{self.roman_numerals[interval]}\n{self.intervals[interval]}")
+            self.wedge.set_visible(True)
+            self.text.set_visible(True)
+        self.layer.mark()
+        return True
+
+    def refresh(self, root_index):
+        """根音变化后重新计算悬停文字"""
+        key, self.current = self.current, None
+        if key is not None:
+            note_index, octave = key
+            r = sum(self.grid.bands[octave]) / 2
+            angle = math.radians(note_angle(note_index))
+            self.update(r * math.cos(angle), r * math.sin(angle), root_index)
@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""课堂模式：多名学生通过网络同时打拍，服务器按共享节拍器时钟统一评分
+
+协议是按行分隔的 JSON（TCP）：
+    客户端 -> {"type": "hello", "name": "..."}
+    服务器 -> {"type": "session", "start": 起点, "tempo": 速度, "pattern": [...], ...}
+    客户端 -> {"type": "ping", "t": 客户端时间}      服务器 -> {"type": "pong", "t": ..., "server": 服务器时间}
+    客户端 -> {"type": "taps", "times": [...]}      （已换算成服务器时钟的敲击时间）
+    服务器 -> {"type": "board", "rows": [...]}      （排行榜，定时广播）
+
+服务器不逐次评分：敲击先进入待处理列表，每个 tick 把所有学生的敲击合成一批，
+用 TimingScorer.nearest 一次匹配拍点，再用 bincount 按学生累加统计量。
+
+用法示例:
+    python class_server.py --lesson 常见节奏型 --exercise 0 --tempo 160 --subdivide 4
+    python class_server.py --simulate 30 --tempo 160 --subdivide 4 --duration 20
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+
+import numpy as np
+
+from music_data import LESSONS
+from timing import TimingScorer
+
+SUBDIVISION_STRENGTH = 0.25  # 细分拍的强度（与课程里的 1 / 0.5 区分）
+
+
+def valid_times(times):
+    """taps 消息里的 times 必须是有限数值的列表（bool 不算数值）"""
+    return isinstance(times, list) and all(
+        isinstance(t, (int, float)) and not isinstance(t, bool) and math.isfinite(t)
+        for t in times)
+
+
+def subdivide(pattern, n):
+    """每拍细分成 n 份：要打的拍后面补 n-1 个细分拍，休止拍整拍休止"""
+    result = []
+    for strength in pattern:
+        result.append(strength)
+        result.extend([SUBDIVISION_STRENGTH if strength > 0 else 0] * (n - 1))
+    return result
+
+
+class ClassScorer:
+    """全班共用一个节拍网格，每个学生一行累加统计量
+
+    统计量与 TimingScorer 相同（均值、方差、平均绝对误差、抢拍 / 拖拍、各强度误差），
+    只是存成按学生编号索引的数组，批量合并时用 Chan 的并行方差公式。
+    """
+
+    def __init__(self, pattern, tempo, start):
+        self.grid = TimingScorer(pattern, tempo)
+        self.grid.start(start)
+        self.start = start
+        self.levels = sorted(set(self.grid._strengths), reverse=True)
+        self.names = []
+        self._ids = {}
+        self._resize(32)
+        self.batches = 0
+        self.cpu_time = 0.0
+
+    def _resize(self, capacity):
+        old = getattr(self, 'count', np.zeros(0))
+        n = len(old)
+
+        def grow(name, shape=()):
+            array = np.zeros((capacity,) + shape)
+            if n:
+                array[:n] = getattr(self, name)
+            setattr(self, name, array)
+
+        for name in ('count', 'mean', 'm2', 'abs_sum', 'early', 'late'):
+            grow(name)
+        grow('level_count', (len(self.levels),))
+        grow('level_abs', (len(self.levels),))
+
+    def student(self, name):
+        """学生名字 -> 编号（第一次出现时分配一行）"""
+        if name not in self._ids:
+            if len(self.names) == len(self.count):
+                self._resize(2 * len(self.count))
+            self._ids[name] = len(self.names)
+            self.names.append(name)
+        return self._ids[name]
+
+    def add_batch(self, ids, times):
+        """一批敲击（学生编号数组, 时间数组）一次评分"""
+        cpu = time.process_time()
+        ids = np.asarray(ids, dtype=np.int64)
+        times = np.asarray(times, dtype=np.float64)
+        # 第一拍之前半拍以外的敲击（倒数阶段）不计分
+        keep = times >= self.start - 30.0 / self.grid.tempo
+        ids, times = ids[keep], times[keep]
+        if len(ids):
+            expected, strength = self.grid.nearest(times)
+            error = times - expected
+            n = len(self.count)
+
+            count = np.bincount(ids, minlength=n)
+            total = np.bincount(ids, error, minlength=n)
+            touched = count > 0
+            batch_mean = np.divide(total, count, out=np.zeros(n), where=touched)
+            batch_m2 = np.bincount(ids, (error - batch_mean[ids]) ** 2, minlength=n)
+
+            # 合并：n = na + nb, δ = μb - μa, M2 = M2a + M2b + δ² na nb / n
+            new_count = self.count + count
+            delta = batch_mean - self.mean
+            safe = np.maximum(new_count, 1)
+            self.m2 += np.where(touched, batch_m2 + delta ** 2 * self.count * count / safe, 0)
+            self.mean += np.where(touched, delta * count / safe, 0)
+            self.count = new_count
+            self.abs_sum += np.bincount(ids, np.abs(error), minlength=n)
+            self.early += np.bincount(ids, error < 0, minlength=n)
+            self.late += np.bincount(ids, error > 0, minlength=n)
+
+            level = np.searchsorted(-np.asarray(self.levels), -strength)
+            flat = ids * len(self.levels) + level
+            size = n * len(self.levels)
+            self.level_count += np.bincount(flat, minlength=size).reshape(n, -1)
+            self.level_abs += np.bincount(flat, np.abs(error), minlength=size).reshape(n, -1)
+        self.batches += 1
+        self.cpu_time += time.process_time() - cpu
+        return len(ids)
+
+    @property
+    def scores(self):
+        """与 TimingScorer.score 一致：100 - 平均绝对误差(秒) × 100"""
+        n = len(self.names)
+        mean_abs = self.abs_sum[:n] / np.maximum(self.count[:n], 1)
+        return np.maximum(0, 100 - mean_abs * 100)
+
+    def leaderboard(self, limit=None):
+        """按得分排序的 [(名次, 名字, 得分, 敲击数, 平均偏差ms, 抖动ms, 抢拍, 拖拍)]"""
+        n = len(self.names)
+        scores = self.scores
+        std = np.sqrt(self.m2[:n] / np.maximum(self.count[:n], 1))
+        # 得分相同按敲击数，尚未敲击的排在最后
+        order = np.lexsort((-self.count[:n], -scores, self.count[:n] == 0))[:limit]
+        return [(rank + 1, self.names[i], round(float(scores[i]), 2), int(self.count[i]),
+                 round(float(self.mean[i]) * 1000, 1), round(float(std[i]) * 1000, 1),
+                 int(self.early[i]), int(self.late[i]))
+                for rank, i in enumerate(order)]
+
+    def summary(self, name):
+        """单个学生的统计摘要（格式同 TimingScorer.summary）"""
+        i = self._ids[name]
+        std = np.sqrt(self.m2[i] / max(self.count[i], 1))
+        lines = [f'敲击: {self.count[i]:.0f}  偏差: {self.mean[i] * 1000:+.0f}ms'
+                 f'  抖动: {std * 1000:.0f}ms',
+                 f'抢拍: {self.early[i]:.0f}  拖拍: {self.late[i]:.0f}']
+        for j, strength in enumerate(self.levels):
+            count = self.level_count[i, j]
+            if count:
+                lines.append(f'强度 {strength:g}: 平均误差 '
+                             f'{self.level_abs[i, j] / count * 1000:.0f}ms ({count:.0f})')
+        return lines
+
+
+class ClassServer:
+    """asyncio 服务器：接收各学生的敲击，按 tick 批量评分并广播排行榜"""
+
+    def __init__(self, pattern, tempo, host='0.0.0.0', port=8765, lead_in=3.0,
+                 tick=0.1, board_interval=1.0, lesson=None):
+        self.pattern = list(pattern)
+        self.tempo = float(tempo)
+        self.host = host
+        self.port = port
+        self.lead_in = lead_in
+        self.tick = tick
+        self.board_interval = board_interval
+        self.lesson = lesson
+        self.scorer = None
+        self.taps = 0
+        self._pending_ids = []
+        self._pending_times = []
+        self._writers = {}
+        self._server = None
+        self._tasks = []
+
+    def session(self):
+        return {'type': 'session', 'start': self.scorer.start, 'tempo': self.tempo,
+                'pattern': self.pattern, 'lesson': self.lesson, 'server': time.time()}
+
+    async def start(self):
+        # 共享节拍器时钟：第一拍在 lead_in 秒之后，所有学生以此为准
+        self.scorer = ClassScorer(self.pattern, self.tempo, time.time() + self.lead_in)
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._tasks = [asyncio.ensure_future(self._score_loop()),
+                       asyncio.ensure_future(self._board_loop())]
+        print(f"Class server on {self.host}:{self.port}, "
+              f"grid {self.tempo:g} BPM, pattern {self.pattern}")
+        return self
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._score_pending()
+        self._server.close()
+        await self._server.wait_closed()
+        for writer in list(self._writers.values()):
+            writer.close()
+
+    async def _handle(self, reader, writer):
+        student = None
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    continue
+                if not isinstance(message, dict):
+                    continue
+                kind = message.get('type')
+                if kind == 'ping':
+                    self._send(writer, {'type': 'pong', 't': message.get('t'),
+                                        'server': time.time()})
+                elif kind == 'hello':
+                    name = str(message.get('name') or f"student{len(self.scorer.names) + 1}")
+                    student = self.scorer.student(name)
+                    self._writers[student] = writer
+                    self._send(writer, self.session())
+                elif kind == 'taps' and student is not None:
+                    times = message.get('times', [])
+                    if not valid_times(times):
+                        print(f"Ignoring malformed taps from {self.scorer.names[student]}")
+                        continue
+                    self._pending_ids.extend([student] * len(times))
+                    self._pending_times.extend(times)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            if student is not None:
+                self._writers.pop(student, None)
+            writer.close()
+
+    @staticmethod
+    def _send(writer, message):
+        writer.write(json.dumps(message, ensure_ascii=False).encode() + b'\n')
+
+    def _score_pending(self):
+        if not self._pending_ids:
+            return
+        ids, self._pending_ids = self._pending_ids, []
+        times, self._pending_times = self._pending_times, []
+        self.taps += self.scorer.add_batch(ids, times)
+
+    async def _score_loop(self):
+        while True:
+            await asyncio.sleep(self.tick)
+            # 一批出错只丢掉这一批，不能让整个课堂停止评分
+            try:
+                self._score_pending()
+            except Exception as e:
+                print(f"Error scoring taps: {str(e)}")
+
+    async def _board_loop(self):
+        while True:
+            await asyncio.sleep(self.board_interval)
+            rows = self.scorer.leaderboard()
+            message = {'type': 'board', 'rows': rows}
+            for writer in list(self._writers.values()):
+                self._send(writer, message)
+            print_board(rows, limit=5)
+
+
+def print_board(rows, limit=None):
+    print(f"{'#':>3} {'student':<12}{'score':>7}{'taps':>6}{'offset':>9}{'jitter':>8}"
+          f"{'early':>7}{'late':>6}")
+    for rank, name, score, taps, offset, jitter, early, late in rows[:limit]:
+        print(f"{rank:>3} {name:<12}{score:>7.1f}{taps:>6}{offset:>+8.1f}ms{jitter:>6.1f}ms"
+              f"{early:>7}{late:>6}")
+
+
+async def student_client(host, port, name, duration, bias=0.0, jitter=0.02,
+                         miss=0.02, clock_offset=0.0):
+    """模拟学生：先对时，再按课程节奏型在拍点附近加误差敲击
+
+    clock_offset 模拟学生电脑时钟与服务器不同步；bias / jitter 是打拍的系统偏差和随机抖动（秒）。
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+
+    def now():
+        return time.time() + clock_offset
+
+    async def request(message):
+        writer.write(json.dumps(message).encode() + b'\n')
+        await writer.drain()
+        while True:
+            reply = json.loads(await reader.readline())
+            if reply['type'] != 'board':
+                return reply
+
+    # 对时：取往返时间最短的一次，假设往返对称
+    offset, best_rtt = 0.0, None
+    for _ in range(5):
+        sent = now()
+        reply = await request({'type': 'ping', 't': sent})
+        received = now()
+        if best_rtt is None or received - sent < best_rtt:
+            best_rtt = received - sent
+            offset = reply['server'] - (sent + received) / 2
+    session = await request({'type': 'hello', 'name': name})
+
+    async def drain_boards():
+        while await reader.readline():
+            pass
+
+    listener = asyncio.ensure_future(drain_boards())
+    spb = 60.0 / session['tempo']
+    beats = [i for i, s in enumerate(session['pattern']) if s > 0]
+    bar_len = len(session['pattern'])
+    rng = random.Random(name)
+    end = session['start'] + duration
+    bar = 0
+    try:
+        while True:
+            for beat in beats:
+                target = session['start'] + (bar * bar_len + beat) * spb
+                if target > end:
+                    return
+                if rng.random() < miss:
+                    continue
+                tap = target + bias + rng.gauss(0, jitter)  # 服务器时钟
+                delay = tap - offset - now()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                writer.write(json.dumps({'type': 'taps', 'times': [now() + offset]}).encode() + b'\n')
+            bar += 1
+    finally:
+        await writer.drain()
+        listener.cancel()
+        writer.close()
+
+
+async def simulate(server, n_students, duration):
+    """本机启动服务器和 n 个模拟学生，结束后返回排行榜"""
+    await server.start()
+    rng = random.Random(0)
+    clients = [student_client('127.0.0.1', server.port, f"student{i + 1:02d}",
+                              server.lead_in + duration,
+                              bias=rng.uniform(-0.03, 0.03), jitter=rng.uniform(0.005, 0.04),
+                              clock_offset=rng.uniform(-2, 2))
+               for i in range(n_students)]
+    start = time.perf_counter()
+    await asyncio.gather(*clients)
+    await asyncio.sleep(server.tick * 2)
+    await server.stop()
+    elapsed = time.perf_counter() - start
+    scorer = server.scorer
+    print(f"\n{server.taps} taps from {len(scorer.names)} students in {elapsed:.1f}s, "
+          f"{scorer.batches} batches, scoring CPU {scorer.cpu_time * 1000:.1f} ms "
+          f"({scorer.cpu_time / elapsed * 100:.2f}% of one core)")
+    return scorer.leaderboard()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Multi-student rhythm scoring server')
+    parser.add_argument('--lesson', default='基础节拍', choices=list(LESSONS))
+    parser.add_argument('--exercise', type=int, default=0)
+    parser.add_argument('--tempo', type=float, default=90)
+    parser.add_argument('--subdivide', type=int, default=1, help='2 = 8ths, 3 = triplets, 4 = 16ths')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--lead-in', type=float, default=3.0)
+    parser.add_argument('--simulate', type=int, metavar='N', help='run N simulated students locally')
+    parser.add_argument('--duration', type=float, default=15.0)
+    args = parser.parse_args()
+
+    exercise = LESSONS[args.lesson]['exercises'][args.exercise]
+    pattern = subdivide(exercise['pattern'], args.subdivide)
+    lesson = f"{args.lesson} / {exercise['name']}"
+    print(f"Lesson: {lesson}")
+
+    if args.simulate:
+        server = ClassServer(pattern, args.tempo * args.subdivide, '127.0.0.1', 0,
+                             lead_in=args.lead_in, lesson=lesson)
+        print_board(asyncio.run(simulate(server, args.simulate, args.duration)))
+        return
+
+    async def serve():
+        server = await ClassServer(pattern, args.tempo * args.subdivide, args.host, args.port,
+                                   lead_in=args.lead_in, lesson=lesson).start()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await server.stop()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""多通道调音台引擎：通道增益 / 声像 / 静音 / 独奏 / EQ 插入、编组总线、主输出与电平表
+
+每个回调把 (通道数 × 帧数) 的输入块当成一个矩阵处理：通道增益、声像、静音独奏和
+总线分配在参数变化时预先合成一个路由矩阵，处理时只做矩阵乘法；电平表在同一遍里
+用预分配的缓冲计算。稳定运行时（不含 EQ 插入）处理循环不分配新数组。
+
+用法示例:
+    python console.py                 # 用合成的吉他 / 键盘 / 贝斯 / 鼓混一段示例
+"""
+import math
+
+import numpy as np
+
+
+class MixingConsole:
+    """N 路输入 → 若干编组总线 → 立体声主输出"""
+
+    def __init__(self, channels, buses=None, sample_rate=48000, blocksize=480):
+        self.channels = list(channels)
+        self.bus_names = list(buses or {})
+        self.sample_rate = sample_rate
+        self.blocksize = blocksize
+        n, b = len(self.channels), len(self.bus_names)
+
+        # 通道参数
+        self.gain_db = np.zeros(n)
+        self.pan = np.zeros(n)              # -1 左 … 0 中 … +1 右
+        self.mute = np.zeros(n, dtype=bool)
+        self.solo = np.zeros(n, dtype=bool)
+        self.bus_of = np.full(n, -1)        # -1 表示直接进主输出
+        for bus, members in (buses or {}).items():
+            for name in members:
+                self.bus_of[self.channels.index(name)] = self.bus_names.index(bus)
+        self.bus_gain_db = np.zeros(b)
+        self.master_gain_db = 0.0
+        self.channel_eq = {}                # 通道号 -> EQ（process 接口）
+        self.bus_eq = {}                    # 总线号 -> EQ
+
+        # 预分配的处理缓冲
+        self._x = np.zeros((n, blocksize), dtype=np.float32)
+        self._scratch = np.zeros((n, blocksize), dtype=np.float32)
+        self._y = np.zeros((2 * b + 2, blocksize), dtype=np.float32)   # 各总线 L/R + 直通 L/R
+        self._y_scratch = np.zeros_like(self._y)
+        self._master = np.zeros((2, blocksize), dtype=np.float32)
+        self._master_scratch = np.zeros_like(self._master)
+
+        # 电平表（线性值）
+        self.channel_peak = np.zeros(n, dtype=np.float32)
+        self.channel_rms = np.zeros(n, dtype=np.float32)
+        self.bus_peak = np.zeros(2 * b + 2, dtype=np.float32)
+        self.bus_rms = np.zeros(2 * b + 2, dtype=np.float32)
+        self.master_peak = np.zeros(2, dtype=np.float32)
+        self.master_rms = np.zeros(2, dtype=np.float32)
+        self.channel_hold = np.zeros(n, dtype=np.float32)   # 峰值保持，reset_meters() 清零
+        self.master_hold = np.zeros(2, dtype=np.float32)
+
+        self._dirty = True
+
+    # ---- 参数设置（只标记，下一块统一重算路由矩阵） ----
+
+    def _index(self, channel):
+        return channel if isinstance(channel, int) else self.channels.index(channel)
+
+    def set_gain(self, channel, gain_db):
+        self.gain_db[self._index(channel)] = gain_db
+        self._dirty = True
+
+    def set_pan(self, channel, pan):
+        self.pan[self._index(channel)] = np.clip(pan, -1, 1)
+        self._dirty = True
+
+    def set_mute(self, channel, muted=True):
+        self.mute[self._index(channel)] = muted
+        self._dirty = True
+
+    def set_solo(self, channel, soloed=True):
+        self.solo[self._index(channel)] = soloed
+        self._dirty = True
+
+    def set_bus_gain(self, bus, gain_db):
+        self.bus_gain_db[self.bus_names.index(bus)] = gain_db
+        self._dirty = True
+
+    def set_master_gain(self, gain_db):
+        self.master_gain_db = gain_db
+        self._dirty = True
+
+    def insert_eq(self, channel, eq):
+        """在通道上插入 EQ（如 eq.ParametricEQ），eq 为 None 时移除"""
+        index = self._index(channel)
+        if eq is None:
+            self.channel_eq.pop(index, None)
+        else:
+            self.channel_eq[index] = eq
+
+    def insert_bus_eq(self, bus, eq):
+        index = self.bus_names.index(bus)
+        if eq is None:
+            self.bus_eq.pop(index, None)
+        else:
+            self.bus_eq[index] = eq
+
+    # ---- 路由矩阵 ----
+
+    @property
+    def channel_gain(self):
+        """各通道的有效线性增益（含静音 / 独奏）"""
+        audible = ~self.mute & (self.solo if self.solo.any() else True)
+        return 10 ** (self.gain_db / 20) * audible
+
+    def _update_routing(self):
+        n, b = len(self.channels), len(self.bus_names)
+        gain = self.channel_gain
+        # 等功率声像：中间位置左右各 -3dB
+        theta = (self.pan + 1) * math.pi / 4
+        left, right = gain * np.cos(theta), gain * np.sin(theta)
+
+        rows = np.where(self.bus_of >= 0, 2 * self.bus_of, 2 * b)
+        route = np.zeros((2 * b + 2, n), dtype=np.float32)
+        route[rows, np.arange(n)] = left
+        route[rows + 1, np.arange(n)] = right
+        self._route = route
+
+        # 总线 + 直通 -> 主输出
+        master = np.zeros((2, 2 * b + 2), dtype=np.float32)
+        bus_gain = 10 ** (np.append(self.bus_gain_db, 0.0) / 20) * 10 ** (self.master_gain_db / 20)
+        master[0, 0::2] = bus_gain
+        master[1, 1::2] = bus_gain
+        self._to_master = master
+        self._gain = gain.astype(np.float32)
+        self._dirty = False
+
+    # ---- 处理 ----
+
+    @staticmethod
+    def _meter(block, scratch, peak, rms):
+        np.abs(block, out=scratch)
+        np.max(scratch, axis=1, out=peak)
+        np.square(block, out=scratch)
+        np.mean(scratch, axis=1, out=rms)
+        np.sqrt(rms, out=rms)
+
+    def process(self, block):
+        """处理一块 (通道数, 帧数) 的输入，返回 (2, 帧数) 主输出（内部缓冲的视图）"""
+        if self._dirty:
+            self._update_routing()
+        frames = block.shape[1]
+        x = self._x[:, :frames]
+        np.copyto(x, block)
+
+        for index, eq in self.channel_eq.items():
+            eq.process(x[index])
+
+        # 推子后电平 = 推子前电平 × 通道增益（线性），无需另算
+        self._meter(x, self._scratch[:, :frames], self.channel_peak, self.channel_rms)
+        self.channel_peak *= self._gain
+        self.channel_rms *= self._gain
+        np.maximum(self.channel_hold, self.channel_peak, out=self.channel_hold)
+
+        y = self._y[:, :frames]
+        np.matmul(self._route, x, out=y)
+        for index, eq in self.bus_eq.items():
+            eq.process(y[2 * index:2 * index + 2].T)
+        self._meter(y, self._y_scratch[:, :frames], self.bus_peak, self.bus_rms)
+
+        master = self._master[:, :frames]
+        np.matmul(self._to_master, y, out=master)
+        self._meter(master, self._master_scratch[:, :frames], self.master_peak, self.master_rms)
+        np.maximum(self.master_hold, self.master_peak, out=self.master_hold)
+        return master
+
+    def reset_meters(self):
+        self.channel_hold[:] = 0.0
+        self.master_hold[:] = 0.0
+
+    def meters(self):
+        """各通道 / 总线 / 主输出最近一块的峰值与 RMS，以及峰值保持 (dBFS)"""
+        def db(x):
+            return 20 * np.log10(np.maximum(x, 1e-10))
+
+        bus_peak = np.maximum(self.bus_peak[0::2], self.bus_peak[1::2])[:-1]
+        bus_rms = np.sqrt((self.bus_rms[0::2] ** 2 + self.bus_rms[1::2] ** 2) / 2)[:-1]
+        return {
+            'channels': {name: (db(p), db(r)) for name, p, r in
+                         zip(self.channels, self.channel_peak, self.channel_rms)},
+            'buses': {name: (db(p), db(r)) for name, p, r in
+                      zip(self.bus_names, bus_peak, bus_rms)},
+            'master': (db(self.master_peak), db(self.master_rms)),
+            'hold': {name: db(p) for name, p in zip(self.channels, self.channel_hold)},
+            'master_hold': db(self.master_hold),
+        }
+
+    def mix(self, stems):
+        """离线混音：stems 为 (通道数, 总帧数) 数组，返回 (2, 总帧数)"""
+        total = stems.shape[1]
+        out = np.empty((2, total), dtype=np.float32)
+        for start in range(0, total, self.blocksize):
+            end = min(start + self.blocksize, total)
+            out[:, start:end] = self.process(stems[:, start:end])
+        return out
+
+
+def main():
+    import time
+
+    from synth import TONE_ENVELOPE, get_synth
+
+    sample_rate = 44100
+    synth = get_synth(sample_rate)
+    c4 = 440 * 2**(-9 / 12)
+    chord = [c4, c4 * 2**(4 / 12), c4 * 2**(7 / 12)]
+
+    # 乐队：电吉他、电键盘、贝斯、架子鼓
+    stems = np.array([
+        synth.chord(chord, 'guitar', 2.0, TONE_ENVELOPE),
+        synth.chord(chord, 'synth', 2.0, TONE_ENVELOPE),
+        synth.chord([c4 / 4], 'bright_piano', 2.0, TONE_ENVELOPE),
+        np.tile(synth.note(0, 'drum', 0.5, (0.001, 0.1, 0.3, 0.1)), 4),
+    ], dtype=np.float32)
+    console = MixingConsole(['Guitar', 'Keyboard', 'Bass', 'Drums'],
+                            buses={'Band': ['Guitar', 'Keyboard', 'Bass']},
+                            sample_rate=sample_rate, blocksize=441)
+    console.set_pan('Guitar', -0.5)
+    console.set_pan('Keyboard', 0.5)
+    console.set_gain('Drums', -3)
+    console.set_master_gain(-6)
+
+    begin = time.perf_counter()
+    mix = console.mix(stems)
+    elapsed = time.perf_counter() - begin
+    print(f"Mixed {stems.shape[0]} channels, {stems.shape[1] / sample_rate:.1f}s "
+          f"in {elapsed * 1000:.1f} ms")
+    meters = console.meters()
+    for name, peak in meters['hold'].items():
+        print(f"  {name:<10} peak {peak:6.1f} dBFS")
+    print(f"  {'Master':<10} peak {meters['master_hold'].max():6.1f} dBFS")
+
+    import soundfile as sf
+    sf.write('band_mix.wav', mix.T, sample_rate)
+
+
+if __name__ == "__main__":
+    main()
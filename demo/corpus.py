@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""课程录音索引：每个文件只解码一次，提取时长、响度、速度和主要音级，存进 SQLite
+
+索引按文件内容的哈希存特征；文件大小和修改时间没变的直接跳过，内容没变
+（比如只是改了名）的也不重新解码。需要解码的文件分给进程池并行处理。
+m4a 等 libsndfile 不支持的格式通过 ffmpeg 解码。
+
+用法示例:
+    python corpus.py index ../lesson
+    python corpus.py query --tempo 72 --key A
+    python corpus.py query --pitch-class E --tolerance 3
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import os
+import sqlite3
+import subprocess
+import time
+
+import numpy as np
+
+from keyboard import frequency_to_key, key_pitch_class
+from music_data import BASE_NOTES, MAJOR_PROFILE, MINOR_PROFILE
+from theory import Note
+
+DEFAULT_DB = os.path.join(os.path.expanduser('~'), '.cache', 'band_training', 'corpus.sqlite')
+AUDIO_EXTENSIONS = {'.m4a', '.mp3', '.wav', '.flac', '.ogg', '.aiff', '.aif'}
+SAMPLE_RATE = 22050
+N_FFT = 2048
+HOP = 512
+MIN_BPM, MAX_BPM = 40, 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY, hash TEXT NOT NULL, size INTEGER, mtime REAL);
+CREATE TABLE IF NOT EXISTS features (
+    hash TEXT PRIMARY KEY, duration REAL, rms_db REAL, peak_db REAL,
+    tempo REAL, key INTEGER, minor INTEGER, top_pcs INTEGER, chroma BLOB);
+CREATE INDEX IF NOT EXISTS features_tempo ON features (tempo);
+CREATE INDEX IF NOT EXISTS features_key ON features (key);
+"""
+
+
+def content_hash(path, chunk=1 << 20):
+    sha = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def decode(path, sample_rate=SAMPLE_RATE):
+    """解码成单声道 float32；libsndfile 能读的直接读，其它格式交给 ffmpeg"""
+    import soundfile as sf
+
+    try:
+        audio, sr = sf.read(path, dtype='float32', always_2d=True)
+    except sf.LibsndfileError:
+        try:
+            raw = subprocess.run(['ffmpeg', '-v', 'error', '-i', path, '-f', 'f32le',
+                                  '-ac', '1', '-ar', str(sample_rate), '-'],
+                                 capture_output=True, check=True).stdout
+        except FileNotFoundError:
+            raise RuntimeError(f"ffmpeg is required to decode {os.path.basename(path)}")
+        return np.frombuffer(raw, dtype=np.float32)
+
+    audio = audio.mean(axis=1)
+    if sr != sample_rate:
+        from math import gcd
+
+        from scipy.signal import resample_poly
+        g = gcd(sr, sample_rate)
+        audio = resample_poly(audio, sample_rate // g, sr // g).astype(np.float32)
+    return audio
+
+
+def _frames(audio):
+    """按 HOP 步进的 N_FFT 长重叠帧（视图，不复制）"""
+    if len(audio) < N_FFT:
+        audio = np.pad(audio, (0, N_FFT - len(audio)))
+    return np.lib.stride_tricks.sliding_window_view(audio, N_FFT)[::HOP]
+
+
+def _bin_pitch_classes(freqs):
+    """频点 -> 最近的音级（C = 0）"""
+    return key_pitch_class(np.rint(frequency_to_key(freqs)).astype(np.int64))
+
+
+def spectral_features(audio, sample_rate=SAMPLE_RATE, chunk_frames=512):
+    """一遍 STFT 同时得到起音强度包络和音级能量，按帧分块控制内存"""
+    window = np.hanning(N_FFT).astype(np.float32)
+    freqs = np.fft.rfftfreq(N_FFT, 1 / sample_rate)
+    pitched = (freqs >= 55) & (freqs <= 5000)
+    bin_pcs = _bin_pitch_classes(freqs[pitched])
+
+    frames = _frames(audio)
+    onset = np.zeros(len(frames))
+    chroma = np.zeros(12)
+    previous = None
+    for start in range(0, len(frames), chunk_frames):
+        mag = np.abs(np.fft.rfft(frames[start:start + chunk_frames] * window, axis=1))
+        log_mag = np.log1p(mag * 10)
+        flux = np.diff(log_mag, axis=0, prepend=log_mag[:1] if previous is None else previous)
+        onset[start:start + len(mag)] = np.maximum(flux, 0).sum(axis=1)
+        previous = log_mag[-1:]
+        chroma += np.bincount(bin_pcs, weights=(mag[:, pitched] ** 2).sum(axis=0), minlength=12)
+    return onset, chroma
+
+
+def chromagram(audio, sample_rate=SAMPLE_RATE, bands=((55, 5000),), chunk_frames=512):
+    """逐帧音级能量：每个频段 (fmin, fmax) 一个 (帧数, 12) 数组
+
+    频点到音级的归并是一个 0/1 矩阵，分块 STFT 后每块一次矩阵乘法；
+    单独取低音区一段可以判断和弦的低音（转位）。
+    """
+    window = np.hanning(N_FFT).astype(np.float32)
+    freqs = np.fft.rfftfreq(N_FFT, 1 / sample_rate)
+    folds = np.zeros((len(bands), len(freqs), 12), dtype=np.float32)
+    for b, (fmin, fmax) in enumerate(bands):
+        pitched = np.flatnonzero((freqs >= fmin) & (freqs <= fmax))
+        folds[b, pitched, _bin_pitch_classes(freqs[pitched])] = 1
+
+    frames = _frames(audio)
+    chroma = np.zeros((len(bands), len(frames), 12), dtype=np.float32)
+    for start in range(0, len(frames), chunk_frames):
+        spectrum = np.fft.rfft(frames[start:start + chunk_frames] * window, axis=1)
+        power = np.square(spectrum.real) + np.square(spectrum.imag)
+        for b in range(len(bands)):
+            chroma[b, start:start + len(power)] = power @ folds[b]
+    return chroma
+
+
+def estimate_tempo(onset, sample_rate=SAMPLE_RATE):
+    """起音包络的自相关，在 40-200 BPM 内取峰值（以 120 BPM 为中心的对数高斯先验）"""
+    onset = onset - onset.mean()
+    n = len(onset)
+    if n < 4 or not onset.any():
+        return 0.0
+    spectrum = np.fft.rfft(onset, 2 * n)
+    acf = np.fft.irfft(spectrum * np.conj(spectrum))[:n]
+    frame_rate = sample_rate / HOP
+    lags = np.arange(max(1, int(60 * frame_rate / MAX_BPM)),
+                     min(n - 1, int(60 * frame_rate / MIN_BPM)) + 1)
+    if not len(lags):
+        return 0.0
+    bpm = 60 * frame_rate / lags
+    weight = np.exp(-0.5 * (np.log2(bpm / 120) / 1.0) ** 2)
+    j = int(np.argmax(acf[lags] * weight))
+    lag = float(lags[j])
+    if 0 < j < len(lags) - 1:
+        # 抛物线插值求亚帧精度
+        a, b, c = acf[lags[j] - 1], acf[lags[j]], acf[lags[j] + 1]
+        if a - 2 * b + c:
+            lag += 0.5 * (a - c) / (a - 2 * b + c)
+    return 60 * frame_rate / lag
+
+
+def estimate_key(chroma):
+    """音级能量与 24 个调性轮廓的相关，返回 (主音音级, 是否小调)"""
+    profiles = np.array([np.roll(MAJOR_PROFILE, k) for k in range(12)]
+                        + [np.roll(MINOR_PROFILE, k) for k in range(12)])
+    if not chroma.any():
+        return 0, False
+    scores = np.corrcoef(np.vstack([chroma, profiles]))[0, 1:]
+    best = int(np.argmax(scores))
+    return best % 12, best >= 12
+
+
+def analyze(path):
+    """解码并提取一个文件的特征（在工作进程里运行）"""
+    audio = decode(path)
+    onset, chroma = spectral_features(audio)
+    rms = float(np.sqrt(np.mean(np.square(audio, dtype=np.float64)))) if len(audio) else 0.0
+    peak = float(np.max(np.abs(audio))) if len(audio) else 0.0
+    tonic, minor = estimate_key(chroma)
+    top = np.argsort(chroma)[::-1][:3]
+    return {
+        'duration': len(audio) / SAMPLE_RATE,
+        'rms_db': 20 * np.log10(max(rms, 1e-10)),
+        'peak_db': 20 * np.log10(max(peak, 1e-10)),
+        'tempo': estimate_tempo(onset),
+        'key': tonic,
+        'minor': int(minor),
+        'top_pcs': int(sum(1 << int(pc) for pc in top)),  # 12 位掩码
+        'chroma': (chroma / max(chroma.sum(), 1e-12)).astype(np.float32).tobytes(),
+    }
+
+
+def _analyze_job(job):
+    path, digest = job
+    try:
+        return path, digest, analyze(path), None
+    except Exception as e:
+        return path, digest, None, str(e)
+
+
+class CorpusIndex:
+    """录音特征索引（SQLite）"""
+
+    def __init__(self, db_path=DEFAULT_DB):
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db = sqlite3.connect(db_path)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    @staticmethod
+    def scan(root):
+        paths = []
+        for directory, _, names in os.walk(root):
+            for name in sorted(names):
+                if os.path.splitext(name)[1].lower() in AUDIO_EXTENSIONS:
+                    paths.append(os.path.join(directory, name))
+        return paths
+
+    def update(self, root, workers=None):
+        """增量更新：返回 (新解码数, 跳过数, 失败列表)"""
+        known = {path: (digest, size, mtime) for path, digest, size, mtime in
+                 self.db.execute('SELECT path, hash, size, mtime FROM files')}
+        have = {row[0] for row in self.db.execute('SELECT hash FROM features')}
+        jobs, skipped, seen = [], 0, set()
+        duplicates = {}  # 本次扫描中与待解码文件同内容的路径数
+        for path in self.scan(root):
+            path = os.path.abspath(path)
+            stat = os.stat(path)
+            seen.add(path)
+            entry = known.get(path)
+            if entry and entry[1] == stat.st_size and entry[2] == stat.st_mtime:
+                skipped += 1
+                continue
+            digest = content_hash(path)
+            self.db.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)',
+                            (path, digest, stat.st_size, stat.st_mtime))
+            if digest in have:
+                skipped += 1  # 内容没变（改名或只改了时间）
+                duplicates[digest] = duplicates.get(digest, 0) + 1
+            else:
+                jobs.append((path, digest))
+                have.add(digest)
+
+        # 已删除的文件
+        root = os.path.abspath(root)
+        for path in known:
+            if path.startswith(root + os.sep) and path not in seen:
+                self.db.execute('DELETE FROM files WHERE path = ?', (path,))
+
+        failed, decoded = [], 0
+        if jobs:
+            workers = min(workers or os.cpu_count(), len(jobs))
+            if workers == 1:
+                results = list(map(_analyze_job, jobs))
+            else:
+                with ProcessPoolExecutor(workers) as pool:
+                    results = list(pool.map(_analyze_job, jobs))
+            for path, digest, features, error in results:
+                if error:
+                    # 同内容的其它路径也没有特征，一并记为失败，下次重新解码
+                    siblings = [row[0] for row in self.db.execute(
+                        'SELECT path FROM files WHERE hash = ? ORDER BY path', (digest,))]
+                    failed += [(sibling, error) for sibling in siblings or [path]]
+                    self.db.execute('DELETE FROM files WHERE hash = ?', (digest,))
+                    skipped -= duplicates.get(digest, 0)
+                    continue
+                decoded += 1
+                self.db.execute(
+                    'INSERT OR REPLACE INTO features VALUES '
+                    '(:hash, :duration, :rms_db, :peak_db, :tempo, :key, :minor, :top_pcs, :chroma)',
+                    dict(features, hash=digest))
+        self.db.commit()
+        return decoded, skipped, failed
+
+    def query(self, tempo=None, tolerance=4.0, key=None, pitch_class_name=None,
+              min_duration=None, max_duration=None):
+        """按速度（±tolerance BPM，也接受一半 / 两倍速度）、调或主要音级筛选
+
+        key 为调名（'A'、'Em'）；pitch_class_name 匹配三个最强音级之一。
+        返回 [(路径, 特征 dict)]，按与目标速度的差距排序。
+        """
+        clauses, params = [], []
+        if tempo is not None:
+            clauses.append('(tempo BETWEEN ? AND ? OR tempo BETWEEN ? AND ? OR tempo BETWEEN ? AND ?)')
+            for factor in (1, 2, 0.5):
+                params += [(tempo - tolerance) * factor, (tempo + tolerance) * factor]
+        if key is not None:
+            clauses.append('key = ?')
+            params.append(Note(key[:-1] if key.endswith('m') else key).pc)
+            clauses.append('minor = 1' if key.endswith('m') else 'minor = 0')
+        if pitch_class_name is not None:
+            clauses.append('(top_pcs >> ?) & 1')
+            params.append(Note(pitch_class_name).pc)
+        if min_duration is not None:
+            clauses.append('duration >= ?')
+            params.append(min_duration)
+        if max_duration is not None:
+            clauses.append('duration <= ?')
+            params.append(max_duration)
+        sql = ('SELECT f.path, x.duration, x.rms_db, x.peak_db, x.tempo, x.key, x.minor, x.top_pcs '
+               'FROM files f JOIN features x ON f.hash = x.hash')
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        columns = ('duration', 'rms_db', 'peak_db', 'tempo', 'key', 'minor', 'top_pcs')
+        rows = [(row[0], dict(zip(columns, row[1:]))) for row in self.db.execute(sql, params)]
+        if tempo is not None:
+            rows.sort(key=lambda r: min(abs(r[1]['tempo'] * f - tempo) for f in (1, 0.5, 2)))
+        return rows
+
+    def chroma(self, path):
+        row = self.db.execute('SELECT x.chroma FROM files f JOIN features x ON f.hash = x.hash '
+                              'WHERE f.path = ?', (os.path.abspath(path),)).fetchone()
+        return None if row is None else np.frombuffer(row[0], dtype=np.float32)
+
+
+def describe(features):
+    key = BASE_NOTES[features['key']] + ('m' if features['minor'] else '')
+    pcs = ' '.join(BASE_NOTES[pc] for pc in range(12) if features['top_pcs'] >> pc & 1)
+    return (f"{features['duration']:6.1f}s  {features['rms_db']:6.1f} dBFS  "
+            f"{features['tempo']:6.1f} BPM  key {key:<3} pcs {pcs}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Index and query lesson recordings')
+    parser.add_argument('--db', default=DEFAULT_DB)
+    sub = parser.add_subparsers(dest='command', required=True)
+    index_cmd = sub.add_parser('index')
+    index_cmd.add_argument('root')
+    index_cmd.add_argument('--workers', type=int)
+    query_cmd = sub.add_parser('query')
+    query_cmd.add_argument('--tempo', type=float)
+    query_cmd.add_argument('--tolerance', type=float, default=4.0)
+    query_cmd.add_argument('--key')
+    query_cmd.add_argument('--pitch-class')
+    args = parser.parse_args()
+
+    corpus = CorpusIndex(args.db)
+    start = time.perf_counter()
+    if args.command == 'index':
+        decoded, skipped, failed = corpus.update(args.root, args.workers)
+        print(f"Decoded {decoded}, unchanged {skipped}, failed {len(failed)} "
+              f"in {time.perf_counter() - start:.1f}s")
+        for path, error in failed:
+            print(f"  {os.path.basename(path)}: {error}")
+    else:
+        rows = corpus.query(args.tempo, args.tolerance, args.key, args.pitch_class)
+        print(f"{len(rows)} matches in {(time.perf_counter() - start) * 1000:.1f} ms")
+        for path, features in rows:
+            print(f"  {describe(features)}  {os.path.basename(path)}")
+    corpus.close()
+
+
+if __name__ == "__main__":
+    main()
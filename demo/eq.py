@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""参数 / 图形均衡器：二阶节 (SOS) 级联，支持分块流式处理
+
+系数按 RBJ Audio EQ Cookbook 公式对所有频段一次性向量化计算；修改频段参数只做标记，
+下一次处理时统一重算，所以拖动推子时不会每次都重算。滤波器状态在块之间保留。
+增益为 0dB 的峰值 / 搁架频段是恒等滤波，处理时直接跳过。
+
+用法示例:
+    python eq.py                        # 画出示例 EQ 曲线
+    python eq.py in.wav out.wav --bands 31 --gains 0 0 3 ...
+"""
+import argparse
+
+import numpy as np
+from scipy import signal
+
+# 频段类型编码
+PEAK, LOW_SHELF, HIGH_SHELF, LOW_PASS, HIGH_PASS = range(5)
+KINDS = {'peak': PEAK, 'lowshelf': LOW_SHELF, 'highshelf': HIGH_SHELF,
+         'lowpass': LOW_PASS, 'highpass': HIGH_PASS}
+
+# 图形均衡器的标准中心频率 (ISO 266) 与对应的 Q 值
+GRAPHIC_BANDS = {
+    31: ([20, 25, 31.5, 40, 50, 63, 80, 100, 125, 160, 200, 250, 315, 400, 500, 630,
+          800, 1000, 1250, 1600, 2000, 2500, 3150, 4000, 5000, 6300, 8000, 10000,
+          12500, 16000, 20000], 4.32),   # 1/3 倍频程
+    15: ([25, 40, 63, 100, 160, 250, 400, 630, 1000, 1600, 2500, 4000, 6300,
+          10000, 16000], 2.15),          # 2/3 倍频程
+    7: ([63, 160, 400, 1000, 2500, 6300, 16000], 1.0),
+}
+
+
+def biquad_sos(kinds, freqs, gains_db, qs, sample_rate):
+    """向量化计算一组二阶节系数，返回 (频段数, 6) 的 sos 数组"""
+    kinds = np.asarray(kinds)
+    freqs = np.asarray(freqs, dtype=np.float64)
+    A = 10 ** (np.asarray(gains_db, dtype=np.float64) / 40)
+    w0 = 2 * np.pi * np.minimum(freqs, sample_rate * 0.499) / sample_rate
+    cos = np.cos(w0)
+    alpha = np.sin(w0) / (2 * np.asarray(qs, dtype=np.float64))
+    sq = 2 * np.sqrt(A) * alpha
+
+    b = np.empty((len(kinds), 3))
+    a = np.empty((len(kinds), 3))
+
+    def fill(kind, bs, as_):
+        m = kinds == kind
+        if m.any():
+            for j in range(3):
+                b[m, j] = np.broadcast_to(bs[j], kinds.shape)[m]
+                a[m, j] = np.broadcast_to(as_[j], kinds.shape)[m]
+
+    fill(PEAK, (1 + alpha * A, -2 * cos, 1 - alpha * A),
+         (1 + alpha / A, -2 * cos, 1 - alpha / A))
+    fill(LOW_SHELF, (A * ((A + 1) - (A - 1) * cos + sq), 2 * A * ((A - 1) - (A + 1) * cos),
+                     A * ((A + 1) - (A - 1) * cos - sq)),
+         ((A + 1) + (A - 1) * cos + sq, -2 * ((A - 1) + (A + 1) * cos),
+          (A + 1) + (A - 1) * cos - sq))
+    fill(HIGH_SHELF, (A * ((A + 1) + (A - 1) * cos + sq), -2 * A * ((A - 1) + (A + 1) * cos),
+                      A * ((A + 1) + (A - 1) * cos - sq)),
+         ((A + 1) - (A - 1) * cos + sq, 2 * ((A - 1) - (A + 1) * cos),
+          (A + 1) - (A - 1) * cos - sq))
+    fill(LOW_PASS, ((1 - cos) / 2, 1 - cos, (1 - cos) / 2), (1 + alpha, -2 * cos, 1 - alpha))
+    fill(HIGH_PASS, ((1 + cos) / 2, -(1 + cos), (1 + cos) / 2), (1 + alpha, -2 * cos, 1 - alpha))
+
+    # 归一化 a0 = 1
+    a0 = a[:, :1]
+    return np.hstack([b / a0, a / a0])
+
+
+class ParametricEQ:
+    """参数均衡器：任意数量的 (类型, 频率, 增益dB, Q) 频段"""
+
+    def __init__(self, sample_rate=44100):
+        self.sample_rate = sample_rate
+        self.kinds = np.zeros(0, dtype=np.int64)
+        self.freqs = np.zeros(0)
+        self.gains_db = np.zeros(0)
+        self.qs = np.zeros(0)
+        self._sos = None
+        self._zi = None
+        self._active = None
+
+    def add_band(self, kind, freq, gain_db=0.0, q=0.707):
+        self.kinds = np.append(self.kinds, KINDS[kind])
+        self.freqs = np.append(self.freqs, freq)
+        self.gains_db = np.append(self.gains_db, gain_db)
+        self.qs = np.append(self.qs, q)
+        self._sos = None
+        self._zi = None
+        return len(self.freqs) - 1
+
+    def set_band(self, index, freq=None, gain_db=None, q=None):
+        """修改一个频段；系数在下一次使用时才重算"""
+        if freq is not None:
+            self.freqs[index] = freq
+        if gain_db is not None:
+            self.gains_db[index] = gain_db
+        if q is not None:
+            self.qs[index] = q
+        self._sos = None
+
+    def set_gains(self, gains_db):
+        """一次设置所有频段的增益"""
+        self.gains_db[:] = gains_db
+        self._sos = None
+
+    @property
+    def sos(self):
+        """全部频段的 sos 系数（有修改时统一重算）"""
+        if self._sos is None:
+            self._sos = biquad_sos(self.kinds, self.freqs, self.gains_db, self.qs,
+                                   self.sample_rate)
+            # 0dB 的峰值 / 搁架频段是恒等滤波，处理时跳过
+            identity = (self.gains_db == 0) & (self.kinds <= HIGH_SHELF)
+            active = ~identity
+            if self._zi is not None and self._active is not None:
+                self._zi[active & ~self._active] = 0.0  # 重新启用的频段从零状态开始
+            self._active = active
+        return self._sos
+
+    def reset(self):
+        """清除滤波器状态（开始处理新的音频时调用）"""
+        self._zi = None
+
+    def process(self, block, start=0, sample_rate=None):
+        """原地滤波一块音频（形状 (帧数,) 或 (帧数, 声道数)），保留块间状态"""
+        sos = self.sos
+        if self._zi is None:
+            self._zi = np.zeros((len(sos), 2) + block.shape[1:])
+        if not self._active.any():
+            return block
+        zi = self._zi[self._active]
+        block[...], zf = signal.sosfilt(sos[self._active], block, axis=0, zi=zi)
+        self._zi[self._active] = zf
+        return block
+
+    def frequency_response(self, n_freqs=2048):
+        """组合频率响应 (频率Hz, 增益dB)，直接由系数计算，不需要处理音频"""
+        freqs = np.geomspace(20, self.sample_rate / 2 * 0.999, n_freqs)
+        if not len(self.freqs):
+            return freqs, np.zeros(n_freqs)
+        _, h = signal.sosfreqz(self.sos, worN=freqs, fs=self.sample_rate)
+        return freqs, 20 * np.log10(np.maximum(np.abs(h), 1e-12))
+
+    def plot_response(self, ax=None):
+        import matplotlib.pyplot as plt
+
+        if ax is None:
+            ax = plt.figure(figsize=(12, 5)).add_subplot(111)
+        freqs, db = self.frequency_response()
+        ax.semilogx(freqs, db, 'b-', linewidth=2)
+        ax.plot(self.freqs, np.interp(self.freqs, freqs, db), 'ro')
+        ax.axhline(0, color='gray', linestyle='--', alpha=0.7)
+        ax.set_xlim(20, self.sample_rate / 2)
+        ax.set_xlabel('Frequency (Hz)', fontsize=12)
+        ax.set_ylabel('Gain (dB)', fontsize=12)
+        ax.grid(True, which='both', linestyle='--', alpha=0.5)
+        return ax
+
+
+class GraphicEQ(ParametricEQ):
+    """图形均衡器：固定中心频率的 7 / 15 / 31 段峰值滤波器"""
+
+    def __init__(self, bands=31, sample_rate=44100):
+        super().__init__(sample_rate)
+        centers, q = GRAPHIC_BANDS[bands]
+        centers = [f for f in centers if f < sample_rate / 2]
+        self.kinds = np.full(len(centers), PEAK)
+        self.freqs = np.array(centers, dtype=np.float64)
+        self.gains_db = np.zeros(len(centers))
+        self.qs = np.full(len(centers), q)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Graphic EQ')
+    parser.add_argument('input', nargs='?')
+    parser.add_argument('output', nargs='?')
+    parser.add_argument('--bands', type=int, default=31, choices=sorted(GRAPHIC_BANDS))
+    parser.add_argument('--gains', type=float, nargs='+', help='gain (dB) per band')
+    args = parser.parse_args()
+
+    if args.input and args.output:
+        import soundfile as sf
+        from gain_stream import process_file
+
+        eq = GraphicEQ(args.bands, sf.info(args.input).samplerate)
+        if args.gains:
+            eq.set_gains(args.gains)
+        process_file(args.input, {args.output: [eq]})
+        return
+
+    # 示例：课程里的常见调整（80Hz 增强低音、200Hz 控制浑浊、2.5kHz 存在感、10kHz 亮度）
+    import matplotlib.pyplot as plt
+
+    eq = GraphicEQ(args.bands)
+    for freq, gain in [(80, 4), (200, -3), (2500, 2), (10000, 3)]:
+        eq.set_band(int(np.argmin(np.abs(eq.freqs - freq))), gain_db=gain)
+    ax = eq.plot_response()
+    ax.set_title(f'{args.bands}-band Graphic EQ Frequency Response', fontsize=14)
+    plt.show()
+
+
+if __name__ == "__main__":
+    main()
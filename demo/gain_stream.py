@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""流式增益 / 音量处理：按块读取长录音，原地处理 float32 缓冲，一遍同时写出多个文件
+
+内存占用只与块大小有关，与录音长度无关。增益可以是常数、dB 斜坡或自动化曲线，
+曲线只在当前块的时间范围内求值，不会生成整段的增益数组。
+
+用法示例:
+    python gain_stream.py rehearsal.wav quiet.wav --gain -6 --volume 0.8
+    python gain_stream.py rehearsal.wav faded.flac --ramp 0 -60 3590 3600
+"""
+import argparse
+import time
+
+import numpy as np
+
+
+class Gain:
+    """固定增益 (dB)"""
+
+    def __init__(self, gain_db):
+        self.linear = 10 ** (gain_db / 20.0)
+
+    def process(self, block, start, sample_rate):
+        block *= self.linear
+
+
+class Volume:
+    """固定音量因子 (0.0 到 1.0)"""
+
+    def __init__(self, volume_factor):
+        self.linear = volume_factor
+
+    def process(self, block, start, sample_rate):
+        block *= self.linear
+
+
+class Automation:
+    """dB 自动化曲线：(时间秒, 增益dB) 折线，曲线之外保持端点值"""
+
+    def __init__(self, times, gains_db):
+        self.times = np.asarray(times, dtype=np.float64)
+        self.gains_db = np.asarray(gains_db, dtype=np.float64)
+        self._t = np.zeros(0)
+        self._gain = np.zeros(0, dtype=np.float32)
+
+    def process(self, block, start, sample_rate):
+        n = len(block)
+        end = (start + n) / sample_rate
+        if end <= self.times[0] or start / sample_rate >= self.times[-1]:
+            # 整块落在曲线外：按常数处理，省掉逐采样插值
+            db = self.gains_db[0] if end <= self.times[0] else self.gains_db[-1]
+            block *= np.float32(10 ** (db / 20.0))
+            return
+
+        if len(self._t) < n:
+            self._t = np.arange(n, dtype=np.float64)
+            self._gain = np.empty(n, dtype=np.float32)
+        t = (self._t[:n] + start) / sample_rate
+        gain = self._gain[:n]
+        gain[:] = np.interp(t, self.times, self.gains_db)
+        gain /= 20.0
+        np.power(np.float32(10.0), gain, out=gain)
+        block *= gain[:, None] if block.ndim == 2 else gain
+
+
+class Ramp(Automation):
+    """从 start_db 线性过渡到 end_db（单位 dB），时间区间 [start_time, end_time] 秒"""
+
+    def __init__(self, start_db, end_db, start_time, end_time):
+        super().__init__([start_time, end_time], [start_db, end_db])
+
+
+def process_file(input_path, outputs, blocksize=65536, subtype=None):
+    """读一遍 input_path，按各自的处理链写出多个文件
+
+    outputs: {输出路径: [处理环节, ...]}
+    返回处理的采样帧数。
+    """
+    import soundfile as sf
+
+    info = sf.info(input_path)
+    writers = {path: sf.SoundFile(path, 'w', info.samplerate, info.channels,
+                                  subtype=subtype or info.subtype)
+               for path in outputs}
+    scratch = np.empty((blocksize, info.channels), dtype=np.float32)
+    start = 0
+    try:
+        for block in sf.blocks(input_path, blocksize=blocksize, dtype='float32',
+                               always_2d=True):
+            n = len(block)
+            work = scratch[:n]
+            for path, chain in outputs.items():
+                np.copyto(work, block)
+                for stage in chain:
+                    stage.process(work, start, info.samplerate)
+                writers[path].write(work)
+            start += n
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Streaming gain / volume processor')
+    parser.add_argument('input')
+    parser.add_argument('output')
+    parser.add_argument('--gain', type=float, help='gain in dB')
+    parser.add_argument('--volume', type=float, help='volume factor 0.0-1.0')
+    parser.add_argument('--ramp', type=float, nargs=4, action='append', default=[],
+                        metavar=('START_DB', 'END_DB', 'START_S', 'END_S'))
+    parser.add_argument('--blocksize', type=int, default=65536)
+    args = parser.parse_args()
+
+    chain = []
+    if args.gain is not None:
+        chain.append(Gain(args.gain))
+    if args.volume is not None:
+        chain.append(Volume(args.volume))
+    chain.extend(Ramp(*ramp) for ramp in args.ramp)
+
+    begin = time.perf_counter()
+    frames = process_file(args.input, {args.output: chain}, args.blocksize)
+    elapsed = time.perf_counter() - begin
+    print(f"Processed {frames} frames in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""钢琴键盘数据：数组形式的键表 + 几何索引（命中测试、音名 -> 键号、键号 -> 频率）
+
+键号约定（全部模块共用本模块的换算函数）：键号按音高从 0 数起，第 0 键 = A0 = 27.5Hz，
+第 39 键 = C4，第 48 键 = A4 = 440Hz；MIDI 音高 = 键号 + 21，音级 = (键号 + 9) % 12。
+"""
+from bisect import bisect_right
+
+import numpy as np
+
+BASE_NOTES = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
+WHITE_KEY_WIDTH = 1.0
+BLACK_KEY_WIDTH = 0.6
+
+
+MIDI_A0 = 21  # 第 0 键（A0）的 MIDI 音高
+A4_KEY = 48   # 440Hz 的键号
+
+
+def key_to_midi(key):
+    """键号 -> MIDI 音高（MIDI 60 = C4 = 第 39 键），也接受数组"""
+    return key + MIDI_A0
+
+
+def midi_to_key(note):
+    """MIDI 音高 -> 键号；超出 88 键的音不在 0..87 之内，由调用方过滤"""
+    return note - MIDI_A0
+
+
+def key_pitch_class(key):
+    """键号 -> 音级（0 = C，第 0 键 A0 的音级是 9），也接受数组"""
+    return (np.asarray(key) + 9) % 12
+
+
+def key_frequency(key):
+    """键号 -> 频率，A4 = 440Hz，也接受数组"""
+    return 440 * 2**((np.asarray(key) - A4_KEY) / 12)
+
+
+def frequency_to_key(freq):
+    """频率 -> 键号（浮点，未取整），也接受数组"""
+    return 12 * np.log2(np.asarray(freq) / 440) + A4_KEY
+
+
+def key_name(key):
+    """键号 -> 科学音高记法的音名（第 39 键 = C4）"""
+    return f"{BASE_NOTES[(key + 9) % 12]}{(key + 9) // 12}"
+
+
+class KeyTable:
+    """结构体数组形式的键表：每个字段一个 NumPy 数组，外加一个 Rectangle 列表
+
+    几何和频率全部向量化计算，不依赖 matplotlib，同一进程里开多个键盘只是
+    多几组小数组。和弦构建、高亮、合成可以直接用键号数组批量取值。
+    """
+
+    def __init__(self, n_keys=88, base_notes=BASE_NOTES):
+        self.index = np.arange(n_keys)
+        pitch_class = key_pitch_class(self.index)
+        octave = (self.index + 9) // 12  # 从A0开始
+        self.notes = [f"{base_notes[pc]}{o}" for pc, o in zip(pitch_class, octave)]
+        self.is_black = np.array(['#' in base_notes[pc] for pc in pitch_class])
+        self.freq = key_frequency(self.index)  # A4 = 440Hz
+
+        # 白键依次排开；黑键骑在前一个白键的右边界上
+        is_white = ~self.is_black
+        whites_before = np.cumsum(is_white) - is_white
+        self.x = np.where(self.is_black, whites_before - BLACK_KEY_WIDTH / 2,
+                          whites_before).astype(np.float64)
+        self.width = np.where(self.is_black, BLACK_KEY_WIDTH, WHITE_KEY_WIDTH)
+        self.y = np.where(self.is_black, 1.0, 0.0)
+        self.height = np.where(self.is_black, 1.0, 2.0)
+        self.n_white = int(is_white.sum())
+
+        self.rects = [None] * n_keys  # 由界面创建
+        self._by_name = {name: i for i, name in enumerate(self.notes)}
+
+    def __len__(self):
+        return len(self.notes)
+
+    def __getitem__(self, i):
+        return KeyView(self, int(i))
+
+    def __iter__(self):
+        return (KeyView(self, i) for i in range(len(self)))
+
+    def index_of(self, name):
+        return self._by_name.get(name)
+
+    def notes_at(self, indices):
+        return [self.notes[i] for i in indices]
+
+
+class KeyView:
+    """单个键的只读视图，给需要逐键访问的调用方使用"""
+
+    __slots__ = ('table', 'index')
+
+    def __init__(self, table, index):
+        self.table = table
+        self.index = index
+
+    @property
+    def note(self):
+        return self.table.notes[self.index]
+
+    @property
+    def rect(self):
+        return self.table.rects[self.index]
+
+    @property
+    def freq(self):
+        return float(self.table.freq[self.index])
+
+    @property
+    def is_black(self):
+        return bool(self.table.is_black[self.index])
+
+    @property
+    def x(self):
+        return float(self.table.x[self.index])
+
+    @property
+    def width(self):
+        return float(self.table.width[self.index])
+
+
+class KeyIndex:
+    """预先排好序的键位区间索引
+
+    白键和黑键分两层各自按 x 排序，命中测试用二分查找，黑键层优先
+    （黑键压在白键上）。音名查找是字典查找，频率是数组下标。
+    多个键盘（如 2×88 双人模式）可以用 combine() 横向拼接成一个索引，
+    全局键号 = 键盘号 × 每个键盘的键数 + 键盘内键号。
+    """
+
+    def __init__(self, names, x, width, is_black, freqs, black_bottom=1.0,
+                 keys_per_board=None):
+        self.names = list(names)
+        self.x = np.asarray(x, dtype=np.float64)
+        self.width = np.asarray(width, dtype=np.float64)
+        self.is_black = np.asarray(is_black, dtype=bool)
+        self.freqs = np.asarray(freqs, dtype=np.float64)
+        self.black_bottom = black_bottom
+        self.keys_per_board = keys_per_board or len(self.names)
+
+        self._white = self._layer(np.flatnonzero(~self.is_black))
+        self._black = self._layer(np.flatnonzero(self.is_black))
+        # 同名键只记录第一个键盘上的位置，其它键盘按偏移换算
+        self._by_name = {}
+        for i, name in enumerate(self.names[:self.keys_per_board]):
+            self._by_name.setdefault(name, i)
+
+    def _layer(self, ids):
+        """(按 x 排序的键号, 左边界, 右边界)，用 list 便于 bisect"""
+        ids = ids[np.argsort(self.x[ids], kind='stable')]
+        return ids.tolist(), self.x[ids].tolist(), (self.x[ids] + self.width[ids]).tolist()
+
+    @classmethod
+    def from_table(cls, table, black_bottom=1.0):
+        """由 KeyTable 构建"""
+        return cls(table.notes, table.x, table.width, table.is_black, table.freq,
+                   black_bottom)
+
+    @classmethod
+    def combine(cls, indexes, x_offsets):
+        """把多个键盘横向拼成一个索引（各键盘键数必须相同）"""
+        n = indexes[0].keys_per_board
+        return cls(sum((idx.names for idx in indexes), []),
+                   np.concatenate([idx.x + off for idx, off in zip(indexes, x_offsets)]),
+                   np.concatenate([idx.width for idx in indexes]),
+                   np.concatenate([idx.is_black for idx in indexes]),
+                   np.concatenate([idx.freqs for idx in indexes]),
+                   indexes[0].black_bottom, keys_per_board=n)
+
+    @staticmethod
+    def _find(layer, x):
+        ids, left, right = layer
+        j = bisect_right(left, x) - 1
+        if j >= 0 and x < right[j]:
+            return ids[j]
+        return None
+
+    def hit(self, x, y):
+        """返回坐标 (x, y) 处的键号，黑键优先；没有命中返回 None"""
+        if x is None or y is None:
+            return None
+        if y >= self.black_bottom:
+            key = self._find(self._black, x)
+            if key is not None:
+                return key
+        return self._find(self._white, x)
+
+    def index_of(self, name, board=0):
+        """音名 -> 键号（O(1)）"""
+        i = self._by_name.get(name)
+        if i is None:
+            return None
+        return board * self.keys_per_board + i
+
+    def frequency(self, name, board=0):
+        i = self.index_of(name, board)
+        return None if i is None else float(self.freqs[i])
+
+    def board_of(self, key):
+        """键号 -> (键盘号, 键盘内键号)"""
+        return divmod(key, self.keys_per_board)
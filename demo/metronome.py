@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""采样级精确的节拍器调度器：提前把点击音轨渲染进环形缓冲"""
+from types import MappingProxyType
+import time
+
+import numpy as np
+
+from synth import SAMPLE_RATE
+
+# 点击音色：beep 为原来的正弦点击，voice 为报数（"one, two, three…"，细分拍为 "and"）
+KITS = ('beep', 'woodblock', 'hihat', 'cowbell', 'voice')
+# 预渲染的强度：强拍、弱拍、细分拍
+ACCENTS = (1.0, 0.5, 0.25)
+SUBDIVISIONS = {'1/4': 1, '1/8': 2, '三连音': 3, '1/16': 4}
+
+# 报数用的元音共振峰 (F1, F2)，按拍序循环
+COUNT_VOWELS = [(640, 1190), (300, 870), (270, 2290), (570, 840),
+                (730, 1090), (390, 1990), (530, 1840), (480, 2000)]
+AND_VOWEL = (660, 1720)
+
+
+def click_sound(strength, sample_rate=SAMPLE_RATE):
+    """生成节拍声音：强拍 440Hz，弱拍 800Hz"""
+    duration = 0.05
+    t = np.linspace(0, duration, int(sample_rate * duration), False)
+    
+    freq = 800 if strength < 1 else 440
+    click = np.sin(2 * np.pi * freq * t)
+    
+    envelope = np.exp(-10 * t)
+    return click * envelope * strength * 0.5
+
+
+def _time(duration, sample_rate):
+    return np.arange(int(duration * sample_rate)) / sample_rate
+
+
+def woodblock_sound(strength, sample_rate=SAMPLE_RATE):
+    """木鱼：两个快速衰减的非谐和正弦，弱拍音高更高"""
+    t = _time(0.06, sample_rate)
+    base = 1000 if strength >= 1 else 1250
+    wave = np.sin(2 * np.pi * base * t) + 0.5 * np.sin(2 * np.pi * base * 1.58 * t)
+    return wave * np.exp(-70 * t) * strength * 0.35
+
+
+def hihat_sound(strength, sample_rate=SAMPLE_RATE):
+    """闭镲：高通噪声加几个方波金属泛音（固定种子，每次渲染结果相同）"""
+    t = _time(0.08, sample_rate)
+    noise = np.random.default_rng(7).standard_normal(len(t) + 1)
+    metal = sum(np.sign(np.sin(2 * np.pi * f * t)) for f in (3140, 4270, 5560, 7380))
+    wave = np.diff(noise) * 0.5 + metal * 0.15
+    decay = 45 if strength >= 1 else 70
+    return wave / np.abs(wave).max() * np.exp(-decay * t) * strength * 0.6
+
+
+def cowbell_sound(strength, sample_rate=SAMPLE_RATE):
+    """牛铃：两个方波（587Hz / 845Hz），一阶低通削掉刺耳的高次谐波"""
+    t = _time(0.15, sample_rate)
+    wave = np.sign(np.sin(2 * np.pi * 587 * t)) + np.sign(np.sin(2 * np.pi * 845 * t))
+    alpha = 1 - np.exp(-2 * np.pi * 2500 / sample_rate)
+    smoothed = np.empty_like(wave)
+    smoothed[0] = alpha * wave[0]
+    for i in range(1, len(wave)):
+        smoothed[i] = smoothed[i - 1] + alpha * (wave[i] - smoothed[i - 1])
+    smoothed /= np.abs(smoothed).max()
+    envelope = np.where(t < 0.01, 1.0, 0.6) * np.exp(-18 * t)
+    return smoothed * envelope * strength * 0.5
+
+
+def voice_sound(strength, sample_rate=SAMPLE_RATE, vowel=AND_VOWEL):
+    """报数：谐波加法合成，各次谐波按两个共振峰加权（强拍音高更高）"""
+    t = _time(0.18, sample_rate)
+    f0 = (180 if strength >= 1 else 150) * (1 - 0.15 * t / t[-1])  # 句尾降调
+    phase = 2 * np.pi * np.cumsum(f0) / sample_rate
+    harmonics = np.arange(1, int(4000 / f0.max()) + 1)
+    gains = sum(1 / (1 + ((harmonics * f0[0] - f) / 80) ** 2) for f in vowel) / harmonics**0.5
+    wave = np.sin(np.outer(phase, harmonics)) @ gains
+    envelope = np.minimum(t / 0.01, 1) * np.exp(-12 * t)
+    return wave / np.abs(wave).max() * envelope * strength * 0.5
+
+
+_KIT_SOUNDS = {'beep': click_sound, 'woodblock': woodblock_sound, 'hihat': hihat_sound,
+               'cowbell': cowbell_sound}
+
+
+class ClickBank:
+    """预渲染、只读的点击音库，键为 (强度, 音色, 采样率)
+
+    构造时把每个强度（报数音色还包括每个拍序）都渲染好，之后 click() 只是查表，
+    返回的数组不可写，可以在调度线程里直接叠加而不用拷贝。
+    """
+
+    def __init__(self, kit='beep', sample_rate=SAMPLE_RATE, max_count=len(COUNT_VOWELS)):
+        if kit not in KITS:
+            raise ValueError(f"Unknown click kit: {kit}")
+        self.kit = kit
+        self.sample_rate = sample_rate
+        sounds = {}
+        for accent in ACCENTS:
+            if kit == 'voice':
+                sounds[accent, None] = voice_sound(accent, sample_rate)
+                for count in range(1, max_count + 1):
+                    vowel = COUNT_VOWELS[(count - 1) % len(COUNT_VOWELS)]
+                    sounds[accent, count] = voice_sound(accent, sample_rate, vowel)
+            else:
+                sounds[accent, None] = _KIT_SOUNDS[kit](accent, sample_rate)
+        for wave in sounds.values():
+            wave.flags.writeable = False
+        self._sounds = MappingProxyType(sounds)
+        self._max_count = max_count
+
+    @staticmethod
+    def accent(strength):
+        """任意强度 -> 最接近的预渲染强度"""
+        return min(ACCENTS, key=lambda a: abs(a - strength))
+
+    def click(self, strength, count=None):
+        """查表取点击波形；count 为拍序（从 1 开始），只有报数音色用到"""
+        if self.kit != 'voice' or count is None:
+            count = None
+        else:
+            count = (count - 1) % self._max_count + 1
+        return self._sounds[self.accent(strength), count]
+
+    def __call__(self, strength):
+        return self.click(strength)
+
+    def __len__(self):
+        return len(self._sounds)
+
+
+_banks = {}
+
+
+def get_click_bank(kit='beep', sample_rate=SAMPLE_RATE):
+    """获取共享点击音库（同一音色、采样率只渲染一次）"""
+    key = (kit, sample_rate)
+    if key not in _banks:
+        _banks[key] = ClickBank(kit, sample_rate)
+    return _banks[key]
+
+
+class ClickScheduler:
+    """把每个节拍放在精确的采样位置上
+
+    节拍位置用浮点采样坐标累加、写入时再取整，因此误差永远不超过半个采样，
+    不会随时间累积。生产者线程调用 fill() 逐拍提前渲染（小节再长也不受缓冲
+    大小限制），音频线程通过 read() 取数据（作为 StreamMixer 的 source）。
+    速度和细分的修改在下一个尚未渲染的小节边界生效。
+
+    click_fn 可以是 ClickBank（报数音色会拿到拍序），也可以是任意 strength -> 波形 的函数。
+    每拍细分成 subdivision 份，细分拍用 ACCENTS[-1] 强度叠加在各自的采样位置上。
+    """
+
+    def __init__(self, click_fn, sample_rate=SAMPLE_RATE, buffer_time=2.0,
+                 lookahead=0.25, subdivision=1):
+        self.click_fn = click_fn            # strength -> 点击波形
+        self._click = click_fn.click if isinstance(click_fn, ClickBank) else \
+            (lambda strength, count: click_fn(strength))
+        self.subdivision = subdivision
+        self._pending_subdivision = None
+        self.sample_rate = sample_rate
+        self.lookahead = int(lookahead * sample_rate)
+        self._ring = np.zeros(int(buffer_time * sample_rate))
+        self._out = np.zeros(0)
+        self.on_tempo = None                # (新速度, 生效时刻) 回调，时刻按采样时钟计（秒）
+        self.reset([1], 90)
+
+    def reset(self, pattern, tempo):
+        """重新开始：清空缓冲，节拍从第 0 个采样开始（停止时选的细分在此生效）"""
+        self.pattern = list(pattern)
+        self.tempo = float(tempo)
+        self._pending_tempo = None
+        if self._pending_subdivision is not None:
+            self.subdivision, self._pending_subdivision = self._pending_subdivision, None
+        self._ring[:] = 0.0
+        self._read_pos = 0          # 已被声卡读走的采样数（音频线程写）
+        self._bar_pos = 0.0         # 当前小节起点（浮点采样坐标）
+        self._beat = 0              # 下一个要渲染的拍在小节内的序号
+        self._written = 0           # 已渲染完成的采样上界
+        self._ideal_time = 0.0      # 按秒独立累加的理论时间，用于测量漂移
+        self.bars = 0
+        self.underruns = 0
+        self.late_clicks = 0
+        self.max_drift = 0.0
+        self._wall_start = None
+
+    def set_tempo(self, tempo):
+        """修改速度，在下一个小节边界生效"""
+        self._pending_tempo = float(tempo)
+
+    def set_subdivision(self, subdivision):
+        """修改每拍细分数（1 = 四分音符，2 = 八分，3 = 三连音，4 = 十六分），下一个小节生效"""
+        self._pending_subdivision = int(subdivision)
+
+    @property
+    def samples_per_beat(self):
+        return 60.0 * self.sample_rate / self.tempo
+
+    @property
+    def poll_interval(self):
+        """生产者线程的轮询间隔（只影响预渲染进度，不影响节拍精度）"""
+        return self.lookahead / self.sample_rate / 4
+
+    def _add(self, pos, samples):
+        """把波形叠加到环形缓冲的绝对采样位置 pos"""
+        size = len(self._ring)
+        start = pos % size
+        n1 = min(len(samples), size - start)
+        self._ring[start:start + n1] += samples[:n1]
+        if n1 < len(samples):
+            self._ring[:len(samples) - n1] += samples[n1:]
+
+    def fill(self):
+        """逐拍预渲染，直到缓冲覆盖 read 位置之后 lookahead 个采样"""
+        while self._written < self._read_pos + self.lookahead:
+            if self._beat == 0:
+                if self._pending_tempo is not None:
+                    self.tempo, self._pending_tempo = self._pending_tempo, None
+                    if self.on_tempo is not None:
+                        self.on_tempo(self.tempo, self._bar_pos / self.sample_rate)
+                if self._pending_subdivision is not None:
+                    self.subdivision, self._pending_subdivision = self._pending_subdivision, None
+
+            spb = self.samples_per_beat
+            beat_pos = self._bar_pos + self._beat * spb
+            pos = round(beat_pos)
+            strength = self.pattern[self._beat]
+            if strength > 0:
+                # 本拍及其细分拍：只查表，不做任何合成
+                clicks = [(pos, self._click(strength, self._beat + 1))]
+                for k in range(1, self.subdivision):
+                    clicks.append((round(beat_pos + k * spb / self.subdivision),
+                                   self._click(ACCENTS[-1], None)))
+                end = max(p + len(wave) for p, wave in clicks)
+                if end - self._read_pos > len(self._ring):
+                    break  # 缓冲已满，等待音频线程读走
+                for p, wave in clicks:
+                    if p < self._read_pos:
+                        self.late_clicks += 1  # 预渲染跟不上，这一拍已经来不及
+                    else:
+                        self._add(p, wave)
+
+            # 与独立累加的秒数比较，记录调度漂移
+            ideal = self._ideal_time + self._beat * 60.0 / self.tempo
+            self.max_drift = max(self.max_drift, abs(pos / self.sample_rate - ideal))
+
+            self._beat += 1
+            if self._beat == len(self.pattern):
+                self._ideal_time += len(self.pattern) * 60.0 / self.tempo
+                self._bar_pos += spb * len(self.pattern)
+                self._beat = 0
+                self.bars += 1
+            self._written = round(self._bar_pos + self._beat * spb)
+
+    def read(self, frames):
+        """音频线程调用：取出 frames 个采样并清零已读区域"""
+        if self._wall_start is None:
+            self._wall_start = time.perf_counter()
+        if len(self._out) < frames:
+            self._out = np.zeros(frames)
+        out = self._out[:frames]
+
+        size = len(self._ring)
+        start = self._read_pos % size
+        n1 = min(frames, size - start)
+        out[:n1] = self._ring[start:start + n1]
+        self._ring[start:start + n1] = 0.0
+        if n1 < frames:
+            out[n1:] = self._ring[:frames - n1]
+            self._ring[:frames - n1] = 0.0
+
+        if self._read_pos + frames > self._written:
+            self.underruns += 1
+        self._read_pos += frames
+        return out
+
+    @property
+    def position(self):
+        """当前播放位置（秒，按采样时钟计算）"""
+        return self._read_pos / self.sample_rate
+
+    def clock_time(self, t):
+        """perf_counter 时刻 t -> 采样时钟上的秒数（第 0 个采样 = 0）；还没开始播放时返回 None"""
+        if self._wall_start is None:
+            return None
+        return t - self._wall_start
+
+    def clock_drift(self):
+        """采样时钟与系统时钟之差（秒），包含输出缓冲带来的抖动"""
+        if self._wall_start is None:
+            return 0.0
+        return (time.perf_counter() - self._wall_start) - self.position
+
+    def render(self, n_samples, block=4096):
+        """离线渲染 n_samples 个采样（与实时播放走同一套调度）"""
+        out = np.empty(n_samples)
+        pos = 0
+        while pos < n_samples:
+            self.fill()
+            n = min(block, n_samples - pos)
+            out[pos:pos + n] = self.read(n)
+            pos += n
+        return out
+
+    def report(self):
+        return (f"{self.bars} bars, {self.position:.1f}s played, "
+                f"schedule drift {self.max_drift * 1000:.3f} ms, "
+                f"clock drift {self.clock_drift() * 1000:.1f} ms, "
+                f"underruns {self.underruns}, late clicks {self.late_clicks}")
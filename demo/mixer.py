@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""常驻音频混音器：一个长期打开的 OutputStream + 复音声部池"""
+from collections import deque
+import itertools
+
+import numpy as np
+
+from synth import SAMPLE_RATE
+
+
+class StreamMixer:
+    """回调驱动的混音器
+
+    界面线程只往命令队列里追加 (play/stop) 命令，音频线程在每个回调开头取出
+    并更新声部池；deque 的 append/popleft 是原子操作，因此两边无需加锁。
+    """
+
+    def __init__(self, sample_rate=SAMPLE_RATE, blocksize=128, max_voices=32,
+                 fade_time=0.01, latency='low'):
+        self.sample_rate = sample_rate
+        self.blocksize = blocksize
+        self.max_voices = max_voices
+        self.latency = latency
+        self.fade_samples = max(1, int(fade_time * sample_rate))
+
+        self._commands = deque()
+        self._ids = itertools.count(1)
+        self._stream = None
+
+        # 声部池（只在音频线程中修改）
+        self._buffers = [None] * max_voices
+        self._voice_ids = np.zeros(max_voices, dtype=np.int64)
+        self._pos = np.zeros(max_voices, dtype=np.int64)
+        self._gain = np.zeros(max_voices)
+        self._fade_left = np.zeros(max_voices, dtype=np.int64)  # 0 表示未在淡出
+        self._started = np.zeros(max_voices, dtype=np.int64)    # 用于抢占最早的声部
+        self._block_count = 0
+        self._sources = []
+
+        self._mix = np.zeros(blocksize)
+        self._ramp = np.linspace(1, 0, self.fade_samples, endpoint=False)
+        # 被抢占声部的淡出尾巴（_tail[0] 是下一个要输出的采样）
+        self._tail = np.zeros(self.fade_samples)
+        self._tail_len = 0
+
+    # ---- 界面线程 API ----
+
+    def start(self):
+        """打开并启动输出流（重复调用无副作用）"""
+        if self._stream is None:
+            # 延迟导入：打开音频设备较慢，只在第一次发声时进行
+            import sounddevice as sd
+            self._stream = sd.OutputStream(samplerate=self.sample_rate, channels=1,
+                                           blocksize=self.blocksize, dtype='float32',
+                                           latency=self.latency, callback=self._callback)
+            self._stream.start()
+        return self
+
+    def play(self, samples, gain=1.0):
+        """排入一段音频，返回声部 id；不会打断正在发声的其它声部"""
+        if self._stream is None:
+            self.start()
+        voice_id = next(self._ids)
+        self._commands.append(('play', voice_id, np.asarray(samples, dtype=np.float64), gain))
+        return voice_id
+
+    def add_source(self, source):
+        """挂接流式音源：每个回调调用 source.read(frames) 取一块音频"""
+        if self._stream is None:
+            self.start()
+        self._commands.append(('add_source', source, None, None))
+
+    def remove_source(self, source):
+        self._commands.append(('remove_source', source, None, None))
+
+    def stop(self, voice_id=None):
+        """淡出指定声部；voice_id 为 None 时淡出全部声部"""
+        self._commands.append(('stop', voice_id, None, None))
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+    @property
+    def output_latency(self):
+        """输出流报告的延迟（秒）：回调取走的采样要过这么久才真正发声"""
+        return float(self._stream.latency) if self._stream is not None else 0.0
+
+    @property
+    def active_voices(self):
+        return sum(buf is not None for buf in self._buffers)
+
+    # ---- 音频线程 ----
+
+    def _allocate(self):
+        """找空闲声部；复音数已满时抢占最早开始的声部"""
+        for slot, buf in enumerate(self._buffers):
+            if buf is None:
+                return slot
+        slot = int(np.argmin(self._started))
+        self._steal(slot)
+        return slot
+
+    def _steal(self, slot):
+        """把被抢占声部剩余的淡出段叠加到尾巴缓冲里，避免直接截断产生爆音"""
+        buf, pos = self._buffers[slot], self._pos[slot]
+        start = self.fade_samples - self._fade_left[slot] if self._fade_left[slot] else 0
+        n = min(self.fade_samples - start, len(buf) - pos)
+        if n <= 0:
+            return
+        self._tail[:n] += buf[pos:pos + n] * self._ramp[start:start + n] * self._gain[slot]
+        self._tail_len = max(self._tail_len, n)
+
+    def _process_commands(self):
+        while self._commands:
+            cmd, target, samples, gain = self._commands.popleft()
+            if cmd == 'play':
+                slot = self._allocate()
+                self._buffers[slot] = samples
+                self._voice_ids[slot] = target
+                self._pos[slot] = 0
+                self._gain[slot] = gain
+                self._fade_left[slot] = 0
+                self._started[slot] = self._block_count
+            elif cmd == 'add_source':
+                self._sources.append(target)
+            elif cmd == 'remove_source':
+                if target in self._sources:
+                    self._sources.remove(target)
+            else:
+                for slot, buf in enumerate(self._buffers):
+                    if buf is not None and (target is None or self._voice_ids[slot] == target):
+                        if not self._fade_left[slot]:
+                            self._fade_left[slot] = self.fade_samples
+
+    def render(self, frames):
+        """混合下一块音频（回调内部使用，也可用于离线测试）"""
+        self._process_commands()
+        if len(self._mix) < frames:
+            self._mix = np.zeros(frames)
+        mix = self._mix[:frames]
+        mix[:] = 0.0
+
+        if self._tail_len:
+            n = min(frames, self._tail_len)
+            mix[:n] += self._tail[:n]
+            rest = self._tail_len - n
+            self._tail[:rest] = self._tail[n:self._tail_len]
+            self._tail[rest:self._tail_len] = 0.0
+            self._tail_len = rest
+
+        for slot, buf in enumerate(self._buffers):
+            if buf is None:
+                continue
+            pos = self._pos[slot]
+            n = min(frames, len(buf) - pos)
+            fade_left = self._fade_left[slot]
+            if fade_left:
+                # 声部淡出：沿预先计算的斜坡继续衰减
+                n = min(n, fade_left)
+                start = self.fade_samples - fade_left
+                mix[:n] += buf[pos:pos + n] * self._ramp[start:start + n] * self._gain[slot]
+                self._fade_left[slot] = fade_left - n
+                done = self._fade_left[slot] == 0
+            else:
+                mix[:n] += buf[pos:pos + n] * self._gain[slot]
+                done = False
+            self._pos[slot] = pos + n
+            if done or self._pos[slot] >= len(buf):
+                self._buffers[slot] = None
+
+        for source in self._sources:
+            mix += source.read(frames)
+
+        self._block_count += 1
+        np.clip(mix, -1.0, 1.0, out=mix)
+        return mix
+
+    def _callback(self, outdata, frames, time, status):
+        if status:
+            print(f"Audio status: {status}")
+        outdata[:, 0] = self.render(frames)
+
+
+_mixers = {}
+
+
+def get_mixer(sample_rate=SAMPLE_RATE):
+    """获取所有 demo 共享的混音器（首次播放时才打开音频设备）"""
+    mixer = _mixers.get(sample_rate)
+    if mixer is None:
+        mixer = _mixers[sample_rate] = StreamMixer(sample_rate)
+    return mixer
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""各 demo 共用的乐理数据表（和弦、音阶、节奏练习），不依赖任何界面或音频库"""
+
+BASE_NOTES = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
+
+# PianoTeacher 的和弦（添加中文注释）
+TRIADS = {
+    'Major (大三和弦)': [0, 4, 7],
+    'Minor (小三和弦)': [0, 3, 7],
+    'Diminished (减三和弦)': [0, 3, 6],
+    'Augmented (增三和弦)': [0, 4, 8]
+}
+
+SEVENTH_CHORDS = {
+    'Major 7th (大七和弦)': [0, 4, 7, 11],
+    'Minor 7th (小七和弦)': [0, 3, 7, 10],
+    'Dominant 7th (属七和弦)': [0, 4, 7, 10],
+    'Half Dim (半减七和弦)': [0, 3, 6, 10],
+    'Dim 7th (减七和弦)': [0, 3, 6, 9]
+}
+
+EXTENDED_CHORDS = {
+    '9th (九和弦)': [0, 4, 7, 10, 14],
+    '11th (十一和弦)': [0, 4, 7, 10, 14, 17],
+    '13th (十三和弦)': [0, 4, 7, 10, 14, 17, 21]
+}
+
+# TwelveToneCircle 的和弦类型定义（带中文注释）
+CIRCLE_CHORD_TYPES = {
+    'Major Triad (大三和弦)': [0, 4, 7],
+    'Minor Triad (小三和弦)': [0, 3, 7],
+    'Dim Triad (减三和弦)': [0, 3, 6],
+    'Aug Triad (增三和弦)': [0, 4, 8],
+    'Major 7th (大七和弦)': [0, 4, 7, 11],
+    'Minor 7th (小七和弦)': [0, 3, 7, 10],
+    'Dom 7th (属七和弦)': [0, 4, 7, 10]
+}
+
+# 和弦记号后缀（和弦表名字 -> 记号，TwelveToneCircle 的名字与 PianoTeacher 的同音程名字共用）
+CHORD_SYMBOLS = {
+    'Major (大三和弦)': '', 'Minor (小三和弦)': 'm',
+    'Diminished (减三和弦)': 'dim', 'Augmented (增三和弦)': 'aug',
+    'Major 7th (大七和弦)': 'maj7', 'Minor 7th (小七和弦)': 'm7',
+    'Dominant 7th (属七和弦)': '7', 'Half Dim (半减七和弦)': 'm7b5',
+    'Dim 7th (减七和弦)': 'dim7',
+    '9th (九和弦)': '9', '11th (十一和弦)': '11', '13th (十三和弦)': '13',
+}
+
+# 音级（相对根音的半音数）对应的罗马数字级数
+ROMAN_NUMERALS = {
+    0: 'I', 1: 'II♭', 2: 'II', 3: 'III♭', 4: 'III', 5: 'IV',
+    6: 'V♭', 7: 'V', 8: 'VI♭', 9: 'VI', 10: 'VII♭', 11: 'VII'
+}
+
+# 音程中英文对照
+INTERVAL_NAMES = {
+    0: "Root (根音)",
+    1: "Minor 2nd (小二度)",
+    2: "Major 2nd (大二度)",
+    3: "Minor 3rd (小三度)",
+    4: "Major 3rd (大三度)",
+    5: "Perfect 4th (纯四度)",
+    6: "Tritone (三全音)",
+    7: "Perfect 5th (纯五度)",
+    8: "Minor 6th (小六度)",
+    9: "Major 6th (大六度)",
+    10: "Minor 7th (小七度)",
+    11: "Major 7th (大七度)"
+}
+
+# FrequencyPlotter 的音阶
+SCALES = {
+    'major': [0, 2, 4, 5, 7, 9, 11],
+    'minor': [0, 2, 3, 5, 7, 8, 10],
+    'chromatic': list(range(12))
+}
+
+# Krumhansl-Kessler 调性轮廓（第 0 项为主音），和弦谱与录音的调性推断共用
+MAJOR_PROFILE = [6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88]
+MINOR_PROFILE = [6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17]
+
+# RhythmTeacher 的课程内容
+LESSONS = {
+    "基础节拍": {
+        "theory": [
+            "节拍是音乐的心跳",
+            "基本拍子：2/4, 3/4, 4/4",
+            "强拍和弱拍的概念"
+        ],
+        "exercises": [
+            {"name": "单拍练习", "pattern": [1]},
+            {"name": "强弱拍练习", "pattern": [1, 0]},
+            {"name": "四拍子练习", "pattern": [1, 0, 0.5, 0]}
+        ]
+    },
+    "常见节奏型": {
+        "theory": [
+            "行进曲：| ♩ ♩ | ♩ ♩ |",
+            "圆舞曲：| ♩ ♪ ♪ | ♩ ♪ ♪ |",
+            "伦巴：  | ♩ ♪♪ ♩ | ♩ ♪♪ ♩ |"
+        ],
+        "exercises": [
+            {"name": "行进曲练习", "pattern": [1, 1, 1, 1]},
+            {"name": "圆舞曲练习", "pattern": [1, 0.5, 0.5]},
+            {"name": "伦巴练习", "pattern": [1, 0.5, 0.5, 1]}
+        ]
+    },
+    "复合拍子": {
+        "theory": [
+            "6/8拍：两个主要重拍",
+            "切分音：重音位置改变",
+            "混合拍子：如5/4, 7/8"
+        ],
+        "exercises": [
+            {"name": "6/8练习", "pattern": [1, 0, 0, 0.5, 0, 0]},
+            {"name": "切分音练习", "pattern": [0.5, 1, 0.5]},
+            {"name": "5/4练习", "pattern": [1, 0, 1, 0, 0]}
+        ]
+    }
+}
+
+# 课程里的和弦进行（罗马数字，按调性解析）
+PROGRESSIONS = {
+    'Canon (卡农)': 'I V vi iii IV I IV V',
+    'T-S-D-T': 'I IV V I',
+    '1-6-4-5': 'I vi IV V',
+    '2-5-1': 'ii7 V7 Imaj7',
+}
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""和弦进行播放：解析罗马数字 / 和弦名，按调性解析到和弦表，按 BPM 整段预渲染后循环播放
+
+每个和弦从排列索引里挑与上一个和弦总移动最小的排列（就近声部进行），
+相邻和弦之间做等功率交叉淡化。整段进行一次渲染成一个连续缓冲，循环播放时
+最后一个和弦的尾巴绕回开头，接缝处同样是交叉淡化。播放时音频线程只做数组拷贝，
+不合成任何东西，所以再长的进行也不会欠载。
+
+用法示例:
+    python progression.py "I V vi iii IV I IV V" --key D --bpm 160 --bars 64
+    python progression.py "C G/B Am Em/G F C F G" --out canon.wav
+    python progression.py --lesson "2-5-1" --key Bb
+"""
+import argparse
+import math
+import re
+import time
+
+import numpy as np
+
+from keyboard import key_frequency, key_pitch_class
+from music_data import BASE_NOTES, PROGRESSIONS, SCALES
+from synth import SAMPLE_RATE, get_synth
+from voicings import get_voicing_index
+
+# 持续音包络：尾音交给交叉淡化处理
+SUSTAIN_ENVELOPE = (0.02, 0.1, 0.8, 0.0)
+
+FLATS = {'Db': 'C#', 'Eb': 'D#', 'Gb': 'F#', 'Ab': 'G#', 'Bb': 'A#', 'Cb': 'B', 'Fb': 'E'}
+ROMAN = ['i', 'ii', 'iii', 'iv', 'v', 'vi', 'vii']
+
+# 和弦记号后缀 -> PianoTeacher 和弦表中的名字
+SUFFIXES = {
+    '': 'Major (大三和弦)',
+    'm': 'Minor (小三和弦)',
+    'dim': 'Diminished (减三和弦)', '°': 'Diminished (减三和弦)',
+    'aug': 'Augmented (增三和弦)', '+': 'Augmented (增三和弦)',
+    'maj7': 'Major 7th (大七和弦)', 'M7': 'Major 7th (大七和弦)',
+    'm7': 'Minor 7th (小七和弦)',
+    '7': 'Dominant 7th (属七和弦)',
+    'm7b5': 'Half Dim (半减七和弦)', 'ø7': 'Half Dim (半减七和弦)', 'ø': 'Half Dim (半减七和弦)',
+    '°7': 'Dim 7th (减七和弦)', 'dim7': 'Dim 7th (减七和弦)',
+    '9': '9th (九和弦)', '11': '11th (十一和弦)', '13': '13th (十三和弦)',
+}
+_SUFFIX = '|'.join(sorted(map(re.escape, SUFFIXES), key=len, reverse=True))
+NAME_RE = re.compile(rf'^([A-G])([#b♭]?)({_SUFFIX})$')
+ROMAN_RE = re.compile(rf'^([#b♭]?)(vii|VII|iii|III|vi|VI|iv|IV|ii|II|v|V|i|I)({_SUFFIX})$')
+
+
+def pitch_class(name):
+    """'C#' / 'Db' / 'D♭' -> 音级"""
+    name = name.replace('♭', 'b')
+    return BASE_NOTES.index(FLATS.get(name, name))
+
+
+def parse_key(key):
+    """'C' / 'F#' / 'Am' -> (主音音级, 音阶)"""
+    if key.endswith('m'):
+        return pitch_class(key[:-1]), SCALES['minor']
+    return pitch_class(key), SCALES['major']
+
+
+def parse_chord(token, key='C'):
+    """一个和弦记号 -> (根音音级, 和弦表名字)
+
+    支持和弦名（C, F#m, Bb7, Bdim, Cmaj7, Dm7 …）和罗马数字（I, vi, V7, ii7,
+    vii°, bVII …）。罗马数字大写为大三、小写为小三，七和弦按大小写区分属七 / 小七。
+    """
+    match = NAME_RE.match(token)
+    if match:
+        letter, accidental, suffix = match.groups()
+        return pitch_class(letter + accidental), SUFFIXES[suffix]
+
+    match = ROMAN_RE.match(token)
+    if not match:
+        raise ValueError(f"Unknown chord symbol: {token}")
+    accidental, numeral, suffix = match.groups()
+    tonic, scale = parse_key(key)
+    root = tonic + scale[ROMAN.index(numeral.lower())]
+    root += {'#': 1, 'b': -1, '♭': -1}.get(accidental, 0)
+    minor = numeral.islower()
+    if suffix == '' and minor:
+        suffix = 'm'
+    elif suffix == '7' and minor:
+        suffix = 'm7'
+    elif suffix in ('maj7', 'M7') and minor:
+        raise ValueError(f"Unsupported chord symbol: {token}")
+    return root % 12, SUFFIXES[suffix]
+
+
+def parse_progression(text, key='C', beats=4):
+    """'I V vi iii' / 'C - G/B - Am | Em' / 'C:2 G:2'
+
+    返回 [(记号, 根音, 和弦名, 拍数, 低音音级或 None)]；斜线后是指定的低音（转位）。
+    """
+    steps = []
+    for token in re.split(r'[\s\-|,]+', text.strip()):
+        if not token:
+            continue
+        symbol, _, count = token.partition(':')
+        chord, _, bass = symbol.partition('/')
+        root, chord_type = parse_chord(chord, key)
+        if bass:
+            bass = parse_chord(bass, key)[0]
+        steps.append((symbol, root, chord_type, float(count) if count else beats,
+                      bass if bass != '' else None))
+    return steps
+
+
+class Progression:
+    """一段解析好的和弦进行"""
+
+    def __init__(self, text, key='C', bpm=120, beats=4, low=31, high=58):
+        self.text = text
+        self.key = key
+        self.bpm = bpm
+        self.steps = parse_progression(text, key, beats)
+        self.low = low      # 排列所在音区（键号，含端点；默认 E3 - G5）
+        self.high = high
+        self.voicings = get_voicing_index()
+        self._voiced = None
+
+    def __len__(self):
+        return len(self.steps)
+
+    @property
+    def beats(self):
+        return sum(step[3] for step in self.steps)
+
+    def _candidates(self, root, chord_type, bass):
+        index = self.voicings
+        # 依次放宽条件：指定低音 + 音区 → 音区 → 不限（如十三和弦放不进音区）
+        for extra in ({'bass': bass, 'low': self.low, 'high': self.high},
+                      {'low': self.low, 'high': self.high}, {}):
+            if extra.get('bass', 0) is None:
+                continue
+            rows = index.query(root=root, chord_type=chord_type, spread='closed', **extra)
+            if len(rows):
+                return rows
+        return rows
+
+    def voice(self):
+        """为每个和弦选排列：第一个取音区中间的原位，之后取离上一个和弦最近的"""
+        if self._voiced is not None:
+            return self._voiced
+        index = self.voicings
+        voiced = []
+        previous = None
+        for _, root, chord_type, _, bass in self.steps:
+            rows = self._candidates(root, chord_type, bass)
+            keys = index.keys[rows].astype(np.float64)
+            valid = keys >= 0
+            if previous is None:
+                center = (self.low + self.high) / 2
+                mean = np.where(valid, keys, 0).sum(axis=1) / valid.sum(axis=1)
+                cost = np.abs(mean - center)
+                if bass is None:
+                    cost += 12 * (index.inversion[rows] != 0)
+            else:
+                # 每个音到上一个和弦最近音的距离之和，外加低音移动
+                dist = np.abs(keys[:, :, None] - previous[None, None, :]).min(axis=2)
+                cost = np.where(valid, dist, 0).sum(axis=1)
+                cost += 0.5 * np.abs(index.bass[rows] - previous[0])
+            best = rows[int(np.argmin(cost))]
+            previous = index.notes(best).astype(np.float64)
+            voiced.append(index.notes(best))
+        self._voiced = voiced
+        return voiced
+
+    def render(self, timbre='piano', crossfade=0.05, loop=True, sample_rate=SAMPLE_RATE):
+        """整段渲染成一个 float32 缓冲
+
+        loop=True 时缓冲长度正好是整段进行，最后一个和弦的交叉淡化绕回开头，
+        循环播放没有接缝；否则末尾多留一段淡出。
+        """
+        synth = get_synth(sample_rate)
+        seconds_per_beat = 60.0 / self.bpm
+        fade = int(crossfade * sample_rate)
+        # 按拍数累计后取整，避免逐个和弦取整造成的累计误差
+        edges = np.rint(np.cumsum([0] + [s[3] for s in self.steps])
+                        * seconds_per_beat * sample_rate).astype(np.int64)
+        total = int(edges[-1]) + (0 if loop else fade)
+        out = np.zeros(total, dtype=np.float32)
+
+        # 等功率淡入 / 淡出
+        t = (np.arange(fade) + 0.5) / max(fade, 1)
+        fade_in = np.sin(t * np.pi / 2)
+        fade_out = fade_in[::-1]
+
+        for keys, start, end in zip(self.voice(), edges[:-1], edges[1:]):
+            n = int(end - start) + fade
+            wave = synth.chord(key_frequency(keys), timbre, n / sample_rate,
+                               SUSTAIN_ENVELOPE, peak=0.5)[:n].astype(np.float32)
+            if fade:
+                wave[:fade] *= fade_in
+                wave[-fade:] *= fade_out
+            first = min(len(wave), total - start)
+            out[start:start + first] += wave[:first]
+            if first < len(wave):
+                out[:len(wave) - first] += wave[first:]
+        return out
+
+    def describe(self):
+        """每个和弦一行：记号和排列（从低到高）"""
+        return [f"{step[0]:<6} {' '.join(BASE_NOTES[pc] for pc in key_pitch_class(keys))}"
+                for step, keys in zip(self.steps, self.voice())]
+
+
+class ProgressionPlayer:
+    """把预渲染的缓冲作为流式音源交给 StreamMixer（mixer.add_source）"""
+
+    def __init__(self, buffer, loop=True, sample_rate=SAMPLE_RATE):
+        self.buffer = np.asarray(buffer, dtype=np.float64)
+        self.loop = loop
+        self.sample_rate = sample_rate
+        self._pos = 0
+        self._out = np.zeros(0)
+
+    def read(self, frames):
+        """音频线程调用：按位置拷贝，循环时绕回开头"""
+        if len(self._out) < frames:
+            self._out = np.zeros(frames)
+        out = self._out[:frames]
+        size = len(self.buffer)
+        filled = 0
+        while filled < frames:
+            if self._pos >= size:
+                if not self.loop:
+                    out[filled:] = 0.0
+                    break
+                self._pos = 0
+            n = min(frames - filled, size - self._pos)
+            out[filled:filled + n] = self.buffer[self._pos:self._pos + n]
+            self._pos += n
+            filled += n
+        return out
+
+    @property
+    def finished(self):
+        return not self.loop and self._pos >= len(self.buffer)
+
+    @property
+    def position(self):
+        """在缓冲中的位置（秒）"""
+        return self._pos / self.sample_rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Chord progression player')
+    parser.add_argument('progression', nargs='?', default=PROGRESSIONS['Canon (卡农)'])
+    parser.add_argument('--lesson', choices=list(PROGRESSIONS))
+    parser.add_argument('--key', default='C')
+    parser.add_argument('--bpm', type=float, default=120)
+    parser.add_argument('--beats', type=float, default=4, help='beats per chord')
+    parser.add_argument('--bars', type=int, help='repeat to at least this many bars')
+    parser.add_argument('--timbre', default='piano')
+    parser.add_argument('--out', help='write to an audio file instead of playing')
+    args = parser.parse_args()
+
+    text = PROGRESSIONS[args.lesson] if args.lesson else args.progression
+    progression = Progression(text, args.key, args.bpm, args.beats)
+    if args.bars:
+        repeats = max(1, math.ceil(args.bars * 4 / progression.beats))
+        progression = Progression(' '.join([text] * repeats), args.key, args.bpm, args.beats)
+    for line in progression.describe()[:len(parse_progression(text, args.key))]:
+        print(line)
+
+    start = time.perf_counter()
+    buffer = progression.render(args.timbre, loop=not args.out)
+    print(f"Rendered {len(buffer) / SAMPLE_RATE:.1f}s in {time.perf_counter() - start:.2f}s")
+
+    if args.out:
+        import soundfile as sf
+        sf.write(args.out, buffer, SAMPLE_RATE)
+        return
+
+    from mixer import get_mixer
+    mixer = get_mixer(SAMPLE_RATE)
+    player = ProgressionPlayer(buffer)
+    mixer.add_source(player)
+    print("Looping, press Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        mixer.remove_source(player)
+        mixer.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""和弦识别：音级集合 / MIDI 音符 / 音级能量（chroma） -> 按得分排序的和弦（含根音和转位）
+
+音集：全部 4096 个掩码的候选和弦在创建时用 NumPy 一次算好（和弦音与所选音的
+Jaccard 相似度，涵盖所有移调），识别就是一次列表下标；按低音排好转位的结果再以
+(掩码, 低音) 缓存，重复的点击 / 按键只是一次字典查找。
+音频：chroma 与和弦模板做一次矩阵乘法（余弦相似度），整段录音按帧批量计算。
+
+用法示例:
+    python recognizer.py E G C
+    python recognizer.py --midi
+    python recognizer.py --wav rehearsal.wav
+"""
+import argparse
+from collections import namedtuple
+import time
+
+import numpy as np
+
+from music_data import SEVENTH_CHORDS, TRIADS
+from theory import FULL_MASK, NOTES, QUALITIES, Chord, ChordQuality, Note, pitch_mask
+
+INVERSION_NAMES = ('root position', '1st inversion', '2nd inversion', '3rd inversion')
+# 音频只用三和弦和七和弦做模板：音数多的扩展和弦会吃掉一切带噪声的 chroma
+AUDIO_QUALITIES = tuple(dict.fromkeys(ChordQuality(name) for name in (*TRIADS, *SEVENTH_CHORDS)))
+POPCOUNT = np.array([bin(m).count('1') for m in range(1 << 12)], dtype=np.int64)
+
+
+class ChordMatch(namedtuple('ChordMatch', 'chord bass inversion score')):
+    """一个候选：和弦、低音（Note，未知时为 None）、转位（0 = 原位，None = 低音不是和弦音）、得分 0-1"""
+
+    __slots__ = ()
+
+    @property
+    def label(self):
+        """C、C/E（转位）、C/D（低音不是和弦音）"""
+        if self.bass is None or self.bass is self.chord.root:
+            return self.chord.symbol
+        return f"{self.chord.symbol}/{self.bass.name}"
+
+    def describe(self):
+        if self.bass is None:
+            position = ''
+        elif self.inversion is None:
+            position = f", {self.bass.name} in the bass"
+        elif self.inversion < len(INVERSION_NAMES):
+            position = f", {INVERSION_NAMES[self.inversion]}"
+        else:
+            position = f", {self.inversion}th inversion"
+        return f"{self.label} ({self.chord.name}{position}) {self.score:.0%}"
+
+
+class ChordRecognizer:
+    """音集查表 + chroma 模板相关"""
+
+    def __init__(self, qualities=QUALITIES, audio_qualities=AUDIO_QUALITIES,
+                 candidates=8, min_score=0.5):
+        self.chords = tuple(Chord(root, q) for q in qualities for root in NOTES)
+        chord_masks = np.array([c.mask for c in self.chords], dtype=np.int64)
+
+        # (4096, 和弦数) 的相似度矩阵：共同音数 / 合并后的音数
+        masks = np.arange(1 << 12, dtype=np.int64)[:, None]
+        score = POPCOUNT[masks & chord_masks] / np.maximum(POPCOUNT[masks | chord_masks], 1)
+        order = np.argsort(-score, axis=1, kind='stable')[:, :candidates]
+        top = np.take_along_axis(score, order, axis=1)
+        self._table = [tuple((self.chords[j], s) for j, s in zip(row, row_score) if s >= min_score)
+                       for row, row_score in zip(order.tolist(), top.tolist())]
+        self._inversions = {c: tuple(c.inversion(n) for n in NOTES) for c in self.chords}
+        self._cache = {}
+
+        # chroma 模板：每个和弦一行单位向量；转位表 (和弦, 低音音级) -> 转位，-1 = 不是和弦音
+        self.audio_chords = tuple(Chord(root, q) for q in audio_qualities for root in NOTES)
+        self.templates = np.array([[c.mask >> pc & 1 for pc in range(12)]
+                                   for c in self.audio_chords], dtype=np.float32)
+        self.templates /= np.linalg.norm(self.templates, axis=1, keepdims=True)
+        self.audio_inversions = np.array(
+            [[-1 if i is None else i for i in (c.inversion(n) for n in NOTES)]
+             for c in self.audio_chords], dtype=np.int64)
+
+    # ---- 音集 ----
+
+    def _rank(self, mask, bass):
+        bass_note = NOTES[bass] if bass >= 0 else None
+        matches = []
+        for chord, score in self._table[mask]:
+            inversion = self._inversions[chord][bass] if bass >= 0 else None
+            matches.append(ChordMatch(chord, bass_note, inversion, score))
+        # 得分相同（同音异名的和弦、对称和弦）时低音决定：原位 > 转位 > 低音不是和弦音
+        if bass >= 0:
+            matches.sort(key=lambda m: (-m.score, m.inversion is None, m.inversion != 0))
+        return tuple(matches)
+
+    def recognize_mask(self, mask, bass=-1):
+        """掩码 + 低音音级（-1 = 未知） -> 排好序的 ChordMatch 元组"""
+        key = (mask & FULL_MASK) << 4 | (bass + 1)
+        result = self._cache.get(key)
+        if result is None:
+            result = self._cache[key] = self._rank(mask & FULL_MASK, bass)
+        return result
+
+    def recognize(self, notes, bass=None, limit=None):
+        """音符（名字 / 音级 / Note，或掩码）+ 可选低音 -> 排好序的 ChordMatch 元组"""
+        mask = notes if isinstance(notes, int) else pitch_mask(notes)
+        result = self.recognize_mask(mask, -1 if bass is None else Note(bass).pc)
+        return result if limit is None else result[:limit]
+
+    def recognize_keys(self, keys, limit=None):
+        """MIDI 音高（% 12 为音级），最低的音作低音；88 键的键号先用 keyboard.key_to_midi 换算"""
+        if not len(keys):
+            return ()
+        mask = 0
+        for key in keys:
+            mask |= 1 << (int(key) % 12)
+        result = self.recognize_mask(mask, int(min(keys)) % 12)
+        return result if limit is None else result[:limit]
+
+    # ---- 音频 ----
+
+    def chroma_scores(self, chroma):
+        """(..., 12) 的 chroma -> (..., 模板数) 的余弦相似度"""
+        chroma = np.asarray(chroma, dtype=np.float32)
+        norm = np.linalg.norm(chroma, axis=-1, keepdims=True)
+        return (chroma / np.maximum(norm, 1e-12)) @ self.templates.T
+
+    def recognize_chroma(self, chroma, bass_chroma=None, limit=5):
+        """一帧（或一个音频块）的 chroma -> 排好序的 ChordMatch 元组"""
+        scores = self.chroma_scores(chroma)
+        bass = int(np.argmax(bass_chroma)) if bass_chroma is not None and np.any(bass_chroma) else -1
+        matches = []
+        for j in np.argsort(-scores, kind='stable')[:limit]:
+            inversion = self.audio_inversions[j, bass] if bass >= 0 else -1
+            matches.append(ChordMatch(self.audio_chords[j], NOTES[bass] if bass >= 0 else None,
+                                      None if inversion < 0 else int(inversion), float(scores[j])))
+        return tuple(matches)
+
+    def label_frames(self, chroma, bass_chroma=None, smooth=1, min_score=0.6, silence_db=-40.0):
+        """逐帧标注：(n, 12) chroma -> (和弦序号, 得分, 低音音级)，无和弦的帧序号为 -1
+
+        得分矩阵先沿时间做 smooth 帧的滑动平均（前缀和），避免和弦在相邻帧间来回跳。
+        """
+        chroma = np.asarray(chroma, dtype=np.float32)
+        scores = self.chroma_scores(chroma)
+        if smooth > 1 and len(scores):
+            csum = np.cumsum(np.pad(scores, ((1, 0), (0, 0))), axis=0, dtype=np.float64)
+            lo = np.clip(np.arange(len(scores)) - smooth // 2, 0, len(scores))
+            hi = np.clip(lo + smooth, 0, len(scores))
+            scores = ((csum[hi] - csum[lo]) / (hi - lo)[:, None]).astype(np.float32)
+        best = np.argmax(scores, axis=1) if len(scores) else np.zeros(0, dtype=np.int64)
+        best_score = scores[np.arange(len(best)), best]
+
+        energy = chroma.sum(axis=1)
+        floor = energy.max(initial=0) * 10 ** (silence_db / 10)
+        labels = np.where((energy > floor) & (best_score >= min_score), best, -1)
+        bass = np.full(len(labels), -1)
+        if bass_chroma is not None:
+            bass_chroma = np.asarray(bass_chroma)
+            bass_energy = bass_chroma.sum(axis=1)
+            voiced = bass_energy > bass_energy.max(initial=0) * 10 ** (silence_db / 10)
+            bass[voiced] = np.argmax(bass_chroma[voiced], axis=1)
+        return labels, best_score, bass
+
+    def segments(self, labels, scores, bass, frame_time):
+        """逐帧标注合并成 (开始秒, 结束秒, ChordMatch) 列表；低音取段内出现最多的音级"""
+        if not len(labels):
+            return []
+        edges = np.flatnonzero(np.diff(labels)) + 1
+        starts = np.concatenate([[0], edges])
+        ends = np.concatenate([edges, [len(labels)]])
+        result = []
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            j = int(labels[start])
+            if j < 0:
+                continue
+            heard = bass[start:end][bass[start:end] >= 0]
+            pc = int(np.argmax(np.bincount(heard, minlength=12))) if len(heard) else -1
+            inversion = int(self.audio_inversions[j, pc]) if pc >= 0 else -1
+            result.append((start * frame_time, end * frame_time,
+                           ChordMatch(self.audio_chords[j], NOTES[pc] if pc >= 0 else None,
+                                      None if inversion < 0 else inversion,
+                                      float(scores[start:end].mean()))))
+        return result
+
+    def label_audio(self, audio, sample_rate=None, smooth_time=0.5, min_time=0.2, **kwargs):
+        """单声道音频 -> 和弦段列表。一遍分块 STFT，得分和平滑都是整块矩阵运算"""
+        from corpus import HOP, SAMPLE_RATE, chromagram
+
+        sample_rate = sample_rate or SAMPLE_RATE
+        chroma, bass_chroma = chromagram(audio, sample_rate, bands=((55, 5000), (40, 260)))
+        frame_time = HOP / sample_rate
+        labels, scores, bass = self.label_frames(
+            chroma, bass_chroma, smooth=max(1, int(round(smooth_time / frame_time))), **kwargs)
+        return [s for s in self.segments(labels, scores, bass, frame_time)
+                if s[1] - s[0] >= min_time]
+
+    def label_recording(self, path, **kwargs):
+        """录音文件 -> 和弦段列表（corpus.decode 解码）"""
+        from corpus import SAMPLE_RATE, decode
+
+        return self.label_audio(decode(path), SAMPLE_RATE, **kwargs)
+
+
+_recognizer = None
+
+
+def get_recognizer():
+    """进程内共享的识别器（候选表只算一次）"""
+    global _recognizer
+    if _recognizer is None:
+        _recognizer = ChordRecognizer()
+    return _recognizer
+
+
+class MidiChords:
+    """MIDI 键盘输入（mido 回调线程）：记录按住的音，界面线程读 notes / matches
+
+    回调里只重新绑定一个新的 frozenset，读的一方拿到的总是完整的快照。
+    """
+
+    def __init__(self, port=None, recognizer=None):
+        self.port_name = port
+        self.recognizer = recognizer or get_recognizer()
+        self.held = frozenset()
+        self.version = 0          # 每次按下 / 松开加一，轮询方据此判断是否需要重画
+        self._port = None
+
+    def _callback(self, message):
+        if message.type == 'note_on' and message.velocity > 0:
+            self.held = self.held | {message.note}
+        elif message.type in ('note_on', 'note_off'):
+            self.held = self.held - {message.note}
+        else:
+            return
+        self.version += 1
+
+    def start(self):
+        import mido
+        self._port = mido.open_input(self.port_name, callback=self._callback)
+        return self
+
+    def stop(self):
+        if self._port is not None:
+            self._port.close()
+            self._port = None
+        self.held = frozenset()
+
+    @property
+    def notes(self):
+        return tuple(sorted(self.held))
+
+    def matches(self, limit=None):
+        return self.recognizer.recognize_keys(self.notes, limit)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Recognize chords from notes, MIDI or recordings')
+    parser.add_argument('notes', nargs='*', help='notes, lowest first (the first one is the bass)')
+    parser.add_argument('--midi', nargs='?', const='', help='listen to a MIDI input port')
+    parser.add_argument('--wav', help='label the chords of a recording')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    recognizer = get_recognizer()
+    print(f"Chord table built in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    if args.notes:
+        matches = recognizer.recognize(args.notes, bass=args.notes[0])
+        print(' '.join(args.notes) + ':')
+        for match in matches[:5]:
+            print(f"  {match.describe()}")
+        if not matches:
+            print("  no chord")
+
+    if args.wav:
+        from corpus import SAMPLE_RATE, decode
+
+        audio = decode(args.wav)
+        start = time.perf_counter()
+        segments = recognizer.label_audio(audio, SAMPLE_RATE)
+        elapsed = time.perf_counter() - start
+        duration = len(audio) / SAMPLE_RATE
+        print(f"{len(segments)} chords over {duration:.1f}s labelled in {elapsed:.2f}s "
+              f"({duration / max(elapsed, 1e-9):.0f}x real time)")
+        for begin, end, match in segments:
+            print(f"  {begin:7.2f}-{end:7.2f}s  {match.describe()}")
+
+    if args.midi is not None:
+        midi = MidiChords(args.midi or None).start()
+        print("Listening for MIDI (Ctrl+C to stop)")
+        version = 0
+        try:
+            while True:
+                time.sleep(0.02)
+                if midi.version != version:
+                    version = midi.version
+                    matches = midi.matches(3)
+                    print(f"\r{' '.join(Note(n).name for n in midi.notes):<24} "
+                          f"{', '.join(m.label for m in matches):<40}", end='', flush=True)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            midi.stop()
+            print()
+
+
+if __name__ == "__main__":
+    main()
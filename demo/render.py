@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""离线批量渲染：不打开任何窗口，把和弦 / 音阶 / 节奏练习批量导出成音频文件
+
+用法示例:
+    python render.py out/ --kinds chords scales rhythms --format flac
+    python render.py out/ --kinds chords --timbres piano guitar --octaves 3 4 5
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import os
+import time
+
+import numpy as np
+import soundfile as sf
+
+from metronome import ClickScheduler, get_click_bank
+from music_data import (BASE_NOTES, CIRCLE_CHORD_TYPES, EXTENDED_CHORDS, LESSONS,
+                        SCALES, SEVENTH_CHORDS, TRIADS)
+from synth import DRUM_ENVELOPE, TONE_ENVELOPE, get_synth
+
+TIMBRES = ['piano', 'guitar', 'synth', 'drum']
+
+
+def slug(name):
+    """'Major 7th (大七和弦)' -> 'Major_7th'，'6/8练习' -> '6-8练习'（不会生成子目录）"""
+    return name.split(' (')[0].strip().replace(' ', '_').replace('/', '-').replace('\\', '-')
+
+
+def chord_types():
+    """合并各 demo 的和弦表，音程完全相同的只保留第一个名字"""
+    types = {}
+    seen = set()
+    for table in (TRIADS, SEVENTH_CHORDS, EXTENDED_CHORDS, CIRCLE_CHORD_TYPES):
+        for name, intervals in table.items():
+            if tuple(intervals) not in seen:
+                seen.add(tuple(intervals))
+                types[slug(name)] = intervals
+    return types
+
+
+def note_frequency(pitch_class, octave):
+    """科学音高记法的频率，A4 = 440Hz"""
+    return 440 * 2**((pitch_class - 9) / 12 + (octave - 4))
+
+
+def _envelope(timbre):
+    return DRUM_ENVELOPE if timbre == 'drum' else TONE_ENVELOPE
+
+
+def render_chord(intervals, root, octave, timbre, duration=1.0):
+    freqs = note_frequency(root, octave) * 2**(np.asarray(intervals) / 12)
+    return get_synth().chord(freqs, timbre, duration, _envelope(timbre), peak=0.5)
+
+
+def render_scale(pattern, root, octave, timbre, note_duration=0.4):
+    """上行音阶（回到高八度主音），各音首尾相接"""
+    steps = list(pattern) + [12]
+    freqs = note_frequency(root, octave) * 2**(np.asarray(steps) / 12)
+    waves = get_synth().notes(list(freqs), timbre, note_duration, _envelope(timbre))
+    return np.concatenate(waves) * 0.5
+
+
+def render_rhythm(pattern, tempo, bars=4):
+    """用与实时播放相同的调度器渲染点击音轨"""
+    scheduler = ClickScheduler(get_click_bank())
+    scheduler.reset(pattern, tempo)
+    n_samples = round(bars * len(pattern) * scheduler.samples_per_beat)
+    return scheduler.render(n_samples)
+
+
+def build_jobs(out_dir, kinds, timbres, octaves, tempos, fmt):
+    """枚举所有组合，返回 (输出路径, 类型, 参数) 列表"""
+    jobs = []
+    if 'chords' in kinds:
+        for name, intervals in chord_types().items():
+            for timbre in timbres:
+                for root, root_name in enumerate(BASE_NOTES):
+                    for octave in octaves:
+                        path = os.path.join(out_dir, 'chords', timbre,
+                                            f"{root_name}{octave}_{name}.{fmt}")
+                        jobs.append((path, 'chord', (intervals, root, octave, timbre)))
+    if 'scales' in kinds:
+        for name, pattern in SCALES.items():
+            for timbre in timbres:
+                for root, root_name in enumerate(BASE_NOTES):
+                    for octave in octaves:
+                        path = os.path.join(out_dir, 'scales', timbre,
+                                            f"{root_name}{octave}_{name}.{fmt}")
+                        jobs.append((path, 'scale', (pattern, root, octave, timbre)))
+    if 'rhythms' in kinds:
+        for lesson, content in LESSONS.items():
+            for exercise in content['exercises']:
+                for tempo in tempos:
+                    path = os.path.join(out_dir, 'rhythms', slug(lesson),
+                                        f"{slug(exercise['name'])}_{tempo}bpm.{fmt}")
+                    jobs.append((path, 'rhythm', (exercise['pattern'], tempo)))
+    return jobs
+
+
+_RENDERERS = {'chord': render_chord, 'scale': render_scale, 'rhythm': render_rhythm}
+
+
+def _render_job(job):
+    path, kind, args = job
+    audio = _RENDERERS[kind](*args)
+    sf.write(path, audio.astype(np.float32), get_synth().sample_rate)
+    return path
+
+
+def render_all(out_dir, kinds=('chords', 'scales', 'rhythms'), timbres=TIMBRES,
+               octaves=range(8), tempos=(60, 90, 120), fmt='wav', workers=None):
+    """批量渲染并写文件，返回写出的文件数"""
+    jobs = build_jobs(out_dir, kinds, timbres, octaves, tempos, fmt)
+    for directory in {os.path.dirname(path) for path, _, _ in jobs}:
+        os.makedirs(directory, exist_ok=True)
+
+    workers = workers or os.cpu_count()
+    if workers == 1:
+        for job in jobs:
+            _render_job(job)
+    else:
+        # 每个进程各自持有合成器缓存；按块分发以减少进程间通信
+        chunksize = max(1, len(jobs) // (workers * 8))
+        with ProcessPoolExecutor(workers) as pool:
+            for _ in pool.map(_render_job, jobs, chunksize=chunksize):
+                pass
+    return len(jobs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Render lesson audio without a display')
+    parser.add_argument('out_dir')
+    parser.add_argument('--kinds', nargs='+', default=['chords', 'scales', 'rhythms'],
+                        choices=['chords', 'scales', 'rhythms'])
+    parser.add_argument('--timbres', nargs='+', default=TIMBRES, choices=TIMBRES)
+    parser.add_argument('--octaves', nargs='+', type=int, default=list(range(8)))
+    parser.add_argument('--tempos', nargs='+', type=int, default=[60, 90, 120])
+    parser.add_argument('--format', default='wav', choices=['wav', 'flac'])
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    count = render_all(args.out_dir, args.kinds, args.timbres, args.octaves,
+                       args.tempos, args.format, args.workers)
+    print(f"Rendered {count} files in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""和弦不和谐度（感官粗糙度）分析：展开每个音的谐波，成对计算拍音造成的粗糙度
+
+模型采用 Plomp-Levelt 曲线的 Sethares 参数化：两个分音 f1 < f2、振幅 a1, a2 的粗糙度为
+    a1 * a2 * (exp(-b1 * s * Δf) - exp(-b2 * s * Δf)),   s = x* / (s1 * f1 + s2)
+一个和弦的粗糙度是全部分音两两之和。所有分音对在一次广播运算里算完，多个和弦
+补齐成同样长度后也一起算（分块控制内存）。
+
+和弦用 88 键的键号表示（0 = A0，48 = A4），结果按键号元组缓存，
+即同一个音级集合在同一位置（移调）只算一次。
+
+用法示例:
+    python roughness.py --sets --top 5       # 4096 个音级集合按粗糙度排序
+    python roughness.py --voicings           # 扩展和弦在 88 键上的所有转位排序
+"""
+import argparse
+import time
+
+import numpy as np
+
+from keyboard import key_frequency, key_name
+from music_data import BASE_NOTES, EXTENDED_CHORDS
+from voicings import inversions
+
+# Sethares (1993) 的 Plomp-Levelt 曲线参数
+B1, B2 = 3.5, 5.75
+X_STAR = 0.24
+S1, S2 = 0.0207, 18.96
+
+N_KEYS = 88
+C4 = 39  # C4 的键号
+
+
+def mask_pitch_classes(mask):
+    """12 位音级掩码 -> 音级列表（第 0 位为 C）"""
+    return [pc for pc in range(12) if mask >> pc & 1]
+
+
+class RoughnessAnalyzer:
+    """批量计算和弦粗糙度，结果按键号元组缓存"""
+
+    def __init__(self, n_harmonics=6, rolloff=0.88, chunk_elements=1 << 22):
+        self.n_harmonics = n_harmonics
+        # 第 k 个谐波的振幅为 rolloff**(k-1)
+        self.harmonics = np.arange(1, n_harmonics + 1, dtype=np.float64)
+        self.amplitudes = rolloff ** (self.harmonics - 1)
+        self.chunk_elements = chunk_elements
+        self._cache = {}
+
+    def roughness(self, freqs):
+        """一组或多组基频的粗糙度
+
+        freqs: (音数,) 或 (和弦数, 音数)；NaN 表示补齐位（不发声）
+        """
+        freqs = np.asarray(freqs, dtype=np.float64)
+        single = freqs.ndim == 1
+        freqs = np.atleast_2d(freqs)
+
+        # 展开谐波：(和弦数, 音数 * 谐波数)
+        silent = np.isnan(freqs)
+        f = (np.where(silent, 1.0, freqs)[:, :, None] * self.harmonics).reshape(len(freqs), -1)
+        a = (np.where(silent, 0.0, 1.0)[:, :, None] * self.amplitudes).reshape(len(freqs), -1)
+
+        # 分块做成对广播，避免 (和弦数, 分音数, 分音数) 一次占用太多内存
+        n_partials = f.shape[1]
+        chunk = max(1, self.chunk_elements // (n_partials * n_partials))
+        result = np.empty(len(freqs))
+        for start in range(0, len(freqs), chunk):
+            f1 = f[start:start + chunk, :, None]
+            f2 = f[start:start + chunk, None, :]
+            s = X_STAR / (S1 * np.minimum(f1, f2) + S2)
+            df = np.abs(f1 - f2)
+            d = np.exp(-B1 * s * df) - np.exp(-B2 * s * df)
+            d *= a[start:start + chunk, :, None] * a[start:start + chunk, None, :]
+            result[start:start + chunk] = d.sum(axis=(1, 2)) / 2  # 每对算了两次
+        return float(result[0]) if single else result
+
+    def voicing(self, keys):
+        """单个和弦（键号列表）的粗糙度"""
+        return float(self.batch([keys])[0])
+
+    def batch(self, voicings):
+        """多个和弦（键号列表的列表，长度可以不同），只计算缓存里没有的"""
+        keys = [tuple(sorted(v)) for v in voicings]
+        missing = list({k for k in keys if k not in self._cache})
+        if missing:
+            width = max(len(k) for k in missing)
+            freqs = np.full((len(missing), width), np.nan)
+            for row, k in enumerate(missing):
+                freqs[row, :len(k)] = key_frequency(k)
+            for k, value in zip(missing, self.roughness(freqs)):
+                self._cache[k] = float(value)
+        return np.array([self._cache[k] for k in keys])
+
+    def pitch_classes(self, pitch_classes, octave=4):
+        """音级集合（0 = C）放在指定八度里的粗糙度，TwelveToneCircle 用"""
+        base = C4 + 12 * (octave - 4)
+        return self.voicing([base + pc for pc in pitch_classes])
+
+    def clear_cache(self):
+        self._cache.clear()
+
+    def rank_pitch_class_sets(self, octave=4):
+        """全部 4096 个音级集合（放在同一八度）按粗糙度升序，返回 [(粗糙度, 掩码)]"""
+        base = C4 + 12 * (octave - 4)
+        masks = range(1 << 12)
+        scores = self.batch([[base + pc for pc in mask_pitch_classes(m)] for m in masks])
+        order = np.lexsort((scores, [bin(m).count('1') for m in masks]))
+        return [(float(scores[i]), int(i)) for i in order]
+
+    def rank_voicings(self, chords=EXTENDED_CHORDS):
+        """和弦表里每种和弦在 88 键上所有能放下的原位 / 转位，按粗糙度升序
+
+        返回 [(粗糙度, 和弦名, 转位, 最低音键号)]
+        """
+        entries = []
+        voicings = []
+        for name, intervals in chords.items():
+            for inversion, steps in enumerate(inversions(intervals)):
+                steps = np.asarray(steps)
+                for low in range(N_KEYS - steps[-1]):
+                    entries.append((name, inversion, low))
+                    voicings.append(low + steps)
+        scores = self.batch(voicings)
+        order = np.argsort(scores, kind='stable')
+        return [(float(scores[i]),) + entries[i] for i in order]
+
+
+_analyzers = {}
+
+
+def get_analyzer(n_harmonics=6):
+    """获取共享分析器实例（缓存在各 demo 间共用）"""
+    analyzer = _analyzers.get(n_harmonics)
+    if analyzer is None:
+        analyzer = _analyzers[n_harmonics] = RoughnessAnalyzer(n_harmonics)
+    return analyzer
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Chord roughness analyzer')
+    parser.add_argument('--sets', action='store_true', help='rank all pitch-class sets')
+    parser.add_argument('--voicings', action='store_true', help='rank extended-chord voicings')
+    parser.add_argument('--harmonics', type=int, default=6)
+    parser.add_argument('--top', type=int, default=3)
+    args = parser.parse_args()
+    analyzer = get_analyzer(args.harmonics)
+
+    if not (args.sets or args.voicings):
+        # 课程里的例子：C4 与各音程
+        for pc in range(1, 13):
+            score = analyzer.voicing([C4, C4 + pc])
+            print(f"C4-{key_name(C4 + pc):<4} {score:.4f}")
+
+    if args.sets:
+        start = time.perf_counter()
+        ranked = analyzer.rank_pitch_class_sets()
+        print(f"Ranked {len(ranked)} pitch-class sets in {time.perf_counter() - start:.2f}s")
+        for size in range(2, 12):
+            group = [(s, m) for s, m in ranked if bin(m).count('1') == size]
+            names = [' '.join(BASE_NOTES[pc] for pc in mask_pitch_classes(m))
+                     for _, m in group[:args.top]]
+            print(f"{size:>2} notes, most consonant: {' | '.join(names)}")
+
+    if args.voicings:
+        start = time.perf_counter()
+        ranked = analyzer.rank_voicings()
+        print(f"Ranked {len(ranked)} voicings in {time.perf_counter() - start:.2f}s")
+        for label, rows in (('smoothest', ranked[:args.top]), ('roughest', ranked[-args.top:])):
+            for score, name, inversion, low in rows:
+                print(f"  {label:<9} {score:.3f}  {name} inversion {inversion} from {key_name(low)}")
+
+
+if __name__ == "__main__":
+    main()
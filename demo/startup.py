@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""启动过程工具：分阶段计时（--profile-startup）与首帧显示后的后台预热
+
+demo 应在其它 import 之前先 import 本模块，这样计时从进程加载 demo 开始。
+"""
+import sys
+import threading
+import time
+
+_START = time.perf_counter()
+
+
+class StartupProfiler:
+    """记录各启动阶段耗时；未开启时 mark() 只记一个时间戳，几乎没有开销"""
+
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self._last = _START
+        self.phases = []
+
+    @classmethod
+    def from_argv(cls, argv=None):
+        argv = sys.argv if argv is None else argv
+        return cls('--profile-startup' in argv)
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    def report(self):
+        if not self.enabled:
+            return
+        print("Startup profile:")
+        for phase, seconds in self.phases:
+            print(f"  {phase:<16}{seconds * 1000:8.1f} ms")
+        print(f"  {'total':<16}{(self._last - _START) * 1000:8.1f} ms")
+
+
+def after_first_paint(fig, profiler, warm_up=None):
+    """窗口第一次画完后：记录首帧时间，并在后台线程里预热缓存"""
+    def on_draw(event):
+        fig.canvas.mpl_disconnect(cid)
+        profiler.mark('first paint')
+        if warm_up is None:
+            profiler.report()
+            return
+
+        def run():
+            warm_up()
+            profiler.mark('warm-up (bg)')
+            profiler.report()
+        threading.Thread(target=run, daemon=True).start()
+
+    cid = fig.canvas.mpl_connect('draw_event', on_draw)
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""共享音色合成引擎：单周期波表 + 渲染结果 LRU 缓存 + 和弦批量渲染"""
+from collections import OrderedDict
+import threading
+
+import numpy as np
+
+SAMPLE_RATE = 44100
+TABLE_SIZE = 4096  # 单周期波表长度
+
+# 常用包络 (attack, decay, sustain_level, release)，单位：秒
+PIANO_ENVELOPE = (0.02, 0.1, 0.7, 0.2)      # 1_Piano.py
+NOTE_ENVELOPE = (0.05, 0.0, 1.0, 0.1)       # TwelveToneCircle 单音
+CHORD_ENVELOPE = (0.1, 0.0, 1.0, 0.2)       # TwelveToneCircle 和弦
+TONE_ENVELOPE = (0.05, 0.1, 0.7, 0.1)       # FrequencyPlotter 乐音
+DRUM_ENVELOPE = (0.01, 0.1, 0.3, 0.1)       # FrequencyPlotter 鼓声
+
+
+class Timbre:
+    """音色定义：单周期波表 + 可选的指数衰减"""
+
+    def __init__(self, name, table, decay=0.0, pitched=True):
+        self.name = name
+        # 末尾补一个点，方便线性插值时不用取模
+        self.table = np.append(table, table[0]).astype(np.float64)
+        self.decay = decay
+        self.pitched = pitched
+
+    @classmethod
+    def from_harmonics(cls, name, harmonics, decay=0.0):
+        """由各次谐波振幅生成波表"""
+        phase = np.arange(TABLE_SIZE) / TABLE_SIZE
+        table = np.zeros(TABLE_SIZE)
+        for k, amp in enumerate(harmonics, start=1):
+            table += amp * np.sin(2 * np.pi * k * phase)
+        return cls(name, table, decay)
+
+
+def _synth_table():
+    """锯齿波 + 方波混合（电子琴音色）"""
+    x = np.arange(TABLE_SIZE) / TABLE_SIZE
+    sawtooth = 2 * (x - np.floor(0.5 + x))
+    square = np.sign(np.sin(2 * np.pi * x))
+    return sawtooth * 0.3 + square * 0.2
+
+
+def _noise_table(seconds=2.0):
+    """鼓声使用的固定噪声表（不随音高变化）"""
+    rng = np.random.default_rng(0)
+    return rng.random(int(SAMPLE_RATE * seconds)) * 2 - 1
+
+
+TIMBRES = {
+    'piano': Timbre.from_harmonics('piano', [0.4, 0.2, 0.1, 0.05]),
+    'soft_piano': Timbre.from_harmonics('soft_piano', [0.2, 0.1, 0.05]),
+    'bright_piano': Timbre.from_harmonics('bright_piano', [0.5, 0.25, 0.125]),
+    'guitar': Timbre.from_harmonics('guitar', [0.5] + [0.25 / i for i in range(2, 6)],
+                                    decay=3.0),
+    'synth': Timbre('synth', _synth_table()),
+    'drum': Timbre('drum', _noise_table(), decay=30.0, pitched=False),
+}
+
+
+def adsr_envelope(n_samples, envelope, sample_rate=SAMPLE_RATE):
+    """生成 ADSR 包络（各段长度超出总长时自动截断）"""
+    attack, decay, sustain_level, release = envelope
+    a = min(int(attack * sample_rate), n_samples)
+    d = min(int(decay * sample_rate), n_samples - a)
+    r = min(int(release * sample_rate), n_samples - a - d)
+
+    env = np.full(n_samples, float(sustain_level))
+    env[:a] = np.linspace(0, 1, a, endpoint=False)
+    env[a:a + d] = np.linspace(1, sustain_level, d, endpoint=False)
+    if r:
+        env[n_samples - r:] = np.linspace(sustain_level, 0, r)
+    return env
+
+
+class ToneSynth:
+    """波表合成器，渲染结果按 (频率, 音色, 时长, 包络) 缓存"""
+
+    def __init__(self, sample_rate=SAMPLE_RATE, cache_size=512, amp_cache_size=64):
+        self.sample_rate = sample_rate
+        self.cache_size = cache_size
+        self.amp_cache_size = amp_cache_size
+        self._notes = OrderedDict()  # LRU: key -> 只读 ndarray
+        self._amps = OrderedDict()   # LRU: (n_samples, envelope, decay) -> 幅度曲线
+        self._lock = threading.Lock()  # 界面线程与后台预热线程共用缓存
+
+    def _key(self, freq, timbre, duration, envelope):
+        return (round(float(freq), 6), timbre, float(duration), tuple(envelope))
+
+    def _amplitude(self, n_samples, envelope, decay):
+        """包络与音色衰减合并后的幅度曲线（有上限的 LRU 缓存，加锁：音频回调也会调用）"""
+        key = (n_samples, tuple(envelope), decay)
+        with self._lock:
+            amp = self._amps.get(key)
+            if amp is not None:
+                self._amps.move_to_end(key)
+                return amp
+        amp = adsr_envelope(n_samples, envelope, self.sample_rate)
+        if decay:
+            amp = amp * np.exp(-decay * np.arange(n_samples) / self.sample_rate)
+        amp.flags.writeable = False
+        with self._lock:
+            self._amps[key] = amp
+            if len(self._amps) > self.amp_cache_size:
+                self._amps.popitem(last=False)
+        return amp
+
+    def _render(self, freqs, timbre, duration, envelope):
+        """一次性渲染多个音符，返回 (音符数, 采样数) 数组"""
+        voice = TIMBRES[timbre]
+        n_samples = int(self.sample_rate * duration)
+        amp = self._amplitude(n_samples, envelope, voice.decay)
+        freqs = np.asarray(freqs, dtype=np.float64)
+
+        if not voice.pitched:
+            return np.tile(np.resize(voice.table[:-1], n_samples) * amp, (len(freqs), 1))
+
+        # 相位 -> 波表位置，线性插值
+        step = freqs * (TABLE_SIZE / self.sample_rate)
+        pos = np.multiply.outer(step, np.arange(n_samples, dtype=np.float64))
+        np.mod(pos, TABLE_SIZE, out=pos)
+        idx = pos.astype(np.intp)
+        pos -= idx
+        lo = voice.table[idx]
+        out = voice.table[idx + 1]
+        out -= lo
+        out *= pos
+        out += lo
+        out *= amp
+        return out
+
+    def _store(self, key, wave):
+        wave.flags.writeable = False
+        self._notes[key] = wave
+        if len(self._notes) > self.cache_size:
+            self._notes.popitem(last=False)
+
+    def notes(self, freqs, timbre='piano', duration=0.5, envelope=PIANO_ENVELOPE):
+        """返回每个频率对应的波形列表，未命中缓存的音符批量渲染"""
+        keys = [self._key(f, timbre, duration, envelope) for f in freqs]
+        with self._lock:
+            waves = [self._notes.get(k) for k in keys]
+        missing = [i for i, w in enumerate(waves) if w is None]
+
+        if missing:
+            rendered = self._render([freqs[i] for i in missing], timbre, duration, envelope)
+            with self._lock:
+                for i, wave in zip(missing, rendered):
+                    waves[i] = wave
+                    self._store(keys[i], wave)
+        with self._lock:
+            for k in keys:
+                if k in self._notes:
+                    self._notes.move_to_end(k)
+        return waves
+
+    def note(self, freq, timbre='piano', duration=0.5, envelope=PIANO_ENVELOPE):
+        """渲染单个音符（只读数组）"""
+        return self.notes([freq], timbre, duration, envelope)[0]
+
+    def chord(self, freqs, timbre='piano', duration=0.5, envelope=PIANO_ENVELOPE, peak=0.5):
+        """渲染和弦并归一化到 peak；peak 为 None 时不归一化"""
+        n_samples = int(self.sample_rate * duration)
+        if len(freqs) == 0:
+            return np.zeros(n_samples)
+
+        waves = self.notes(list(freqs), timbre, duration, envelope)
+        mix = np.add.reduce(waves) if len(waves) > 1 else waves[0].copy()
+        if peak is not None:
+            max_amp = np.max(np.abs(mix))
+            if max_amp > 0:
+                mix *= peak / max_amp
+        return mix
+
+    def clear_cache(self):
+        with self._lock:
+            self._notes.clear()
+            self._amps.clear()
+
+
+_synths = {}
+
+
+def get_synth(sample_rate=SAMPLE_RATE):
+    """获取共享合成器实例（同一采样率只创建一次）"""
+    synth = _synths.get(sample_rate)
+    if synth is None:
+        synth = _synths[sample_rate] = ToneSynth(sample_rate)
+    return synth
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""乐理核心：驻留、不可变、可哈希的 Note / Interval / Chord / Scale（数据来自 music_data）
+
+同一个值只创建一个对象（按构造参数缓存），相等比较就是身份比较；
+音级集合用 12 位掩码表示（第 k 位 = 音级 k），成员测试和并交差都是整数位运算，
+和弦识别是以掩码为键的字典查找。
+
+用法示例:
+    python theory.py C E G Bb
+    python theory.py --scale D minor
+"""
+import argparse
+
+from music_data import (BASE_NOTES, CHORD_SYMBOLS, CIRCLE_CHORD_TYPES, EXTENDED_CHORDS,
+                        INTERVAL_NAMES, ROMAN_NUMERALS, SCALES, SEVENTH_CHORDS, TRIADS)
+
+FLATS = {'Db': 'C#', 'Eb': 'D#', 'Gb': 'F#', 'Ab': 'G#', 'Bb': 'A#', 'Cb': 'B', 'Fb': 'E',
+         'E#': 'F', 'B#': 'C'}
+NOTE_NAMES = tuple(BASE_NOTES)
+FULL_MASK = (1 << 12) - 1
+
+
+class _Interned:
+    """驻留对象的基类：__new__ 按参数缓存实例，创建后禁止修改属性"""
+
+    __slots__ = ()
+
+    def _set(self, **fields):
+        for name, value in fields.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        # 反序列化时重新走 __new__，在进程池里传递后仍是同一个驻留对象
+        return type(self), self._key()
+
+
+class Note(_Interned):
+    """音级（0 = C）。Note('C#') / Note('Db') / Note(1) 是同一个对象"""
+
+    __slots__ = ('pc', 'name', 'mask')
+    _all = []
+    _lookup = {}  # 常见写法（音名、降号名、0-11）-> 对象，免去解析
+
+    def __new__(cls, note):
+        try:
+            return cls._lookup[note]
+        except (KeyError, TypeError):
+            pass
+        if isinstance(note, Note):
+            return note
+        if isinstance(note, str):
+            name = note.strip().replace('♭', 'b').replace('♯', '#')
+            name = name[:1].upper() + name[1:]
+            try:
+                note = BASE_NOTES.index(FLATS.get(name, name))
+            except ValueError:
+                raise ValueError(f"Unknown note name: {note}") from None
+        return cls._all[int(note) % 12]
+
+    @classmethod
+    def _create(cls, pc):
+        self = object.__new__(cls)
+        self._set(pc=pc, name=BASE_NOTES[pc], mask=1 << pc)
+        return self
+
+    def _key(self):
+        return (self.pc,)
+
+    def __add__(self, interval):
+        return Note(self.pc + int(interval))
+
+    def __sub__(self, other):
+        """音 - 音 = 向上的音程；音 - 音程 = 音"""
+        if isinstance(other, Note):
+            return Interval((self.pc - other.pc) % 12)
+        return Note(self.pc - int(other))
+
+    def __int__(self):
+        return self.pc
+
+    __index__ = __int__
+
+    def __lt__(self, other):
+        return self.pc < other.pc
+
+    def frequency(self, octave=4):
+        """科学音高记法的频率，A4 = 440Hz"""
+        return 440 * 2**((self.pc - 9) / 12 + (octave - 4))
+
+    def __repr__(self):
+        return f"Note({self.name!r})"
+
+    def __str__(self):
+        return self.name
+
+
+Note._all.extend(Note._create(pc) for pc in range(12))
+NOTES = tuple(Note._all)
+Note._lookup.update({pc: note for pc, note in enumerate(NOTES)})
+Note._lookup.update({note.name: note for note in NOTES})
+Note._lookup.update({flat: Note(sharp) for flat, sharp in FLATS.items()})
+
+
+class Interval(_Interned):
+    """音程（半音数，可以超过八度）；name / roman 按音级（除以 12 的余数）取"""
+
+    __slots__ = ('semitones', 'name', 'roman', 'mask')
+    _cache = {}
+
+    def __new__(cls, semitones):
+        if isinstance(semitones, Interval):
+            return semitones
+        semitones = int(semitones)
+        self = cls._cache.get(semitones)
+        if self is None:
+            self = object.__new__(cls)
+            self._set(semitones=semitones, name=INTERVAL_NAMES[semitones % 12],
+                      roman=ROMAN_NUMERALS[semitones % 12], mask=1 << (semitones % 12))
+            cls._cache[semitones] = self
+        return self
+
+    def _key(self):
+        return (self.semitones,)
+
+    def __int__(self):
+        return self.semitones
+
+    __index__ = __int__
+
+    def __lt__(self, other):
+        return self.semitones < other.semitones
+
+    def __repr__(self):
+        return f"Interval({self.semitones})"
+
+    def __str__(self):
+        return self.name
+
+
+def pitch_mask(notes):
+    """音符（名字 / 音级 / Note）集合 -> 12 位掩码"""
+    mask = 0
+    for note in notes:
+        mask |= Note(note).mask
+    return mask
+
+
+def rotate_mask(mask, shift):
+    """掩码整体移调 shift 个半音"""
+    shift %= 12
+    return ((mask << shift) | (mask >> (12 - shift))) & FULL_MASK
+
+
+# 掩码 -> 音符元组，一次算好
+MASK_NOTES = tuple(tuple(NOTES[pc] for pc in range(12) if mask >> pc & 1)
+                   for mask in range(1 << 12))
+
+
+def mask_notes(mask):
+    return MASK_NOTES[mask & FULL_MASK]
+
+
+class ChordQuality(_Interned):
+    """和弦类型：音程（相对根音）、根音在 C 时的掩码、记号后缀
+
+    PianoTeacher 与 TwelveToneCircle 的同音程和弦是同一个类型（名字互为别名）。
+    """
+
+    __slots__ = ('name', 'intervals', 'mask', 'symbol')
+    _by_name = {}
+    _by_intervals = {}
+
+    def __new__(cls, name):
+        if isinstance(name, ChordQuality):
+            return name
+        try:
+            return cls._by_name[name]
+        except KeyError:
+            raise ValueError(f"Unknown chord type: {name}") from None
+
+    @classmethod
+    def _register(cls, name, intervals):
+        intervals = tuple(intervals)
+        self = cls._by_intervals.get(intervals)
+        if self is None:
+            self = object.__new__(cls)
+            self._set(name=name, intervals=tuple(map(Interval, intervals)),
+                      mask=pitch_mask(intervals), symbol=CHORD_SYMBOLS.get(name, name))
+            cls._by_intervals[intervals] = self
+        cls._by_name[name] = self
+
+    def _key(self):
+        return (self.name,)
+
+    def __repr__(self):
+        return f"ChordQuality({self.name!r})"
+
+    def __str__(self):
+        return self.name
+
+
+for _table in (TRIADS, SEVENTH_CHORDS, EXTENDED_CHORDS, CIRCLE_CHORD_TYPES):
+    for _name, _intervals in _table.items():
+        ChordQuality._register(_name, _intervals)
+QUALITIES = tuple(ChordQuality._by_intervals.values())
+
+
+class Chord(_Interned):
+    """根音 + 和弦类型。Chord('C', 'Major (大三和弦)') 与 Chord(0, 'Major Triad (大三和弦)') 相同"""
+
+    __slots__ = ('root', 'quality', 'notes', 'mask', 'name', 'symbol')
+    _cache = {}
+
+    def __new__(cls, root, quality):
+        root, quality = Note(root), ChordQuality(quality)
+        self = cls._cache.get((root, quality))
+        if self is None:
+            self = object.__new__(cls)
+            self._set(root=root, quality=quality,
+                      notes=tuple(root + i for i in quality.intervals),
+                      mask=rotate_mask(quality.mask, root.pc),
+                      name=f"{root.name} {quality.name}",
+                      symbol=f"{root.name}{quality.symbol}")
+            cls._cache[root, quality] = self
+        return self
+
+    def _key(self):
+        return (self.root, self.quality)
+
+    def __contains__(self, note):
+        return bool(self.mask & Note(note).mask)
+
+    def __iter__(self):
+        return iter(self.notes)
+
+    def __len__(self):
+        return len(self.notes)
+
+    def inversion(self, bass):
+        """低音为 bass 时的转位（0 = 原位）；bass 不是和弦音时返回 None"""
+        bass = Note(bass)
+        for i, note in enumerate(dict.fromkeys(self.notes)):  # 按叠置顺序：根、三、五、七…
+            if note is bass:
+                return i
+        return None
+
+    def __repr__(self):
+        return f"Chord({self.root.name!r}, {self.quality.name!r})"
+
+    def __str__(self):
+        return self.symbol
+
+
+class Scale(_Interned):
+    """根音 + 音阶类型（music_data.SCALES）"""
+
+    __slots__ = ('root', 'kind', 'steps', 'notes', 'mask')
+    _cache = {}
+
+    def __new__(cls, root, kind='major'):
+        root, kind = Note(root), kind.lower()
+        self = cls._cache.get((root, kind))
+        if self is None:
+            if kind not in SCALES:
+                raise ValueError(f"Unknown scale: {kind}")
+            self = object.__new__(cls)
+            steps = tuple(map(Interval, SCALES[kind]))
+            self._set(root=root, kind=kind, steps=steps,
+                      notes=tuple(root + s for s in steps),
+                      mask=rotate_mask(pitch_mask(SCALES[kind]), root.pc))
+            cls._cache[root, kind] = self
+        return self
+
+    def _key(self):
+        return (self.root, self.kind)
+
+    def __contains__(self, note):
+        return bool(self.mask & Note(note).mask)
+
+    def __iter__(self):
+        return iter(self.notes)
+
+    def __len__(self):
+        return len(self.notes)
+
+    @property
+    def pitch_classes(self):
+        return [note.pc for note in self.notes]
+
+    def degree(self, note):
+        """音在音阶中的级数（1 开始）；不在音阶中时返回 None"""
+        note = Note(note)
+        return self.notes.index(note) + 1 if self.mask & note.mask else None
+
+    def chords(self, quality_names=None):
+        """音阶内的全部和弦（和弦掩码是音阶掩码的子集）"""
+        qualities = QUALITIES if quality_names is None else map(ChordQuality, quality_names)
+        return [Chord(root, q) for q in qualities for root in self.notes
+                if Chord(root, q).mask & ~self.mask == 0]
+
+    def __repr__(self):
+        return f"Scale({self.root.name!r}, {self.kind!r})"
+
+    def __str__(self):
+        return f"{self.root.name} {self.kind}"
+
+
+# 掩码 -> 全部同音集的和弦（增三和弦等对称和弦会有多个根音）
+CHORDS_BY_MASK = {}
+for _quality in QUALITIES:
+    for _root in NOTES:
+        _chord = Chord(_root, _quality)
+        CHORDS_BY_MASK.setdefault(_chord.mask, []).append(_chord)
+CHORDS_BY_MASK = {mask: tuple(chords) for mask, chords in CHORDS_BY_MASK.items()}
+
+
+def identify(notes):
+    """音符集合 -> 音集完全相同的和弦元组（没有时为空元组），一次字典查找"""
+    mask = notes if isinstance(notes, int) else pitch_mask(notes)
+    return CHORDS_BY_MASK.get(mask, ())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Identify chords and list scales')
+    parser.add_argument('notes', nargs='*')
+    parser.add_argument('--scale', nargs=2, metavar=('ROOT', 'KIND'))
+    args = parser.parse_args()
+
+    if args.notes:
+        chords = identify(args.notes)
+        print(' '.join(map(str, mask_notes(pitch_mask(args.notes)))) + ': '
+              + (', '.join(f"{c.symbol} ({c.name})" for c in chords) or 'no chord'))
+    if args.scale:
+        scale = Scale(*args.scale)
+        print(f"{scale}: {' '.join(map(str, scale))}")
+        print('  ' + ' '.join(c.symbol for c in scale.chords()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""流式打拍评分：bisect 匹配节拍网格 + O(1) 内存的运行统计"""
+from bisect import bisect_right
+import math
+
+import numpy as np
+
+
+class RunningStats:
+    """Welford 在线均值 / 方差"""
+
+    __slots__ = ('count', 'mean', '_m2', 'abs_sum')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.abs_sum = 0.0
+
+    def add(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (x - self.mean)
+        self.abs_sum += abs(x)
+
+    @property
+    def variance(self):
+        return self._m2 / self.count if self.count else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    @property
+    def mean_abs(self):
+        return self.abs_sum / self.count if self.count else 0.0
+
+
+class TimingScorer:
+    """按节奏型和速度生成的周期性节拍网格，对每次敲击做增量评分
+
+    网格由若干速度段 (起始时间, 起始拍号, 速度) 组成；每段内节拍按小节重复，
+    因此只需保存一个小节内的拍点偏移。每次敲击先二分找速度段，再二分找最近的
+    拍点，代价 O(log n)，统计量只保留累加值。
+    """
+
+    def __init__(self, pattern, tempo):
+        self.reset(pattern, tempo)
+
+    def reset(self, pattern=None, tempo=None):
+        if pattern is not None:
+            self.pattern = list(pattern)
+            # 一个小节内需要打拍的位置（以拍为单位）及其强度
+            self._offsets = [i for i, s in enumerate(self.pattern) if s > 0]
+            self._strengths = [s for s in self.pattern if s > 0]
+        if tempo is not None:
+            self.tempo = float(tempo)
+        self.origin = None
+        self._seg_times = []     # 各速度段起始时间（升序）
+        self._segments = []      # (起始时间, 起始拍号, 速度)
+        self.stats = RunningStats()
+        self.by_strength = {s: RunningStats() for s in set(self._strengths)}
+        self.early = 0
+        self.late = 0
+
+    def _add_segment(self, t, beat, tempo):
+        # 先加段再加时间：评分线程二分 _seg_times 得到的下标总在 _segments 范围内
+        self._segments.append((t, beat, tempo))
+        self._seg_times.append(t)
+
+    def start(self, t):
+        """指定网格起点（共享时钟），不再以第一下敲击为起点"""
+        self.origin = t
+        self._seg_times = []
+        self._segments = []
+        self._add_segment(t, 0.0, self.tempo)
+
+    def set_tempo(self, tempo, at=None):
+        """速度变化：从时间 at 起按新速度继续排列拍点
+
+        at 应是节拍器真正换速的时刻（小节边界，见 ClickScheduler.on_tempo）。
+        最后一段还没开始（at 不晚于它的起点）时直接改它的速度，速度没变时不分段，
+        所以段数只随真正生效的换速增加。
+        """
+        self.tempo = float(tempo)
+        if self.origin is None or at is None:
+            return
+        t0, beat0, tempo0 = self._segments[-1]
+        if at <= t0:
+            self._segments[-1] = (t0, beat0, self.tempo)
+        elif self.tempo != tempo0:
+            self._add_segment(at, beat0 + (at - t0) * tempo0 / 60.0, self.tempo)
+
+    def _nearest(self, t):
+        """返回 (最近期望拍点时间, 该拍强度)"""
+        seg = self._segments[max(bisect_right(self._seg_times, t) - 1, 0)]
+        t0, beat0, tempo = seg
+        spb = 60.0 / tempo
+        beat = beat0 + (t - t0) / spb
+
+        bar_len = len(self.pattern)
+        bar, phase = divmod(beat, bar_len)
+        i = bisect_right(self._offsets, phase)
+        # 候选：左侧拍点，右侧拍点（可能落在下一小节第一个拍点）
+        left = (bar * bar_len + self._offsets[i - 1], self._strengths[i - 1]) if i else \
+            ((bar - 1) * bar_len + self._offsets[-1], self._strengths[-1])
+        right = (bar * bar_len + self._offsets[i], self._strengths[i]) if i < len(self._offsets) else \
+            ((bar + 1) * bar_len + self._offsets[0], self._strengths[0])
+        target, strength = min(left, right, key=lambda c: abs(c[0] - beat))
+        return t0 + (target - beat0) * spb, strength
+
+    def nearest(self, times):
+        """_nearest 的批量版本：时间数组 -> (期望拍点时间数组, 强度数组)
+
+        网格起点需已确定（start() 或第一下敲击之后）。
+        """
+        times = np.asarray(times, dtype=np.float64)
+        segments = np.asarray(self._segments, dtype=np.float64)
+        seg = np.maximum(np.searchsorted(self._seg_times, times, side='right') - 1, 0)
+        t0, beat0, tempo = segments[seg].T
+        spb = 60.0 / tempo
+        beat = beat0 + (times - t0) / spb
+
+        # 在小节内拍点两端各补一个相邻小节的拍点，左右候选都能直接取下标
+        bar_len = len(self.pattern)
+        offsets = np.array([self._offsets[-1] - bar_len] + self._offsets
+                           + [self._offsets[0] + bar_len], dtype=np.float64)
+        strengths = np.array([self._strengths[-1]] + self._strengths + [self._strengths[0]])
+        bar, phase = np.divmod(beat, bar_len)
+        i = np.searchsorted(offsets[1:-1], phase, side='right')
+        right = np.abs(offsets[i + 1] - phase) < np.abs(phase - offsets[i])
+        pick = i + right
+        target = bar * bar_len + offsets[pick]
+        return t0 + (target - beat0) * spb, strengths[pick]
+
+    def add_hit(self, t):
+        """记录一次敲击，返回 (带符号误差秒数, 对应拍点强度)"""
+        if not self._offsets:
+            return None
+        if self.origin is None:
+            # 第一下敲击作为网格起点
+            self.origin = t
+            self._add_segment(t, 0.0, self.tempo)
+
+        expected, strength = self._nearest(t)
+        error = t - expected
+        self.stats.add(error)
+        self.by_strength[strength].add(error)
+        if error < 0:
+            self.early += 1
+        elif error > 0:
+            self.late += 1
+        return error, strength
+
+    @property
+    def score(self):
+        """与原评分一致：100 - 平均绝对误差(秒) × 100"""
+        return max(0, 100 - self.stats.mean_abs * 100)
+
+    def summary(self):
+        """用于界面显示的统计摘要"""
+        lines = [f'敲击: {self.stats.count}  偏差: {self.stats.mean * 1000:+.0f}ms'
+                 f'  抖动: {self.stats.std * 1000:.0f}ms',
+                 f'抢拍: {self.early}  拖拍: {self.late}']
+        for strength in sorted(self.by_strength, reverse=True):
+            s = self.by_strength[strength]
+            if s.count:
+                lines.append(f'强度 {strength:g}: 平均误差 {s.mean_abs * 1000:.0f}ms ({s.count})')
+        return lines
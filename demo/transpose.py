@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""曲库批量移调与调性分析：和弦谱文本 -> 12 个调的版本、推断调性、按歌手音域选调和变调夹
+
+和弦谱支持两种写法：和弦单独一行写在歌词上方，或 ChordPro 的行内 [C] 记号。
+可选的指令行 {key: F}、{range: C4-F5}（旋律音域）、{title: …} 会被读取。
+
+每首歌解析一次（按文本内容缓存），和弦根音 / 低音存成音级数组；整个曲库的
+移调、调性推断、选调和变调夹计算都在拼接后的数组上一次完成。
+
+用法示例:
+    python transpose.py songs/*.txt --singer A3-E5
+    python transpose.py 海阔天空.txt --to G
+    python transpose.py 海阔天空.txt --all-keys
+"""
+import argparse
+import hashlib
+import os
+import re
+
+import numpy as np
+
+from music_data import BASE_NOTES, MAJOR_PROFILE, MINOR_PROFILE
+from theory import Note
+
+FLAT_NAMES = ['C', 'Db', 'D', 'Eb', 'E', 'F', 'Gb', 'G', 'Ab', 'A', 'Bb', 'B']
+FLAT_KEYS = {1, 3, 5, 6, 8, 10}  # 用降号记谱的大调：Db Eb F Gb Ab Bb
+
+CHORD_RE = re.compile(r'^([A-G])([#b]?)((?:maj|min|dim|aug|sus|add|m|M|°|ø|\+|\d|\(|\)|#|b)*)'
+                      r'(?:/([A-G])([#b]?))?$')
+INLINE_RE = re.compile(r'\[([^\]]+)\]')
+DIRECTIVE_RE = re.compile(r'^\s*\{\s*(key|range|title)\s*:\s*([^}]*)\}\s*$', re.IGNORECASE)
+NOTE_RE = re.compile(r'^([A-G][#b]?)(-?\d)$')
+
+# 吉他开放和弦指型 (根音, 是否小三)：C A G E D Am Em Dm
+OPEN_SHAPES = {(0, False), (9, False), (7, False), (4, False), (2, False),
+               (9, True), (4, True), (2, True)}
+MAX_CAPO = 7
+
+
+def note_number(name):
+    """'C4' -> 60（MIDI 音高）"""
+    match = NOTE_RE.match(name.strip())
+    if not match:
+        raise ValueError(f"Bad note name: {name}")
+    return (int(match.group(2)) + 1) * 12 + Note(match.group(1)).pc
+
+
+def note_name(number):
+    return f"{BASE_NOTES[number % 12]}{number // 12 - 1}"
+
+
+def spell(pc, key_pc, minor=False):
+    """按目标调选择升号或降号记法"""
+    major_pc = (key_pc + 3) % 12 if minor else key_pc
+    return (FLAT_NAMES if major_pc in FLAT_KEYS else BASE_NOTES)[pc % 12]
+
+
+def key_label(pc, minor=False):
+    return spell(pc, pc, minor) + ('m' if minor else '')
+
+
+def chord_tones(suffix):
+    """和弦后缀 -> 相对根音的音程（调性推断只需要大致的音级构成）"""
+    minor = suffix.startswith(('m', 'min')) and not suffix.startswith('maj')
+    if suffix.startswith(('dim', '°')):
+        tones = [0, 3, 6]
+    elif suffix.startswith(('aug', '+')):
+        tones = [0, 4, 8]
+    elif 'sus2' in suffix:
+        tones = [0, 2, 7]
+    elif 'sus' in suffix:
+        tones = [0, 5, 7]
+    elif suffix.startswith('5'):
+        tones = [0, 7]
+    else:
+        tones = [0, 3, 7] if minor else [0, 4, 7]
+    if 'maj7' in suffix or 'M7' in suffix:
+        tones.append(11)
+    elif suffix.startswith(('dim7', '°7')):
+        tones.append(9)
+    elif re.search(r'(?<!add)(7|9|11|13)', suffix) or 'ø' in suffix:
+        tones.append(10)
+    elif '6' in suffix:
+        tones.append(9)
+    return tones
+
+
+class Song:
+    """解析后的和弦谱：和弦位置 + 音级数组，移调结果按半音数缓存"""
+
+    def __init__(self, text, name=None):
+        self.text = text
+        self.lines = text.splitlines()
+        self.name = name
+        self.key = None       # (主音音级, 是否小调)，来自 {key: …}
+        self.range = None     # (最低音, 最高音) MIDI，来自 {range: …}
+        self.tokens = []      # (行号, 列, 原文, 是否行内)
+        roots, basses, minors, chroma = [], [], [], np.zeros(12)
+        self.suffixes = []
+
+        for line_no, line in enumerate(self.lines):
+            directive = DIRECTIVE_RE.match(line)
+            if directive:
+                self._directive(directive.group(1).lower(), directive.group(2).strip())
+                continue
+            found = [(m.start(1), m.group(1), True) for m in INLINE_RE.finditer(line)]
+            words = [(m.start(), m.group()) for m in re.finditer(r'\S+', line)]
+            if not found and words and all(CHORD_RE.match(w) for _, w in words):
+                found = [(col, word, False) for col, word in words]
+            for col, token, inline in found:
+                match = CHORD_RE.match(token)
+                if not match:
+                    continue
+                letter, accidental, suffix, bass_letter, bass_accidental = match.groups()
+                root = Note(letter + accidental).pc
+                self.tokens.append((line_no, col, token, inline))
+                self.suffixes.append(suffix)
+                roots.append(root)
+                basses.append(Note(bass_letter + bass_accidental).pc if bass_letter else -1)
+                minors.append(suffix.startswith(('m', 'min')) and not suffix.startswith('maj'))
+                chroma[(root + np.asarray(chord_tones(suffix))) % 12] += 1
+
+        self.roots = np.array(roots, dtype=np.int8)
+        self.basses = np.array(basses, dtype=np.int8)
+        self.minors = np.array(minors, dtype=bool)
+        self.chroma = chroma
+        self._transposed = {}
+
+    def _directive(self, name, value):
+        if name == 'title':
+            self.name = self.name or value
+        elif name == 'key' and value:
+            self.key = (Note(value.rstrip('m')).pc, value.endswith('m'))
+        elif name == 'range' and value:
+            low, high = re.split(r'\s*-\s*', value, maxsplit=1)
+            self.range = (note_number(low), note_number(high))
+
+    def __len__(self):
+        return len(self.roots)
+
+    def transpose(self, shift, roots=None, basses=None, key=None):
+        """移调 shift 个半音后的谱面文本（结果缓存）
+
+        roots / basses 可以传入曲库批量计算好的数组，省掉重复计算。
+        """
+        shift %= 12
+        if key is None:
+            key = self.key or (0, False)
+        cached = self._transposed.get((shift, key))
+        if cached is not None:
+            return cached
+        if roots is None:
+            roots = (self.roots + shift) % 12
+            basses = np.where(self.basses >= 0, (self.basses + shift) % 12, -1)
+        target, minor = (key[0] + shift) % 12, key[1]
+
+        names = [spell(r, target, minor) + suffix + (f"/{spell(b, target, minor)}" if b >= 0 else '')
+                 for r, b, suffix in zip(roots.tolist(), basses.tolist(), self.suffixes)]
+        lines = list(self.lines)
+        by_line = {}
+        for (line_no, col, token, inline), name in zip(self.tokens, names):
+            by_line.setdefault(line_no, []).append((col, token, inline, name))
+        for line_no, items in by_line.items():
+            lines[line_no] = _rewrite(self.lines[line_no], items)
+        for i, line in enumerate(lines):
+            directive = DIRECTIVE_RE.match(line)
+            if directive and directive.group(1).lower() == 'key':
+                lines[i] = f"{{key: {key_label(target, minor)}}}"
+        text = '\n'.join(lines)
+        self._transposed[shift, key] = text
+        return text
+
+
+def _rewrite(line, items):
+    """把一行里的和弦换成新名字；和弦行尽量保持原来的列位置"""
+    if items[0][2]:
+        # 行内 [C] 记号：直接替换括号内容
+        out, last = [], 0
+        for col, token, _, name in items:
+            out.append(line[last:col])
+            out.append(name)
+            last = col + len(token)
+        out.append(line[last:])
+        return ''.join(out)
+    out = ''
+    for col, _, _, name in items:
+        out += ' ' * max(col - len(out), 1 if out else 0) + name
+    return out
+
+
+_songs = {}
+
+
+def load_song(text, name=None):
+    """解析和弦谱（相同文本只解析一次）"""
+    digest = hashlib.sha1(text.encode('utf-8')).hexdigest()
+    song = _songs.get(digest)
+    if song is None:
+        song = _songs[digest] = Song(text, name)
+    return song
+
+
+class Repertoire:
+    """曲库：所有歌曲的音级数组拼接在一起，批量分析"""
+
+    def __init__(self, songs=()):
+        self.songs = list(songs)
+        self._arrays = None
+
+    @classmethod
+    def from_paths(cls, paths):
+        songs = []
+        for path in paths:
+            with open(path, encoding='utf-8') as f:
+                name = os.path.splitext(os.path.basename(path))[0]
+                songs.append(load_song(f.read(), name))
+        return cls(songs)
+
+    def add(self, text, name=None):
+        self.songs.append(load_song(text, name))
+        self._arrays = None
+
+    def _concat(self):
+        if self._arrays is None:
+            sizes = np.array([len(s) for s in self.songs])
+            roots = np.concatenate([s.roots for s in self.songs] or [np.zeros(0, np.int8)])
+            basses = np.concatenate([s.basses for s in self.songs] or [np.zeros(0, np.int8)])
+            minors = np.concatenate([s.minors for s in self.songs] or [np.zeros(0, bool)])
+            offsets = np.concatenate([[0], np.cumsum(sizes)])
+            self._arrays = roots.astype(np.int64), basses.astype(np.int64), minors, offsets
+        return self._arrays
+
+    def all_keys(self):
+        """全部歌曲的 12 个移调版本：一次广播算出 (12, 和弦总数) 的根音 / 低音"""
+        roots, basses, _, offsets = self._concat()
+        shifts = np.arange(12)[:, None]
+        all_roots = (roots + shifts) % 12
+        all_basses = np.where(basses >= 0, (basses + shifts) % 12, -1)
+        result = {}
+        for i, (song, key) in enumerate(zip(self.songs, self.keys())):
+            a, b = offsets[i], offsets[i + 1]
+            result[song.name] = [song.transpose(shift, all_roots[shift, a:b],
+                                                all_basses[shift, a:b], key)
+                                 for shift in range(12)]
+        return result
+
+    def estimate_keys(self):
+        """按和弦音级分布与 24 个调性轮廓求相关：返回 (歌曲数, 24) 的相关系数
+
+        列 0-11 为 C…B 大调，12-23 为 C…B 小调。
+        """
+        chroma = np.array([s.chroma for s in self.songs], dtype=np.float64).reshape(-1, 12)
+        profiles = np.array([np.roll(MAJOR_PROFILE, k) for k in range(12)]
+                            + [np.roll(MINOR_PROFILE, k) for k in range(12)])
+
+        def zscore(x):
+            x = x - x.mean(axis=-1, keepdims=True)
+            return x / np.maximum(x.std(axis=-1, keepdims=True), 1e-12)
+        return zscore(chroma) @ zscore(profiles).T / 12
+
+    def keys(self):
+        """每首歌的调：优先用 {key: …}，否则用推断结果"""
+        best = np.argmax(self.estimate_keys(), axis=1) if self.songs else []
+        return [song.key or (int(k) % 12, bool(k >= 12)) for song, k in zip(self.songs, best)]
+
+    def ranges(self):
+        """每首歌的旋律音域；没有 {range: …} 时假定从主音下方纯五度到上方大六度"""
+        result = []
+        for song, (tonic, _) in zip(self.songs, self.keys()):
+            result.append(song.range or (60 + tonic - 5, 60 + tonic + 9))
+        return np.array(result).reshape(-1, 2)
+
+    def best_keys(self, singer_low, singer_high):
+        """按歌手音域为每首歌选调：旋律离音域两端的最小余量最大
+
+        歌手可以换八度唱，所以在 ±2 个八度内搜索；余量相同时取离原调最近的调。
+        返回每首歌的 (移调半音数, 目标调, 余量)
+        """
+        shifts = np.arange(-24, 25)
+        ranges = self.ranges()
+        low = ranges[:, :1] + shifts
+        high = ranges[:, 1:] + shifts
+        margin = np.minimum(low - singer_low, singer_high - high)
+        # 同余量时偏向少移调（按调的距离，不按八度）：惩罚小于 1
+        distance = np.minimum(shifts % 12, -shifts % 12) + np.abs(shifts) / 100
+        best = np.argmax(margin - distance / 10, axis=1)
+        keys = self.keys()
+        return [(int(shifts[j]), (int((keys[i][0] + shifts[j]) % 12), keys[i][1]), int(margin[i, j]))
+                for i, j in enumerate(best)]
+
+    def best_capos(self, shifts):
+        """给定每首歌的移调量，找开放和弦指型最多的变调夹位置（同分取低品）
+
+        返回每首歌的 (变调夹品位, 开放指型比例)
+        """
+        roots, _, minors, offsets = self._concat()
+        if not len(roots):
+            return []
+        song_ids = np.repeat(np.arange(len(self.songs)), np.diff(offsets))
+        sounding = (roots + np.asarray(shifts)[song_ids]) % 12
+        capos = np.arange(MAX_CAPO + 1)[:, None]
+        shapes = (sounding - capos) % 12                           # (品位, 和弦总数)
+        table = np.zeros((12, 2), dtype=bool)
+        for pc, minor in OPEN_SHAPES:
+            table[pc, int(minor)] = True
+        is_open = table[shapes, minors.astype(np.int64)]
+        # 按歌曲分段求和：前缀和在分段边界处相减
+        cumulative = np.concatenate([np.zeros((len(capos), 1)), np.cumsum(is_open, axis=1)], axis=1)
+        counts = cumulative[:, offsets[1:]] - cumulative[:, offsets[:-1]]
+        fractions = counts / np.maximum(np.diff(offsets), 1)
+        best = np.argmax(fractions, axis=0)
+        return [(int(c), float(fractions[c, i])) for i, c in enumerate(best)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Transpose chord charts and pick keys')
+    parser.add_argument('charts', nargs='+')
+    parser.add_argument('--to', help='transpose every chart to this key (e.g. G, Em)')
+    parser.add_argument('--all-keys', action='store_true')
+    parser.add_argument('--singer', help='singer range, e.g. A3-E5')
+    args = parser.parse_args()
+
+    library = Repertoire.from_paths(args.charts)
+    keys = library.keys()
+
+    if args.to:
+        to_minor = args.to.endswith('m')
+        target = Note(args.to[:-1] if to_minor else args.to).pc
+        for song, (tonic, minor) in zip(library.songs, keys):
+            # 移调不改变调式：调式不同时移到目标调的关系大调 / 关系小调
+            goal = target
+            note = ''
+            if minor != to_minor:
+                goal = (target + 3) % 12 if to_minor else (target - 3) % 12
+                note = f", relative {'major' if to_minor else 'minor'} of {key_label(target, to_minor)}"
+            print(f"== {song.name} ({key_label(tonic, minor)} -> {key_label(goal, minor)}{note})")
+            print(song.transpose(goal - tonic, key=(tonic, minor)))
+        return
+
+    if args.all_keys:
+        for name, versions in library.all_keys().items():
+            for shift, text in enumerate(versions):
+                print(f"== {name} +{shift}")
+                print(text)
+        return
+
+    singer = [note_number(n) for n in args.singer.split('-')] if args.singer else [57, 76]
+    picks = library.best_keys(*singer)
+    capos = library.best_capos([shift for shift, _, _ in picks])
+    for song, key, (shift, target, margin), (capo, ratio) in zip(library.songs, keys, picks, capos):
+        shape_key = key_label((target[0] - capo) % 12, target[1])
+        print(f"{song.name:<24} key {key_label(*key):<4} -> {key_label(*target):<4} "
+              f"({shift:+d}, margin {margin}), capo {capo} playing {shape_key} shapes "
+              f"({ratio:.0%} open)")
+
+
+if __name__ == "__main__":
+    main()
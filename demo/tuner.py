@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""调音器 / 音高跟踪：流式读取输入块，用 YIN 方法估计基频并对齐到最近的琴键
+
+每个跳步（默认 5ms）在最近的一帧上计算一次：差分函数里的互相关用 FFT 计算，
+能量项用平方和的前缀和，帧缓冲、前缀和、差分函数都预先分配。
+频率到琴键的换算对一批估计值一次完成（键号约定见 keyboard：第 48 键 = A4）。
+
+用法示例:
+    python tuner.py                      # 麦克风
+    python tuner.py --wav guitar_E.wav   # 用录音代替麦克风
+"""
+import argparse
+from collections import deque
+import threading
+import time
+
+import numpy as np
+
+from keyboard import frequency_to_key, key_name
+
+N_KEYS = 88
+
+
+def snap_to_keys(freqs):
+    """频率数组 -> (键号数组, 音分偏差数组)；无音高（<= 0）的键号为 -1"""
+    freqs = np.asarray(freqs, dtype=np.float64)
+    voiced = freqs > 0
+    semitones = frequency_to_key(np.where(voiced, freqs, 440.0))
+    keys = np.clip(np.rint(semitones), 0, N_KEYS - 1).astype(np.int64)
+    cents = (semitones - keys) * 100
+    return np.where(voiced, keys, -1), np.where(voiced, cents, 0.0)
+
+
+class PitchTracker:
+    """YIN 基频估计，按跳步在滑动帧上计算"""
+
+    def __init__(self, sample_rate=48000, hop_time=0.005, fmin=40.0, fmax=2000.0,
+                 window=1024, threshold=0.15, silence_db=-50.0):
+        self.sample_rate = sample_rate
+        self.hop = max(1, int(round(hop_time * sample_rate)))
+        self.tau_min = max(2, int(sample_rate / fmax))
+        self.tau_max = int(np.ceil(sample_rate / fmin))
+        self.window = max(window, self.tau_max)       # 积分窗 W
+        self.frame_len = self.window + self.tau_max
+        self.n_fft = 1 << int(np.ceil(np.log2(self.frame_len + self.window)))
+        self.threshold = threshold
+        self.silence = 10 ** (silence_db / 10) * self.window
+
+        # 双倍长度的环形缓冲：任意时刻最近 frame_len 个采样都是一段连续内存
+        self._ring = np.zeros(2 * self.frame_len)
+        self._write = 0
+        self._since_hop = 0
+        self._cumsum = np.zeros(self.frame_len + 1)
+        self._energy = np.zeros(self.tau_max + 1)
+        self._diff = np.zeros(self.tau_max + 1)
+        self._cmnd = np.zeros(self.tau_max + 1)
+        self._tau = np.arange(self.tau_max + 1, dtype=np.float64)
+        self._results = np.zeros((0, 2))
+
+    def reset(self):
+        self._ring[:] = 0.0
+        self._write = 0
+        self._since_hop = 0
+
+    def _push(self, samples):
+        n = len(samples)
+        size = self.frame_len
+        start = self._write
+        n1 = min(n, size - start)
+        for offset in (0, size):
+            self._ring[offset + start:offset + start + n1] = samples[:n1]
+            self._ring[offset:offset + n - n1] = samples[n1:]
+        self._write = (start + n) % size
+
+    def estimate(self, frame):
+        """一帧 (frame_len,) -> (基频 Hz, 置信度)；无音高时基频为 0"""
+        W, tau_max = self.window, self.tau_max
+        cumsum = self._cumsum
+        np.cumsum(np.square(frame), out=cumsum[1:])
+        r0 = cumsum[W]
+        if r0 < self.silence:
+            return 0.0, 0.0
+
+        # d(τ) = Σx[j]² + Σx[j+τ]² - 2Σx[j]x[j+τ]，互相关用 FFT
+        spectrum = np.fft.rfft(frame, self.n_fft)
+        spectrum *= np.conj(np.fft.rfft(frame[:W], self.n_fft))
+        acf = np.fft.irfft(spectrum, self.n_fft)[:tau_max + 1]
+        energy = self._energy
+        np.subtract(cumsum[W:W + tau_max + 1], cumsum[:tau_max + 1], out=energy)
+        diff = self._diff
+        np.add(energy, r0, out=diff)
+        diff -= 2 * acf
+        diff[0] = 0.0
+
+        # 累计均值归一化差分 d'(τ) = d(τ) · τ / Σ_{1..τ} d
+        cmnd = self._cmnd
+        np.cumsum(diff, out=cmnd)
+        cmnd[0] = 1.0
+        np.maximum(cmnd, 1e-12, out=cmnd)
+        np.divide(diff * self._tau, cmnd, out=cmnd)
+        cmnd[0] = 1.0
+
+        search = cmnd[self.tau_min:tau_max]
+        below = np.flatnonzero(search < self.threshold)
+        if len(below):
+            tau = self.tau_min + int(below[0])
+            while tau + 1 < tau_max and cmnd[tau + 1] < cmnd[tau]:
+                tau += 1
+        else:
+            tau = self.tau_min + int(np.argmin(search))
+            if cmnd[tau] > 2 * self.threshold:
+                return 0.0, float(1 - cmnd[tau])
+
+        # 抛物线插值求亚采样周期
+        shift = 0.0
+        if self.tau_min < tau < tau_max:
+            a, b, c = cmnd[tau - 1], cmnd[tau], cmnd[tau + 1]
+            if a - 2 * b + c > 0:
+                shift = 0.5 * (a - c) / (a - 2 * b + c)
+        return self.sample_rate / (tau + shift), float(1 - cmnd[tau])
+
+    def process(self, block):
+        """送入任意长度的一块输入，返回本块内完成的每个跳步的 (基频, 置信度) 数组"""
+        block = np.asarray(block, dtype=np.float64).reshape(-1)
+        max_hops = (self._since_hop + len(block)) // self.hop
+        if len(self._results) < max_hops:
+            self._results = np.zeros((max_hops, 2))
+        count = 0
+        i = 0
+        while i < len(block):
+            n = min(self.hop - self._since_hop, len(block) - i)
+            self._push(block[i:i + n])
+            i += n
+            self._since_hop += n
+            if self._since_hop == self.hop:
+                self._since_hop = 0
+                frame = self._ring[self._write:self._write + self.frame_len]
+                self._results[count] = self.estimate(frame)
+                count += 1
+        return self._results[:count]
+
+
+class Tuner:
+    """把 PitchTracker 接到麦克风（sounddevice.InputStream）或 WAV 文件上
+
+    估计在输入回调里完成；界面线程读 current / history 即可。
+    """
+
+    def __init__(self, sample_rate=48000, hop_time=0.005, wav=None, smoothing=9):
+        self.wav = wav
+        if wav is not None:
+            import soundfile as sf
+            sample_rate = sf.info(wav).samplerate
+        self.tracker = PitchTracker(sample_rate, hop_time)
+        self.sample_rate = sample_rate
+        self.history = deque(maxlen=smoothing)   # 最近的 (基频, 置信度)
+        self.hops = 0
+        self.busy = 0.0                          # 估计所用时间 / 音频时长
+        self._stream = None
+        self._thread = None
+        self._running = False
+
+    def _feed(self, block):
+        start = time.perf_counter()
+        results = self.tracker.process(block)
+        self.history.extend(map(tuple, results))
+        self.hops += len(results)
+        elapsed = time.perf_counter() - start
+        self.busy = 0.9 * self.busy + 0.1 * elapsed * self.sample_rate / max(len(block), 1)
+
+    def _callback(self, indata, frames, time_info, status):
+        if status:
+            print(f"Audio status: {status}")
+        self._feed(indata[:, 0])
+
+    def _play_file(self):
+        """按实时速度读 WAV，模拟输入回调"""
+        import soundfile as sf
+
+        hop = self.tracker.hop
+        start = time.perf_counter()
+        for i, block in enumerate(sf.blocks(self.wav, blocksize=hop * 4, dtype='float32',
+                                            always_2d=True)):
+            if not self._running:
+                break
+            self._feed(block[:, 0])
+            delay = start + (i + 1) * hop * 4 / self.sample_rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        self._running = False
+
+    def start(self):
+        self._running = True
+        if self.wav is not None:
+            self._thread = threading.Thread(target=self._play_file, daemon=True)
+            self._thread.start()
+        else:
+            import sounddevice as sd
+            self._stream = sd.InputStream(samplerate=self.sample_rate, channels=1,
+                                          blocksize=self.tracker.hop, dtype='float32',
+                                          latency='low', callback=self._callback)
+            self._stream.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+    @property
+    def running(self):
+        return self._running
+
+    @property
+    def current(self):
+        """最近几个跳步的中值基频 -> (频率, 键号, 音分)；没有音高时返回 None"""
+        voiced = [f for f, _ in list(self.history) if f > 0]
+        if len(voiced) < len(self.history) // 2 + 1:
+            return None
+        freq = float(np.median(voiced))
+        keys, cents = snap_to_keys([freq])
+        return freq, int(keys[0]), float(cents[0])
+
+
+def analyze_file(path, hop_time=0.005):
+    """离线分析整个文件：返回 (时间, 基频, 置信度, 键号, 音分) 各一列"""
+    import soundfile as sf
+
+    audio, sample_rate = sf.read(path, dtype='float32', always_2d=True)
+    tracker = PitchTracker(sample_rate, hop_time)
+    results = tracker.process(audio[:, 0]).copy()
+    keys, cents = snap_to_keys(results[:, 0])
+    times = (np.arange(len(results)) + 1) * tracker.hop / sample_rate
+    return times, results[:, 0], results[:, 1], keys, cents
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tuner / pitch tracker')
+    parser.add_argument('--wav', help='analyze a recording instead of the microphone')
+    parser.add_argument('--hop', type=float, default=0.005, help='hop in seconds')
+    parser.add_argument('--offline', action='store_true', help='analyze the WAV as fast as possible')
+    args = parser.parse_args()
+
+    if args.wav and args.offline:
+        start = time.perf_counter()
+        times, freqs, _, keys, cents = analyze_file(args.wav, args.hop)
+        elapsed = time.perf_counter() - start
+        print(f"{len(times)} hops over {times[-1] if len(times) else 0:.1f}s "
+              f"analyzed in {elapsed:.2f}s")
+        last = None
+        for t, f, k, c in zip(times, freqs, keys, cents):
+            if k != last:
+                print(f"  {t:7.3f}s  " + (f"{key_name(k):<4} {f:7.2f} Hz {c:+5.1f} cents"
+                                           if k >= 0 else "--"))
+                last = k
+        return
+
+    tuner = Tuner(wav=args.wav, hop_time=args.hop).start()
+    try:
+        while tuner.running:
+            time.sleep(0.1)
+            reading = tuner.current
+            if reading:
+                freq, key, cents = reading
+                bar = '|'.center(21, '-')
+                pos = int(np.clip(round(cents / 5), -10, 10)) + 10
+                bar = bar[:pos] + '*' + bar[pos + 1:]
+                print(f"\r{key_name(key):<4} {freq:7.2f} Hz {cents:+5.1f} cents  {bar}  "
+                      f"cpu {tuner.busy:.0%}", end='', flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        tuner.stop()
+        print()
+
+
+if __name__ == "__main__":
+    main()
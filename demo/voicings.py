@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""和弦排列（voicing）索引：和弦类型 × 根音 × 转位 × 密集 / 开放排列，限定在 88 键内
+
+所有排列在启动时一次性枚举成紧凑的整数数组（每个排列一行键号，-1 补齐），
+之后按根音、和弦类型、转位、排列方式、低音或音区查询都只是数组掩码运算。
+枚举结果保存在磁盘缓存里，和弦表不变时直接加载。
+
+用法示例:
+    python voicings.py --root C --type "Major (大三和弦)" --low 39 --high 63
+    python voicings.py --bass E --spread open
+"""
+import argparse
+import hashlib
+import os
+import time
+
+import numpy as np
+
+from keyboard import key_pitch_class
+from music_data import BASE_NOTES, EXTENDED_CHORDS, SEVENTH_CHORDS, TRIADS
+
+N_KEYS = 88
+SPREADS = ['closed', 'open']
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'band_training')
+_VERSION = 2  # 枚举规则变化时加一，使旧缓存失效（2：根音按 keyboard 的键号约定）
+
+
+def chord_tables():
+    """PianoTeacher 的全部和弦类型（三和弦、七和弦、扩展和弦）"""
+    return {**TRIADS, **SEVENTH_CHORDS, **EXTENDED_CHORDS}
+
+
+def inversions(intervals):
+    """原位和各转位的音程（最低音为 0）"""
+    intervals = sorted(intervals)
+    result = []
+    for k in range(len(intervals)):
+        raised = [i + 12 * ((intervals[-1] - i) // 12 + 1) for i in intervals[:k]]
+        steps = sorted(intervals[k:] + raised)
+        result.append([s - steps[0] for s in steps])
+    return result
+
+
+def spread(steps, kind):
+    """密集排列原样返回；开放排列把低音之上的第 1、3、5… 个音升高八度"""
+    if kind == 'closed':
+        return list(steps)
+    return sorted(s + 12 * (i % 2) for i, s in enumerate(steps))
+
+
+class VoicingIndex:
+    """全部排列的整数数组表
+
+    keys:      (排列数, 最多音数) int8，键号，-1 补齐
+    size:      每个排列的音数
+    chord:     和弦类型编号（见 type_names）
+    root:      根音音级（0 = C）
+    inversion: 转位（0 = 原位）
+    spread:    排列方式编号（见 SPREADS）
+    bass/top:  最低 / 最高音键号
+    """
+
+    FIELDS = ('keys', 'size', 'chord', 'root', 'inversion', 'spread', 'bass', 'top')
+
+    def __init__(self, type_names, arrays):
+        self.type_names = list(type_names)
+        for field in self.FIELDS:
+            setattr(self, field, arrays[field])
+        self._type_ids = {name: i for i, name in enumerate(self.type_names)}
+
+    @classmethod
+    def build(cls, chords=None):
+        """枚举所有能放进 88 键的排列"""
+        chords = chord_tables() if chords is None else chords
+        width = max(len(intervals) for intervals in chords.values())
+        parts = {field: [] for field in cls.FIELDS}
+        for type_id, intervals in enumerate(chords.values()):
+            for inversion, steps in enumerate(inversions(intervals)):
+                for spread_id, kind in enumerate(SPREADS):
+                    shape = np.asarray(spread(steps, kind))
+                    # 根音相对最低音的音级差（转位后低音不再是根音）
+                    root_offset = (sorted(intervals)[0] - sorted(intervals)[inversion]) % 12
+                    bass = np.arange(N_KEYS - shape[-1])
+                    keys = np.full((len(bass), width), -1, dtype=np.int8)
+                    keys[:, :len(shape)] = bass[:, None] + shape
+                    n = len(bass)
+                    parts['keys'].append(keys)
+                    parts['size'].append(np.full(n, len(shape), dtype=np.int8))
+                    parts['chord'].append(np.full(n, type_id, dtype=np.int16))
+                    parts['root'].append(key_pitch_class(bass + root_offset).astype(np.int8))
+                    parts['inversion'].append(np.full(n, inversion, dtype=np.int8))
+                    parts['spread'].append(np.full(n, spread_id, dtype=np.int8))
+                    parts['bass'].append(bass.astype(np.int8))
+                    parts['top'].append((bass + shape[-1]).astype(np.int8))
+        return cls(chords, {field: np.concatenate(parts[field]) for field in cls.FIELDS})
+
+    @staticmethod
+    def cache_path(chords=None):
+        """缓存文件名包含和弦表的摘要，表一改就换文件"""
+        chords = chord_tables() if chords is None else chords
+        digest = hashlib.sha1(repr((_VERSION, sorted(chords.items()))).encode()).hexdigest()
+        return os.path.join(CACHE_DIR, f"voicings_{digest[:12]}.npz")
+
+    @classmethod
+    def load(cls, chords=None, path=None):
+        """从磁盘缓存加载；没有缓存或读取失败时重新枚举并写缓存"""
+        chords = chord_tables() if chords is None else chords
+        path = path or cls.cache_path(chords)
+        try:
+            with np.load(path) as data:
+                return cls(chords, {field: data[field] for field in cls.FIELDS})
+        except (OSError, KeyError, ValueError):
+            pass
+        index = cls.build(chords)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            np.savez(path, **{field: getattr(index, field) for field in cls.FIELDS})
+        except OSError as e:
+            print(f"Could not write voicing cache: {e}")
+        return index
+
+    def __len__(self):
+        return len(self.size)
+
+    @staticmethod
+    def _pitch_class(note):
+        return note if isinstance(note, (int, np.integer)) else BASE_NOTES.index(note)
+
+    def query(self, root=None, chord_type=None, inversion=None, spread=None,
+              bass=None, bass_key=None, low=None, high=None):
+        """按条件筛选，返回排列编号数组
+
+        root / bass 为音级（'C' 或 0-11），bass_key 为最低音键号，
+        low / high 限定全部音所在的键号区间（含端点）。
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if root is not None:
+            mask &= self.root == self._pitch_class(root)
+        if chord_type is not None:
+            mask &= self.chord == self._type_ids[chord_type]
+        if inversion is not None:
+            mask &= self.inversion == inversion
+        if spread is not None:
+            mask &= self.spread == SPREADS.index(spread)
+        if bass is not None:
+            mask &= key_pitch_class(self.bass) == self._pitch_class(bass)
+        if bass_key is not None:
+            mask &= self.bass == bass_key
+        if low is not None:
+            mask &= self.bass >= low
+        if high is not None:
+            mask &= self.top <= high
+        return np.flatnonzero(mask)
+
+    def notes(self, i):
+        """排列的键号列表"""
+        return self.keys[i, :self.size[i]].astype(np.int64)
+
+    def find(self, chord_type, root_key, inversion=0, spread='closed'):
+        """根音在 root_key 上的排列；放不下时只换八度（同转位、同排列中低音最接近的一个），
+        该转位在 88 键内根本放不下时返回 None
+        """
+        rows = self.query(root=int(key_pitch_class(root_key)), chord_type=chord_type,
+                          inversion=inversion, spread=spread)
+        if not len(rows):
+            return None
+        return int(rows[np.argmin(np.abs(self.bass[rows].astype(np.int64) - root_key))])
+
+    def describe(self, i, names=None):
+        notes = self.notes(i)
+        label = ' '.join(names[k] for k in notes) if names else ' '.join(map(str, notes))
+        return (f"{BASE_NOTES[self.root[i]]} {self.type_names[self.chord[i]]} "
+                f"inv {self.inversion[i]} {SPREADS[self.spread[i]]}: {label}")
+
+
+_index = None
+
+
+def get_voicing_index():
+    """获取共享排列索引（首次调用时从磁盘缓存加载或构建）"""
+    global _index
+    if _index is None:
+        _index = VoicingIndex.load()
+    return _index
+
+
+def main():
+    from keyboard import KeyTable
+
+    parser = argparse.ArgumentParser(description='Browse chord voicings on 88 keys')
+    parser.add_argument('--root')
+    parser.add_argument('--type', dest='chord_type', choices=list(chord_tables()))
+    parser.add_argument('--inversion', type=int)
+    parser.add_argument('--spread', choices=SPREADS)
+    parser.add_argument('--bass')
+    parser.add_argument('--low', type=int)
+    parser.add_argument('--high', type=int)
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = get_voicing_index()
+    print(f"{len(index)} voicings ready in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    rows = index.query(args.root, args.chord_type, args.inversion, args.spread,
+                       args.bass, low=args.low, high=args.high)
+    names = KeyTable().notes
+    print(f"{len(rows)} matches")
+    for i in rows[:args.limit]:
+        print(' ', index.describe(i, names))
+
+
+if __name__ == "__main__":
+    main()